@@ -12,12 +12,14 @@ from portfolio_service import PortfolioService  # ДОБАВЛЯЕМ!
 
 
 class AIStrategyManager:
-    def __init__(self, freedom_manager, config, analyzer, portfolio_baseline=None, portfolio_experiment=None, initial_balance=300):
+    def __init__(self, freedom_manager, config, analyzer, portfolio_baseline=None, portfolio_experiment=None, initial_balance=300,
+                 indicators=None):
         self.baseline_file = 'portfolio_baseline.json'
         self.experiment_file = 'portfolio_experiment.json'
         self.freedom_manager = freedom_manager
         self.config = config
         self.analyzer = analyzer  # Сохраняем analyzer для передачи стратегиям
+        self.indicators = indicators  # общий инкрементальный движок индикаторов для обеих стратегий
         self._init_portfolio_files(initial_balance)
 
         # ------- ПРАВИЛЬНО создаём portfolio как объект -------
@@ -26,9 +28,11 @@ class AIStrategyManager:
         if portfolio_experiment is None:
             portfolio_experiment = PortfolioService(config, path=self.experiment_file)
 
-        self.baseline_strategy = HeavyStrategy(portfolio=portfolio_baseline, analyzer=self.analyzer)
+        self.baseline_strategy = HeavyStrategy(portfolio=portfolio_baseline, analyzer=self.analyzer,
+                                               indicators=self.indicators)
         risk = self.freedom_manager.apply_experimental_boost()
-        self.experimental_strategy = VTRStrategy(portfolio=portfolio_experiment, risk=risk, analyzer=self.analyzer)
+        self.experimental_strategy = VTRStrategy(portfolio=portfolio_experiment, risk=risk, analyzer=self.analyzer,
+                                                 indicators=self.indicators)
 
     def _init_portfolio_files(self, balance):
         for fname in [self.baseline_file, self.experiment_file]:
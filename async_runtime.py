@@ -0,0 +1,327 @@
+# ============================================================
+# ASYNC RUNTIME v1.0 — один event loop вместо потоков (RUNTIME=async)
+# ------------------------------------------------------------
+# По умолчанию бот — набор потоков: websocket-client, TradingLoop.run(),
+# heartbeat-поток оркестратора и блокирующий requests в TelegramBot.
+# Здесь те же модули работают задачами одного asyncio-цикла:
+# - AsyncWSPriceFeed — aiohttp-клиент relay; разбор — тот же
+#   WSPriceFeed.on_message (быстрый путь, seqlock, снимки, health)
+# - AsyncUpdateSignal — UpdateSignal на asyncio.Event: TradingLoop.cycle()
+#   просыпается на первое обновление без потока-ожидателя
+# - AsyncTelegramBot — _post ставит запрос в очередь и сразу возвращается,
+#   HTTP (aiohttp) — в своей задаче: ожидание Telegram не стопорит цикл
+# - heartbeat — задача с asyncio.sleep
+# Блокирующее — в executor: сборка DI (REST backfill), heartbeat.build().
+# Восстановление дыр MarketDataManager и запись KlineStore остаются как
+# есть (фоновый поток / одна строка SQLite на закрытый бар).
+#
+#   RUNTIME=async python main.py
+# ============================================================
+
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Set
+
+import aiohttp
+
+from telegram_bot import TelegramBot
+from ws_price_feed import WSPriceFeed
+
+logger = logging.getLogger("AsyncRuntime")
+
+
+class AsyncUpdateSignal:
+    """
+    UpdateSignal для event loop: тот же notify(symbol), но wait() — корутина.
+    notify можно звать из любого потока; до bind() только копит символы.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._event = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        if self._dirty:
+            self._event.set()
+
+    def notify(self, symbol: str) -> None:
+        if symbol in self._dirty:
+            return
+        with self._lock:
+            self._dirty.add(symbol)
+        loop = self._loop
+        if loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._event.set()
+        else:
+            loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout=None, coalesce=0.0) -> Set[str]:
+        """Как UpdateSignal.wait: изменившиеся символы, пустое множество — по таймауту."""
+        if not self._dirty:
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if self._dirty and coalesce > 0:
+            await asyncio.sleep(coalesce)
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        self._event.clear()
+        return dirty
+
+    def close(self) -> None:
+        self._event.set()
+
+
+class _WSSender:
+    """ws.send(text) для _on_open / _on_registry_change: из любого потока, без ожидания."""
+
+    def __init__(self, ws, loop):
+        self._ws = ws
+        self._loop = loop
+        self._pending = set()
+
+    def send(self, text: str) -> None:
+        self._loop.call_soon_threadsafe(self._schedule, text)
+
+    def _schedule(self, text):
+        if self._ws.closed:
+            return
+        task = self._loop.create_task(self._ws.send_str(text))
+        self._pending.add(task)
+        task.add_done_callback(self._done)
+
+    def _done(self, task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"[WS] send failed: {task.exception()}")
+
+
+class AsyncWSPriceFeed(WSPriceFeed):
+    """
+    WSPriceFeed без потока сокета: соединение — корутина run(session).
+    updates — AsyncUpdateSignal, поэтому wait_for_updates() здесь awaitable.
+    """
+
+    def __init__(self, config, kline_store=None, registry=None, heartbeat=20.0, reconnect_delay=2.0):
+        super().__init__(config, kline_store=kline_store, registry=registry, autostart=False)
+        self.updates = AsyncUpdateSignal()
+        self._signals = (self.updates,)
+        self.ws_heartbeat = heartbeat
+        self.reconnect_delay = reconnect_delay
+
+    def start(self):
+        raise RuntimeError("AsyncWSPriceFeed запускается задачей event loop: await feed.run(session)")
+
+    async def run(self, session: aiohttp.ClientSession):
+        loop = asyncio.get_running_loop()
+        self.updates.bind(loop)
+        while True:
+            try:
+                await self._connect_async(session, loop)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"❌ WS main-loop exception: {e}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _connect_async(self, session, loop):
+        self.logger.info(f"🔌 Connecting to WS: {self.ws_url}")
+        # ssl=False — как sslopt CERT_NONE у потокового фида
+        async with session.ws_connect(self.ws_url, heartbeat=self.ws_heartbeat, ssl=False) as ws:
+            self._on_open(_WSSender(ws, loop))
+            try:
+                async for msg in ws:
+                    if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                        try:
+                            self.on_message(ws, msg.data)
+                        except Exception as e:
+                            self._on_error(ws, e)
+                    elif msg.type == aiohttp.WSMsgType.ERROR:
+                        self._on_error(ws, ws.exception())
+                        break
+            finally:
+                self._on_close(ws, ws.close_code, None)
+
+
+class AsyncTelegramBot(TelegramBot):
+    """
+    TelegramBot с неблокирующей отправкой: _post кладёт запрос в очередь и
+    возвращает {"ok": True, "queued": True}; HTTP — задача run(session),
+    по одному запросу, в порядке постановки. Пока run() не запущен (сборка
+    DI) — обычный синхронный _post.
+    """
+
+    def __init__(self, token: str, chat_id: str, maxsize=1000, timeout=10.0):
+        super().__init__(token, chat_id)
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def _post(self, method: str, data: dict = None, files: dict = None):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return super()._post(method, data=data, files=files)
+        # файлы читаются сейчас: send_photo закрывает их сразу после _post
+        payload = {key: (Path(getattr(f, "name", key)).name, f.read()) for key, f in (files or {}).items()}
+        loop.call_soon_threadsafe(self._enqueue, (method, dict(data or {}), payload))
+        return {"ok": True, "queued": True}
+
+    def _enqueue(self, item):
+        if self._queue.full():
+            # как QueueSubscriber: переполнение вытесняет самое старое
+            self.dropped += 1
+            self._queue.get_nowait()
+            self._queue.task_done()
+        self._queue.put_nowait(item)
+
+    async def run(self, session: aiohttp.ClientSession):
+        self._queue = asyncio.Queue(self.maxsize)
+        self._loop = asyncio.get_running_loop()
+        try:
+            while True:
+                method, data, files = await self._queue.get()
+                try:
+                    await self._send(session, method, data, files)
+                finally:
+                    self._queue.task_done()
+        finally:
+            self._loop = None
+
+    async def flush(self, timeout=5.0) -> bool:
+        """Дождаться отправки очереди (напр. сообщения о падении перед выходом)."""
+        if self._queue is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _send(self, session, method, data, files):
+        form = aiohttp.FormData()
+        for key, value in data.items():
+            form.add_field(key, str(value))
+        for key, (filename, content) in files.items():
+            form.add_field(key, content, filename=filename)
+        try:
+            async with session.post(f"{self.base_url}/{method}", data=form,
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as resp:
+                result = await resp.json(content_type=None)
+        except Exception as e:
+            self.failed += 1
+            self.logger.error(f"Telegram error: {e}")
+            return None
+        if not result or not result.get("ok"):
+            self.failed += 1
+            self.logger.error(f"Telegram {method} failed: {result}")
+        else:
+            self.sent += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+class AsyncRuntime:
+    """
+    Задачи одного event loop: фид, отправитель Telegram, торговый цикл,
+    heartbeat. Падение любой задачи — сообщение в Telegram и остановка всех.
+    """
+
+    def __init__(self, di):
+        self.di = di
+        self.cfg = di.config
+        self.feed = di.ws_feed
+        self.bot = di.telegram_bot
+        self.trading_loop = di.trading_loop
+        if not isinstance(self.feed, AsyncWSPriceFeed):
+            raise ValueError("AsyncRuntime требует AsyncWSPriceFeed (DependencyContainer(runtime='async'))")
+
+    async def run(self):
+        async with aiohttp.ClientSession() as session:
+            tasks = [asyncio.create_task(self.feed.run(session), name="ws-feed")]
+            if isinstance(self.bot, AsyncTelegramBot):
+                tasks.append(asyncio.create_task(self.bot.run(session), name="telegram"))
+            try:
+                await self.wait_for_first_snapshot()
+                tasks.append(asyncio.create_task(self._trading(), name="trading-loop"))
+                tasks.append(asyncio.create_task(self._heartbeat(), name="heartbeat"))
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    task.result()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"CRITICAL ERROR in async runtime: {e}", exc_info=True)
+                self.bot.send_error(f"CRITICAL FAILURE (async runtime):\n{e}")
+                if isinstance(self.bot, AsyncTelegramBot):
+                    await self.bot.flush()
+                raise
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def wait_for_first_snapshot(self, timeout=10.0):
+        logger.info("⏳ Waiting for first WS snapshot...")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if self.feed.get_prices():
+                logger.info(f"✅ First snapshot received: {dict(self.feed.get_prices())}")
+                return True
+            await asyncio.sleep(0.2)
+        logger.warning("❌ No WS snapshot received — starting anyway")
+        return False
+
+    async def _trading(self):
+        tl = self.trading_loop
+        logger.info(f"▶️ Trading loop task for symbols: {list(self.di.symbols)}")
+        while True:
+            changed = await self.feed.wait_for_updates(timeout=tl.wait_timeout, coalesce=tl.coalesce_seconds)
+            tl.cycle(changed)
+
+    async def _heartbeat(self):
+        interval = self.cfg.trading.monitoring_interval_minutes * 60
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                summary = await loop.run_in_executor(None, self.di.heartbeat.build)
+                self.bot.send_heartbeat(summary)
+            except Exception as e:
+                logger.error(f"Exception в heartbeat task: {e}")
+                self.bot.send_message(f"Heartbeat error: {e}")
+            await asyncio.sleep(interval)
+
+
+async def _main():
+    from dependency_container import DependencyContainer  # тяжёлый импорт — только здесь
+
+    loop = asyncio.get_running_loop()
+    # DI делает REST backfill и чтение KlineStore — блокирующее, в executor
+    di = await loop.run_in_executor(None, lambda: DependencyContainer(runtime="async"))
+    await AsyncRuntime(di).run()
+
+
+def run():
+    asyncio.run(_main())
@@ -0,0 +1,294 @@
+# ============================================================
+# BATCH TECHNICAL ANALYZER v1.1 — NumPy, все символы за один проход
+# ------------------------------------------------------------
+# Вход: матрицы (symbols × bars) для highs / lows / closes.
+# Выход: массивы (symbols,) последних значений EMA / RSI / ATR / ADX.
+# Рекуррентные индикаторы (EMA, сглаживание Уайлдера) идут циклом по
+# барам, но каждый шаг — векторная операция сразу по всем символам.
+# Порядок операций и суммирования повторяет EnhancedTechnicalAnalyzer,
+# поэтому результаты совпадают со скалярными методами побитово.
+# Там, где скалярный метод вернул бы None, здесь NaN.
+# v1.1: *_series — матрица (symbols × bars) значений на каждом баре,
+# как EnhancedTechnicalAnalyzer.*_series. Окна RSI / ATR — через cumsum
+# по всей матрице (совпадение с точностью до округления, окно из одних
+# нулей — ровно 0). Используется PrecomputedIndicators.precompute для
+# групп символов одинаковой длины (бэктест, param_sweep, walk_forward).
+# ============================================================
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class BatchTechnicalAnalyzer:
+    """
+    Векторизованный аналог EnhancedTechnicalAnalyzer.
+    Без состояния. Все матрицы одной формы (symbols × bars).
+    """
+
+    # ------------------------------------------------------------
+    # INTERNAL
+    # ------------------------------------------------------------
+    @staticmethod
+    def _matrix(values) -> np.ndarray:
+        arr = np.asarray(values, dtype=np.float64)
+        if arr.ndim == 1:
+            arr = arr[np.newaxis, :]
+        return arr
+
+    @staticmethod
+    def _nan(rows: int) -> np.ndarray:
+        return np.full(rows, np.nan)
+
+    @staticmethod
+    def _seq_sum(cols: np.ndarray) -> np.ndarray:
+        """Сумма по столбцам слева направо — как встроенный sum()."""
+        total = np.zeros(cols.shape[0])
+        for j in range(cols.shape[1]):
+            total = total + cols[:, j]
+        return total
+
+    @staticmethod
+    def _true_range(h: np.ndarray, l: np.ndarray, c: np.ndarray) -> np.ndarray:
+        prev_close = c[:, :-1]
+        return np.maximum(
+            np.maximum(h[:, 1:] - l[:, 1:], np.abs(h[:, 1:] - prev_close)),
+            np.abs(l[:, 1:] - prev_close),
+        )
+
+    # ------------------------------------------------------------
+    # EMA
+    # ------------------------------------------------------------
+    def ema(self, closes, period: int) -> np.ndarray:
+        c = self._matrix(closes)
+        rows, n = c.shape
+        if period <= 0 or n < period:
+            return self._nan(rows)
+        multiplier = 2 / (period + 1)
+        value = c[:, 0].copy()
+        for j in range(1, n):
+            value = (c[:, j] - value) * multiplier + value
+        return value
+
+    # ------------------------------------------------------------
+    # RSI
+    # ------------------------------------------------------------
+    def rsi(self, closes, period: int) -> np.ndarray:
+        c = self._matrix(closes)
+        rows, n = c.shape
+        if period <= 0 or n < period + 1:
+            return self._nan(rows)
+        delta = c[:, -period:] - c[:, -period - 1:-1]
+        gains = np.where(delta > 0, delta, 0.0)
+        losses = np.where(delta > 0, 0.0, np.abs(delta))
+        avg_gain = self._seq_sum(gains) / period
+        avg_loss = self._seq_sum(losses) / period
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = avg_gain / avg_loss
+            out = 100 - (100 / (1 + rs))
+        out = np.where(avg_gain == 0, 0.0, out)
+        return np.where(avg_loss == 0, 100.0, out)
+
+    # ------------------------------------------------------------
+    # ATR
+    # ------------------------------------------------------------
+    def atr(self, highs, lows, closes, period: int = 14) -> np.ndarray:
+        h, l, c = self._matrix(highs), self._matrix(lows), self._matrix(closes)
+        rows, n = c.shape
+        if n < period + 1:
+            return self._nan(rows)
+        trs = self._true_range(h[:, -period - 1:], l[:, -period - 1:], c[:, -period - 1:])
+        return self._seq_sum(trs) / period
+
+    # ------------------------------------------------------------
+    # ADX
+    # ------------------------------------------------------------
+    def adx(self, highs, lows, closes, period: int = 14) -> np.ndarray:
+        h, l, c = self._matrix(highs), self._matrix(lows), self._matrix(closes)
+        rows, n = c.shape
+        # скалярный adx требует len(dx) >= period, т.е. 2 * period баров
+        if n < 2 * period:
+            return self._nan(rows)
+
+        tr = self._true_range(h, l, c)
+        up = h[:, 1:] - h[:, :-1]
+        down = l[:, :-1] - l[:, 1:]
+        plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+        minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+
+        s_tr = self._seq_sum(tr[:, :period])
+        s_plus = self._seq_sum(plus_dm[:, :period])
+        s_minus = self._seq_sum(minus_dm[:, :period])
+
+        adx = None
+        dx_sum = np.zeros(rows)
+        steps = tr.shape[1] - period + 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i in range(steps):
+                if i > 0:
+                    j = period + i - 1
+                    s_tr = s_tr - (s_tr / period) + tr[:, j]
+                    s_plus = s_plus - (s_plus / period) + plus_dm[:, j]
+                    s_minus = s_minus - (s_minus / period) + minus_dm[:, j]
+                plus_di = np.where(s_tr != 0, 100 * s_plus / s_tr, 0.0)
+                minus_di = np.where(s_tr != 0, 100 * s_minus / s_tr, 0.0)
+                di_sum = plus_di + minus_di
+                dx = np.where(di_sum != 0, 100 * np.abs(plus_di - minus_di) / di_sum, 0.0)
+                if i < period:
+                    dx_sum = dx_sum + dx
+                    if i == period - 1:
+                        adx = dx_sum / period
+                else:
+                    adx = (adx * (period - 1) + dx) / period
+        return adx
+
+    # ------------------------------------------------------------
+    # SERIES — значение на каждом баре, (symbols × bars); NaN там, где
+    # EnhancedTechnicalAnalyzer.*_series даёт None
+    # ------------------------------------------------------------
+    @staticmethod
+    def _window_sum(values: np.ndarray, period: int) -> np.ndarray:
+        """Сумма последних period значений на каждой позиции; окно без ненулевых — ровно 0."""
+        rows, n = values.shape
+        out = np.full((rows, n), np.nan)
+        if n < period:
+            return out
+        total = np.cumsum(values, axis=1)
+        nonzero = np.cumsum(values != 0, axis=1)
+        window = out[:, period - 1:]
+        window[:, 0] = total[:, period - 1]
+        window[:, 1:] = total[:, period:] - total[:, :-period]
+        counts = nonzero[:, period - 1:].copy()
+        counts[:, 1:] -= nonzero[:, :-period]
+        window[counts == 0] = 0.0
+        return out
+
+    def ema_series(self, closes, period: int) -> np.ndarray:
+        c = self._matrix(closes)
+        rows, n = c.shape
+        out = np.full((rows, n), np.nan)
+        if period <= 0 or not n:
+            return out
+        multiplier = 2 / (period + 1)
+        value = c[:, 0].copy()
+        out[:, 0] = value
+        for j in range(1, n):
+            value = (c[:, j] - value) * multiplier + value
+            out[:, j] = value
+        out[:, :period - 1] = np.nan
+        return out
+
+    def rsi_series(self, closes, period: int) -> np.ndarray:
+        c = self._matrix(closes)
+        rows, n = c.shape
+        out = np.full((rows, n), np.nan)
+        if period <= 0 or n < 2:
+            return out
+        delta = c[:, 1:] - c[:, :-1]
+        gains = np.where(delta > 0, delta, 0.0)
+        losses = np.where(delta > 0, 0.0, np.abs(delta))
+        avg_gain = self._window_sum(gains, period) / period
+        avg_loss = self._window_sum(losses, period) / period
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+        rsi = np.where(avg_gain == 0, 0.0, rsi)
+        out[:, 1:] = np.where(avg_loss == 0, 100.0, rsi)
+        return out
+
+    def atr_series(self, highs, lows, closes, period: int = 14) -> np.ndarray:
+        h, l, c = self._matrix(highs), self._matrix(lows), self._matrix(closes)
+        rows, n = c.shape
+        out = np.full((rows, n), np.nan)
+        if n < 2 or period <= 0:
+            return out
+        out[:, 1:] = self._window_sum(self._true_range(h, l, c), period) / period
+        return out
+
+    def adx_series(self, highs, lows, closes, period: int = 14) -> np.ndarray:
+        h, l, c = self._matrix(highs), self._matrix(lows), self._matrix(closes)
+        rows, n = c.shape
+        out = np.full((rows, n), np.nan)
+        if n < 2 * period or period <= 0:
+            return out
+
+        tr = self._true_range(h, l, c)
+        up = h[:, 1:] - h[:, :-1]
+        down = l[:, :-1] - l[:, 1:]
+        plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+        minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+
+        s_tr = self._seq_sum(tr[:, :period])
+        s_plus = self._seq_sum(plus_dm[:, :period])
+        s_minus = self._seq_sum(minus_dm[:, :period])
+
+        adx = None
+        dx_sum = np.zeros(rows)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # i-й шаг — бар period + i (tr[j] относится к бару j + 1)
+            for i in range(tr.shape[1] - period + 1):
+                if i > 0:
+                    j = period + i - 1
+                    s_tr = s_tr - (s_tr / period) + tr[:, j]
+                    s_plus = s_plus - (s_plus / period) + plus_dm[:, j]
+                    s_minus = s_minus - (s_minus / period) + minus_dm[:, j]
+                plus_di = np.where(s_tr != 0, 100 * s_plus / s_tr, 0.0)
+                minus_di = np.where(s_tr != 0, 100 * s_minus / s_tr, 0.0)
+                di_sum = plus_di + minus_di
+                dx = np.where(di_sum != 0, 100 * np.abs(plus_di - minus_di) / di_sum, 0.0)
+                if i < period:
+                    dx_sum = dx_sum + dx
+                    if i == period - 1:
+                        adx = dx_sum / period
+                else:
+                    adx = (adx * (period - 1) + dx) / period
+                if adx is not None:
+                    out[:, period + i] = adx
+        return out
+
+    # ------------------------------------------------------------
+    # PUBLIC — ВСЕ ИНДИКАТОРЫ СТРАТЕГИЙ ЗА ОДИН ВЫЗОВ
+    # ------------------------------------------------------------
+    def analyze(self, highs, lows, closes, ema_fast: int = 7, ema_slow: int = 25,
+                period: int = 14) -> Dict[str, np.ndarray]:
+        return {
+            "ema_fast": self.ema(closes, ema_fast),
+            "ema_slow": self.ema(closes, ema_slow),
+            "rsi": self.rsi(closes, period),
+            "atr": self.atr(highs, lows, closes, period),
+            "adx": self.adx(highs, lows, closes, period),
+        }
+
+    def analyze_histories(self, histories: Dict[str, List[dict]], depth: Optional[int] = None,
+                          **params) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        histories: {symbol: [bar, ...]} — как MarketDataManager.history_ohlc.
+        Символы группируются по длине истории (каждая группа — одна матрица),
+        результат: {symbol: {"ema_fast": ..., ...}} с None вместо NaN.
+        """
+        groups: Dict[int, List[str]] = {}
+        for sym, bars in histories.items():
+            n = len(bars) if depth is None else min(len(bars), depth)
+            groups.setdefault(n, []).append(sym)
+
+        result = {}
+        for n, symbols in groups.items():
+            if n == 0:
+                for sym in symbols:
+                    result[sym] = {}
+                continue
+            h = np.empty((len(symbols), n))
+            l = np.empty((len(symbols), n))
+            c = np.empty((len(symbols), n))
+            for row, sym in enumerate(symbols):
+                bars = histories[sym]
+                bars = bars[len(bars) - n:]
+                h[row] = [bar["high"] for bar in bars]
+                l[row] = [bar["low"] for bar in bars]
+                c[row] = [bar["close"] for bar in bars]
+            values = self.analyze(h, l, c, **params)
+            for row, sym in enumerate(symbols):
+                result[sym] = {
+                    name: (None if np.isnan(arr[row]) else float(arr[row]))
+                    for name, arr in values.items()
+                }
+        return result
@@ -0,0 +1,168 @@
+# ============================================================
+# BENCH WS PARSE — пропускная способность WSPriceFeed.on_message
+# ------------------------------------------------------------
+# Сравнивает старый путь (json.loads + dict на бар + list.pop(0) +
+# скан списка символов) с текущим WSPriceFeed.on_message на одном и том
+# же потоке сообщений формата Bybit kline.1 (часть — чужие символы и
+# служебные сообщения). Соединение не открывается (autostart=False).
+# Читатель берёт цены раз в --read-every сообщений (старый путь — копия
+# dict, новый — снимок). Варианты чередуются в каждом повторе.
+#
+#   python bench_ws_parse.py [--messages 200000] [--symbols 7] [--repeat 3] [--read-every 10]
+# ============================================================
+
+import argparse
+import json
+import logging
+import random
+import time
+from types import SimpleNamespace
+
+import ws_price_feed
+from ws_price_feed import WSPriceFeed
+
+
+class LegacyParser:
+    """on_message до оптимизации (WS PRICE FEED v10.0), без сетевой части."""
+
+    def __init__(self, symbols, max_history=1000):
+        self.monitored_symbols = list(symbols)
+        self.max_history = max_history
+        self._ohlc_history = {sym: [] for sym in self.monitored_symbols}
+        self.prices = {}
+        self.last_update = None
+
+    def on_message(self, ws, message):
+        data = json.loads(message)
+        bars = data.get("data", [])
+        topic = data.get("topic", "")
+        if data.get("type") in ["snapshot", "update"] and topic.startswith("kline.1."):
+            symbol = topic.split(".")[-1]
+            if symbol not in self.monitored_symbols:
+                return
+            ohlc = None
+            for bar in bars:
+                ohlc = {
+                    "open": float(bar["open"]),
+                    "high": float(bar["high"]),
+                    "low": float(bar["low"]),
+                    "close": float(bar["close"]),
+                    "volume": float(bar.get("volume", 0.0)),
+                    "start": bar.get("start"),
+                    "end": bar.get("end"),
+                    "confirm": bar.get("confirm", False),
+                    "timestamp": bar.get("timestamp"),
+                }
+                history = self._ohlc_history[symbol]
+                if history and bar.get("start") and history[-1].get("start") == bar.get("start"):
+                    history[-1] = ohlc
+                else:
+                    history.append(ohlc)
+                if len(history) > self.max_history:
+                    history.pop(0)
+            if ohlc:
+                self.prices[symbol] = ohlc["close"]
+                self.last_update = time.time()
+
+    def get_prices(self):
+        return dict(self.prices)
+
+
+def make_messages(count, symbols, seed=7):
+    rnd = random.Random(seed)
+    prices = {sym: 100.0 for sym in symbols}
+    foreign = [f"X{i}USDT" for i in range(20)]
+    start = 1_700_000_000_000
+    messages = []
+    for i in range(count):
+        roll = rnd.random()
+        if roll < 0.05:
+            messages.append(json.dumps({"op": "pong", "success": True, "conn_id": "bench"}, separators=(",", ":")))
+            continue
+        if roll < 0.10:
+            messages.append(json.dumps({"topic": f"tickers.{rnd.choice(symbols)}", "type": "snapshot",
+                                        "data": {"lastPrice": "1.0"}}, separators=(",", ":")))
+            continue
+        sym = rnd.choice(foreign) if roll < 0.20 else rnd.choice(symbols)
+        p = prices.get(sym, 50.0) * (1 + rnd.uniform(-0.001, 0.001))
+        prices[sym] = p
+        bar_start = start + (i // 50) * 60_000
+        messages.append(json.dumps({
+            "topic": f"kline.1.{sym}",
+            "type": "update",
+            "ts": bar_start + 1234,
+            "data": [{
+                "start": bar_start, "end": bar_start + 59_999, "interval": "1",
+                "open": f"{p:.4f}", "close": f"{p * 1.0002:.4f}",
+                "high": f"{p * 1.001:.4f}", "low": f"{p * 0.999:.4f}",
+                "volume": f"{rnd.uniform(1, 100):.3f}", "turnover": f"{rnd.uniform(1e3, 1e5):.2f}",
+                "confirm": (i % 50) == 49, "timestamp": bar_start + 1234,
+            }],
+        }, separators=(",", ":")))
+    return messages
+
+
+def run_once(parser, messages, read_every):
+    """Один прогон; читатель (цены) — раз в read_every сообщений, как TradingLoop на пробуждении."""
+    on_message = parser.on_message
+    read = parser.get_prices
+    started = time.perf_counter()
+    for i, message in enumerate(messages):
+        on_message(None, message)
+        if read_every and i % read_every == 0:
+            read()
+    return time.perf_counter() - started
+
+
+def run(variants, messages, repeat, read_every):
+    """
+    Лучший из repeat прогонов на вариант, каждый — на свежем парсере.
+    Варианты чередуются внутри каждого повтора — шум машины делится поровну.
+    """
+    best = {}
+    for _ in range(repeat):
+        for name, make_parser, decode in variants:
+            saved = ws_price_feed._loads, ws_price_feed._decode_bars
+            if decode is not None:
+                ws_price_feed._loads, ws_price_feed._decode_bars = decode
+            try:
+                elapsed = run_once(make_parser(), messages, read_every)
+            finally:
+                ws_price_feed._loads, ws_price_feed._decode_bars = saved
+            best[name] = min(best.get(name, elapsed), elapsed)
+    return [(name, (len(messages) / best[name], best[name])) for name, _, _ in variants]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="WSPriceFeed.on_message throughput")
+    ap.add_argument("--messages", type=int, default=200_000)
+    ap.add_argument("--symbols", type=int, default=7)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--read-every", type=int, default=10, help="messages per reader call (0 — no reader)")
+    args = ap.parse_args()
+    logging.disable(logging.WARNING)
+
+    symbols = [f"S{i}USDT" for i in range(args.symbols)]
+    messages = make_messages(args.messages, symbols)
+    config = SimpleNamespace(trading=SimpleNamespace(symbols=symbols), market=None)
+
+    def feed():
+        return WSPriceFeed(config, autostart=False)
+
+    variants = [
+        ("legacy (json + dict + pop(0))", lambda: LegacyParser(symbols), None),
+        # путь без orjson: только массив data через stdlib
+        ("fast path, stdlib json", feed, (json.loads, ws_price_feed._decode_data_only)),
+    ]
+    if ws_price_feed._loads is not json.loads:
+        variants.append((f"fast path, {ws_price_feed._loads.__module__}", feed, None))
+    results = run(variants, messages, args.repeat, args.read_every)
+
+    base = results[0][1][0]
+    print(f"{len(messages)} messages, {len(symbols)} tracked symbols, reader every {args.read_every}")
+    for name, (rate, elapsed) in results:
+        print(f"  {name:<32} {rate:>12,.0f} msg/s  {elapsed:7.3f} s  x{rate / base:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 # Единый конфигурационный модуль:
 # - API настройки
 # - Trading настройки
+# - Market data настройки (REST backfill)
 # - Telegram настройки
 # - Logging настройки
 # - WebSocket параметры
@@ -58,10 +59,53 @@ class TradingSettings:
             "SYMBOLS",
             "BTCUSDT,ETHUSDT,SOLUSDT,XRPUSDT,BNBUSDT,DOGEUSDT,AVAXUSDT"
         )
-        self.symbols = raw.replace(" ", "").split(",")
+        # порядок сохраняется, дубли и пустые элементы отбрасываются
+        self.symbols = list(dict.fromkeys(s for s in raw.replace(" ", "").upper().split(",") if s))
 
     monitoring_interval_minutes: int = int(os.getenv("MONITOR_INTERVAL", "1"))
 
+    # event-driven цикл: окно склейки обновлений и таймаут ожидания
+    # (по таймауту — проверка мёртвого фида и heartbeat)
+    loop_coalesce_ms: float = float(os.getenv("LOOP_COALESCE_MS", "2"))
+    loop_wait_timeout: float = float(os.getenv("LOOP_WAIT_TIMEOUT", "1.0"))
+    # strategy.on_tick (TP/SL/trailing, bars_lifetime) — не чаще раза в N сек,
+    # как в опросном цикле; сигналы на вход — на каждое обновление
+    loop_tick_seconds: float = float(os.getenv("LOOP_TICK_SECONDS", "1.0"))
+
+    # "thread" — потоки (по умолчанию), "async" — один event loop (async_runtime)
+    runtime: str = os.getenv("RUNTIME", "thread").strip().lower()
+
+
+# ============================================================
+# MARKET DATA SETTINGS (REST backfill + локальный кэш свечей)
+# ============================================================
+@dataclass
+class MarketDataSettings:
+    rest_url: str = os.getenv("BYBIT_REST_URL", "https://api.bybit.com")
+    backfill_workers: int = int(os.getenv("BACKFILL_WORKERS", "8"))
+    backfill_retries: int = int(os.getenv("BACKFILL_RETRIES", "3"))
+    backfill_timeout: float = float(os.getenv("BACKFILL_TIMEOUT", "10"))
+    kline_cache_dir: str = os.getenv("KLINE_CACHE_DIR", "data/kline_cache")
+    # relay kline.1 (WSPriceFeed); локальный стенд — synthetic_relay.py
+    ws_url: str = os.getenv("WS_URL", "ws://146.190.89.166:8765/relay")
+    # SQLite-хранилище 1m свечей; пустое значение — только JSON-кэш backfill
+    kline_store_path: str = os.getenv("KLINE_STORE_PATH", "data/klines.sqlite")
+    # топиков в одном WS subscribe-сообщении (лимит на сообщение у Bybit)
+    ws_subscribe_chunk: int = int(os.getenv("WS_SUBSCRIBE_CHUNK", "10"))
+    # здоровье фида по символам (TradingLoop-алерты)
+    symbol_stale_seconds: float = float(os.getenv("SYMBOL_STALE_SECONDS", "30"))
+    feed_lag_alert_ms: float = float(os.getenv("FEED_LAG_ALERT_MS", "2000"))
+    health_check_seconds: float = float(os.getenv("HEALTH_CHECK_SECONDS", "5"))
+    # захват сырого трафика relay (gzip, append-only); пусто — не писать
+    relay_capture_path: str = os.getenv("RELAY_CAPTURE_PATH", "")
+
+    # старшие таймфреймы (минуты), агрегируемые из kline.1 без подписок
+    timeframes: list = None
+
+    def __post_init__(self):
+        raw = os.getenv("TIMEFRAMES", "5,15,60")
+        self.timeframes = [int(tf) for tf in raw.replace(" ", "").split(",") if tf]
+
 
 # ============================================================
 # LOGGING SETTINGS
@@ -94,6 +138,7 @@ class Config:
     def __init__(self):
         self.api = APISettings()
         self.trading = TradingSettings()
+        self.market = MarketDataSettings()
         self.logging = LoggingSettings()
         self.ws = WSSettings()
 
@@ -0,0 +1,432 @@
+# ============================================================
+# DEBUG LOG CODEC v1.1 — компактный бинарный формат debug-логов
+# ------------------------------------------------------------
+# Формат файла:
+#   MAGIC, затем записи <varint длина><тело>
+#   тело[0] — тип записи:
+#     RESET  — сброс таблицы строк и базы времени (начало сегмента);
+#              с v1.1 тело дополнено SEGMENT_SYNC — сегменты находятся
+#              поиском с конца файла (tail_events: хвост без чтения с нуля)
+#     STRING — <varint id><utf-8>: интернированная строка
+#     EVENT  — <varint Δt мкс (zigzag)><varint id message><varint n>
+#              n × (<varint id ключа><значение>)
+# Значения: None/bool, zigzag-int, float64, интернированная или
+# сырая строка, dict и list (рекурсивно).
+# Декодер: python debug_log_codec.py decode FILE --format json|csv
+#          [--message M] [--symbol S] [--since T] [--until T]
+# ============================================================
+
+import argparse
+import csv
+import json
+import struct
+import sys
+from datetime import datetime
+
+MAGIC = b"DBGLOG1\n"
+SEGMENT_SYNC = b"\xffDBGSEG\xff"
+
+REC_RESET = 0
+REC_STRING = 1
+REC_EVENT = 2
+
+T_NONE = 0
+T_TRUE = 1
+T_FALSE = 2
+T_INT = 3
+T_FLOAT = 4
+T_STR_REF = 5
+T_STR = 6
+T_DICT = 7
+T_LIST = 8
+
+MAX_INTERNED_LEN = 24
+MAX_INTERNED = 65535
+
+_F64 = struct.Struct("<d")
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+# RESET с меткой синхронизации: <varint длина><REC_RESET><SEGMENT_SYNC>
+SEGMENT_MARKER = bytes([1 + len(SEGMENT_SYNC), REC_RESET]) + SEGMENT_SYNC
+
+
+def _zigzag(value):
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value):
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+class BinaryLogEncoder:
+    """
+    Кодирует события (ts, message, details) в записи бинарного формата.
+    Состояние (таблица строк, последний ts) живёт до reset().
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._strings = {}
+        self._last_ts_us = 0
+
+    def segment_start(self):
+        """Запись RESET: декодер начинает новую таблицу строк и базу времени."""
+        self.reset()
+        return SEGMENT_MARKER
+
+    def encode(self, ts, message, details):
+        """
+        Атомарно: при исключении таблица строк и база времени откатываются —
+        иначе строки, чьи STRING-записи остались в выброшенном defs, дальше
+        ссылались бы на id без определения.
+        """
+        defs = bytearray()
+        body = bytearray([REC_EVENT])
+        interned = len(self._strings)
+        ts_us = int(ts * 1_000_000)
+        try:
+            _varint(_zigzag(ts_us - self._last_ts_us), body)
+            _varint(self._intern(message, defs, force=True), body)
+            _varint(len(details), body)
+            for key, value in details.items():
+                _varint(self._intern(str(key), defs, force=True), body)
+                self._value(value, body, defs)
+        except BaseException:
+            if len(self._strings) > interned:
+                # id выдаются подряд, новые строки — в хвосте dict
+                for text in list(self._strings)[interned:]:
+                    del self._strings[text]
+            raise
+        self._last_ts_us = ts_us
+        return bytes(defs) + self._record(body)
+
+    def _record(self, body):
+        out = bytearray()
+        _varint(len(body), out)
+        out += body
+        return bytes(out)
+
+    def _intern(self, text, defs, force=False):
+        sid = self._strings.get(text)
+        if sid is not None:
+            return sid
+        if not force and (len(text) > MAX_INTERNED_LEN or len(self._strings) >= MAX_INTERNED):
+            return None
+        sid = len(self._strings)
+        self._strings[text] = sid
+        rec = bytearray([REC_STRING])
+        _varint(sid, rec)
+        rec += text.encode("utf-8")
+        defs += self._record(rec)
+        return sid
+
+    def _value(self, value, out, defs):
+        if value is None:
+            out.append(T_NONE)
+        elif value is True:
+            out.append(T_TRUE)
+        elif value is False:
+            out.append(T_FALSE)
+        elif isinstance(value, int) and -(1 << 62) < value < (1 << 62):
+            out.append(T_INT)
+            _varint(_zigzag(value), out)
+        elif isinstance(value, float):
+            out.append(T_FLOAT)
+            out += _F64.pack(value)
+        elif isinstance(value, dict):
+            out.append(T_DICT)
+            _varint(len(value), out)
+            for k, v in list(value.items()):
+                _varint(self._intern(str(k), defs, force=True), out)
+                self._value(v, out, defs)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            items = list(value)
+            out.append(T_LIST)
+            _varint(len(items), out)
+            for v in items:
+                self._value(v, out, defs)
+        else:
+            text = value if isinstance(value, str) else str(value)
+            sid = self._intern(text, defs)
+            if sid is not None:
+                out.append(T_STR_REF)
+                _varint(sid, out)
+            else:
+                raw = text.encode("utf-8")
+                out.append(T_STR)
+                _varint(len(raw), out)
+                out += raw
+
+
+# ============================================================
+# DECODER
+# ============================================================
+class _Reader:
+    __slots__ = ("buf", "pos")
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def varint(self):
+        result = shift = 0
+        buf = self.buf
+        while True:
+            b = buf[self.pos]
+            self.pos += 1
+            result |= (b & 0x7F) << shift
+            if not b & 0x80:
+                return result
+            shift += 7
+
+
+def _read_varint(stream):
+    result = shift = 0
+    while True:
+        b = stream.read(1)
+        if not b:
+            return None
+        result |= (b[0] & 0x7F) << shift
+        if not b[0] & 0x80:
+            return result
+        shift += 7
+
+
+def _read_value(r, strings):
+    tag = r.buf[r.pos]
+    r.pos += 1
+    if tag == T_NONE:
+        return None
+    if tag == T_TRUE:
+        return True
+    if tag == T_FALSE:
+        return False
+    if tag == T_INT:
+        return _unzigzag(r.varint())
+    if tag == T_FLOAT:
+        value = _F64.unpack_from(r.buf, r.pos)[0]
+        r.pos += 8
+        return value
+    if tag == T_STR_REF:
+        return strings[r.varint()]
+    if tag == T_STR:
+        n = r.varint()
+        text = bytes(r.buf[r.pos:r.pos + n]).decode("utf-8")
+        r.pos += n
+        return text
+    if tag == T_DICT:
+        n = r.varint()
+        return {strings[r.varint()]: _read_value(r, strings) for _ in range(n)}
+    if tag == T_LIST:
+        n = r.varint()
+        return [_read_value(r, strings) for _ in range(n)]
+    raise ValueError(f"Unknown value tag {tag} at {r.pos - 1}")
+
+
+def iter_events(stream, start=None, end=None):
+    """
+    Потоково читает бинарный лог и отдаёт события как
+    (ts: float, message: str, details: dict). Обрезанный хвост игнорируется.
+    start — смещение начала сегмента (RESET) вместо начала файла,
+    end — граница: записи, не уместившиеся до неё, не читаются.
+    """
+    if start is None:
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a binary debug log (bad magic)")
+    else:
+        stream.seek(start)
+    strings = {}
+    last_ts_us = 0
+    while True:
+        length = _read_varint(stream)
+        if length is None:
+            return
+        body = stream.read(length)
+        if len(body) < length or (end is not None and stream.tell() > end):
+            return
+        kind = body[0]
+        r = _Reader(body)
+        r.pos = 1
+        if kind == REC_RESET:
+            strings = {}
+            last_ts_us = 0
+        elif kind == REC_STRING:
+            sid = r.varint()
+            strings[sid] = bytes(body[r.pos:]).decode("utf-8")
+        elif kind == REC_EVENT:
+            last_ts_us += _unzigzag(r.varint())
+            message = strings[r.varint()]
+            n = r.varint()
+            details = {}
+            for _ in range(n):
+                key = strings[r.varint()]
+                details[key] = _read_value(r, strings)
+            yield last_ts_us / 1_000_000, message, details
+        else:
+            raise ValueError(f"Unknown record type {kind}")
+
+
+def segment_offsets(stream, end, block_size=64 * 1024):
+    """Смещения маркеров сегментов до end, от последнего к первому (поиск с конца блоками)."""
+    marker = SEGMENT_MARKER
+    pos = end
+    carry = b""
+    while pos > 0:
+        step = min(block_size, pos)
+        pos -= step
+        stream.seek(pos)
+        # хвост предыдущего блока — маркер может лежать на стыке
+        buf = stream.read(step) + carry
+        i = len(buf)
+        while True:
+            i = buf.rfind(marker, 0, i)
+            if i < 0:
+                break
+            if pos + i + len(marker) <= end:
+                yield pos + i
+        carry = buf[:len(marker) - 1]
+
+
+def tail_events(stream, n, end):
+    """
+    Последние n событий до end: сегменты читаются с конца, пока не наберётся n.
+    None — в файле нет маркеров сегментов (записан до v1.1), нужен полный проход.
+    """
+    segments = []
+    total = 0
+    seg_end = end
+    found = False
+    for offset in segment_offsets(stream, end):
+        try:
+            events = list(iter_events(stream, start=offset, end=seg_end))
+        except (KeyError, IndexError, ValueError, UnicodeDecodeError, struct.error):
+            continue  # совпадение байтов внутри записи, а не маркер
+        found = True
+        segments.append(events)
+        total += len(events)
+        seg_end = offset
+        if total >= n:
+            break
+    if not found:
+        return None
+    tail = [event for events in reversed(segments) for event in events]
+    return tail[-n:] if n else []
+
+
+def to_record(ts, message, details):
+    """Событие в том же виде, что пишет JSON/JSONL DebugLogger."""
+    return {
+        "timestamp": datetime.fromtimestamp(ts).strftime(_TS_FORMAT),
+        "message": message,
+        "details": details,
+    }
+
+
+# ============================================================
+# CLI
+# ============================================================
+def _parse_time(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _iter_filtered(paths, messages=None, symbols=None, since=None, until=None):
+    for path in paths:
+        with open(path, "rb") as f:
+            for ts, message, details in iter_events(f):
+                if since is not None and ts < since:
+                    continue
+                if until is not None and ts > until:
+                    continue
+                if messages and message not in messages:
+                    continue
+                if symbols and details.get("symbol") not in symbols:
+                    continue
+                yield ts, message, details
+
+
+def _decode(args):
+    events = _iter_filtered(
+        args.files,
+        messages=set(args.message or []),
+        symbols=set(args.symbol or []),
+        since=_parse_time(args.since),
+        until=_parse_time(args.until),
+    )
+    out = sys.stdout
+    if args.format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["timestamp", "message", "symbol", "details"])
+        for ts, message, details in events:
+            writer.writerow([
+                datetime.fromtimestamp(ts).strftime(_TS_FORMAT),
+                message,
+                details.get("symbol", ""),
+                json.dumps(details, ensure_ascii=False, default=str),
+            ])
+    else:
+        for ts, message, details in events:
+            out.write(json.dumps(to_record(ts, message, details), ensure_ascii=False, default=str))
+            out.write("\n")
+
+
+def _encode(args):
+    """Конвертация legacy JSON / JSONL лога в бинарный формат."""
+    with open(args.src, "r", encoding="utf-8") as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        records = json.loads(stripped)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    encoder = BinaryLogEncoder()
+    with open(args.dst, "wb") as out:
+        out.write(MAGIC)
+        out.write(encoder.segment_start())
+        for rec in records:
+            ts = datetime.strptime(rec["timestamp"], _TS_FORMAT).timestamp()
+            out.write(encoder.encode(ts, rec.get("message", ""), rec.get("details") or {}))
+    print(f"{len(records)} records: {args.src} -> {args.dst}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Binary DebugLogger decoder")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    dec = sub.add_parser("decode", help="вывести записи как JSON Lines или CSV")
+    dec.add_argument("files", nargs="+")
+    dec.add_argument("--format", choices=("json", "csv"), default="json")
+    dec.add_argument("--message", action="append", help="фильтр по message (можно несколько)")
+    dec.add_argument("--symbol", action="append", help="фильтр по details.symbol (можно несколько)")
+    dec.add_argument("--since", help="epoch секунды или ISO-время")
+    dec.add_argument("--until", help="epoch секунды или ISO-время")
+    dec.set_defaults(func=_decode)
+
+    enc = sub.add_parser("encode", help="конвертировать JSON/JSONL лог в бинарный")
+    enc.add_argument("src")
+    enc.add_argument("dst")
+    enc.set_defaults(func=_encode)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,192 @@
+# ============================================================
+# DEBUG LOGGER v2.0 — JSON / JSONL (append-only) debug-логгер
+# ------------------------------------------------------------
+# Режимы:
+# - "json"  — legacy: весь deque переписывается в файл на каждый log();
+#             история грузится целиком (json.load всего файла) до первой
+#             записи — без неё запись затёрла бы файл. Ленивая и хвостовая
+#             загрузка ниже — только для "jsonl" / "binary"
+# - "jsonl" — одна JSON-строка на событие, запись через очередь
+#             фоновым writer-потоком (батчи, ротация, счётчик дропов)
+# - "binary" — то же, но компактные бинарные записи (debug_log_codec)
+# В режиме "jsonl" log() не трогает диск в потоке вызывающего.
+# Фильтры до записи: уровни, sampling и rate cap по типу сообщения.
+# Callable-значения в kwargs вычисляются только если событие будет записано.
+# dict / list в kwargs копируются в момент log(): writer пишет значения на
+# момент события, а не на момент сброса батча.
+# История из файла подгружается лениво (при первом чтении) и только хвост:
+# jsonl — блоками с конца файла, binary — сегменты (RESET с меткой, новый
+# каждые segment_bytes) с конца, пока не наберётся preload_records; старт
+# и загрузка не зависят от размера файла. Бинарный файл без меток
+# (записан до debug_log_codec v1.1) читается с начала.
+# Глобального выключателя нет: молчит только логгер, на котором не вызван
+# enable() (стратегии бэктеста — debug_log=False), остальные пишут как обычно.
+# ============================================================
+
 import json
+import os
+import queue
+import random
+import atexit
 import threading
+import time
 from datetime import datetime
 from collections import deque
-import os
+from itertools import islice
+
+from debug_log_codec import MAGIC, BinaryLogEncoder, iter_events, tail_events, to_record
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+_STOP = object()
+
+_DIGEST_ID_KEYS = ("id", "symbol", "start", "open_time", "close_time")
+
+
+_CONTAINERS = (dict, list, tuple, set, frozenset, deque)
+
+
+def _snapshot(value):
+    """Копия контейнеров (рекурсивно), скаляры — как есть."""
+    if isinstance(value, dict):
+        return {k: _snapshot(v) if isinstance(v, _CONTAINERS) else v for k, v in list(value.items())}
+    if isinstance(value, _CONTAINERS):
+        return [_snapshot(v) if isinstance(v, _CONTAINERS) else v for v in list(value)]
+    return value
+
+
+def _repr_details(details):
+    out = {}
+    for key, value in list(details.items()):
+        try:
+            out[str(key)] = repr(value)
+        except Exception as e:
+            out[str(key)] = f"<repr error: {e}>"
+    return out
+
 
 class DebugLogger:
-    def __init__(self, path, max_records=10000):
+    def __init__(self, path, max_records=10000, mode="json",
+                 queue_size=10000, flush_interval=0.5, batch_size=500,
+                 rotate_bytes=50 * 1024 * 1024, rotate_seconds=None, backup_count=3,
+                 level=DEBUG, sampling=None, rate_limits=None, preload_records=None,
+                 segment_bytes=1024 * 1024):
         self.enabled = False
         self.log_path = path
         self.lock = threading.Lock()
         self.max_records = max_records
+        self.mode = mode
         self._cache = deque(maxlen=max_records)
-        self._load_from_file()
 
-    def _load_from_file(self):
-        """Загружает логи из файла при инициализации logger, если файл существует."""
-        if os.path.exists(self.log_path):
+        # --- append-only режим: очередь + writer-поток ---
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.dropped = 0
+        self.written = 0
+        self._queue = None
+        self._writer = None
+        self._file = None
+        self._opened_at = None
+        self._codec = BinaryLogEncoder() if mode == "binary" else None
+        self.segment_bytes = segment_bytes  # binary: новый сегмент не реже — граница чтения хвоста
+        self._segment_at = 0
+
+        # --- фильтры: уровень, sampling (0..1) и rate cap (событий/сек) по message ---
+        self.level = level
+        self._sampling = dict(sampling or {})
+        self._rate_limits = dict(rate_limits or {})
+        self._rate_windows = {}
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+        # --- ленивая подгрузка истории: None — последние max_records, 0 — не грузить ---
+        self.preload_records = max_records if preload_records is None else min(preload_records, max_records)
+        if mode == "json":
+            # legacy-режим переписывает файл целиком из памяти: без полной
+            # истории первая же запись затёрла бы файл
+            self.preload_records = max_records
+        self._loaded = self.preload_records == 0
+        try:
+            # граница истории: всё, что дальше, допишет уже этот процесс
+            self._history_end = os.path.getsize(path)
+        except OSError:
+            self._history_end = 0
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self.lock:
+            if self._loaded:
+                return
+            history = deque(maxlen=self.max_records)
+            self._load_from_file(history)
+            history.extend(self._cache)
+            self._cache = history
+            self._loaded = True
+
+    def _load_from_file(self, history):
+        """Загружает из файла последние preload_records записей (до границы _history_end)."""
+        n = self.preload_records
+        try:
+            if self.mode == "jsonl":
+                history.extend(self._tail_lines(n))
+                return
+            if self.mode == "binary":
+                with open(self.log_path, "rb") as f:
+                    tail = tail_events(f, n, self._history_end)
+                    if tail is None:
+                        # файл без меток сегментов — только полный проход
+                        f.seek(0)
+                        tail = deque(iter_events(f, end=self._history_end), maxlen=n)
+                history.extend(to_record(*event) for event in tail)
+                return
+            with open(self.log_path, "r", encoding='utf-8') as f:
+                data = json.load(f)
+                if isinstance(data, list):
+                    history.extend(data[-n:])
+        except Exception as e:
+            print(f"[DebugLogger] Load error: {e}")
+
+    def _tail_lines(self, n, block_size=64 * 1024):
+        """Читает JSONL с конца блоками, пока не наберёт n строк."""
+        with open(self.log_path, "rb") as f:
+            pos = self._history_end
+            buf = b""
+            while pos > 0 and buf.count(b"\n") <= n:
+                step = min(block_size, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+        lines = buf.split(b"\n")
+        if pos > 0:
+            lines = lines[1:]  # первая строка блока может быть обрезана
+        records = []
+        for line in lines[-(n + 1):]:
+            line = line.strip()
+            if not line:
+                continue
             try:
-                with open(self.log_path, "r", encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        for item in data[-self.max_records:]:
-                            self._cache.append(item)
-            except Exception as e:
-                print(f"[DebugLogger] Load error: {e}")
+                records.append(json.loads(line))
+            except ValueError:
+                # оборванная строка (процесс убит посреди записи) — пропускаем только её
+                continue
+        return records[-n:]
+
+    def records(self, limit=None):
+        """Записи из памяти (история файла + новые события) в виде dict."""
+        self._ensure_loaded()
+        items = list(self._cache)
+        if limit is not None:
+            items = items[-limit:]
+        return [item if isinstance(item, dict) else to_record(*item) for item in items]
 
     def enable(self):
         self.enabled = True
@@ -31,14 +194,87 @@ class DebugLogger:
     def disable(self):
         self.enabled = False
 
+    def set_level(self, level):
+        self.level = level
+
+    def set_sampling(self, message, rate):
+        """Записывать только долю rate (0..1) событий message."""
+        if rate is None or rate >= 1.0:
+            self._sampling.pop(message, None)
+        else:
+            self._sampling[message] = rate
+
+    def set_rate_limit(self, message, per_second):
+        """Не больше per_second событий message в секунду, остальные отбрасываются."""
+        if per_second is None:
+            self._rate_limits.pop(message, None)
+            self._rate_windows.pop(message, None)
+        else:
+            self._rate_limits[message] = per_second
+
+    def debug(self, message, **kwargs):
+        if self.enabled:
+            self._log(DEBUG, message, kwargs)
+
+    def info(self, message, **kwargs):
+        if self.enabled:
+            self._log(INFO, message, kwargs)
+
+    def warning(self, message, **kwargs):
+        if self.enabled:
+            self._log(WARNING, message, kwargs)
+
+    def error(self, message, **kwargs):
+        if self.enabled:
+            self._log(ERROR, message, kwargs)
+
     def log(self, message, **kwargs):
-        if not self.enabled:
+        if self.enabled:
+            self._log(INFO, message, kwargs)
+
+    def _should_record(self, level, message):
+        if level < self.level:
+            return False
+        rate = self._sampling.get(message)
+        if rate is not None and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        cap = self._rate_limits.get(message)
+        if cap is not None:
+            now = time.monotonic()
+            window = self._rate_windows.get(message)
+            if window is None or now - window[0] >= 1.0:
+                self._rate_windows[message] = [now, 1]
+            elif window[1] >= cap:
+                self.rate_limited += 1
+                return False
+            else:
+                window[1] += 1
+        return True
+
+    def _log(self, level, message, kwargs):
+        if not self.enabled or not self._should_record(level, message):
+            return
+        for key, value in kwargs.items():
+            if callable(value):
+                try:
+                    kwargs[key] = value()
+                except Exception as e:
+                    kwargs[key] = f"<payload error: {e}>"
+        if self.mode != "json":
+            # сериализация — позже, в writer-потоке: фиксируем значения на момент log()
+            for key, value in kwargs.items():
+                if isinstance(value, _CONTAINERS):
+                    kwargs[key] = _snapshot(value)
+            self._enqueue((time.time(), message, kwargs))
             return
         entry = {
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
             "message": message,
             "details": kwargs
         }
+        # legacy-режим переписывает файл целиком — история нужна до первой записи
+        self._ensure_loaded()
         with self.lock:
             self._cache.append(entry)
             try:
@@ -51,8 +287,225 @@ class DebugLogger:
     def clear(self):
         with self.lock:
             self._cache.clear()
+            self._loaded = True
             try:
+                if self._file is not None:
+                    self._file.seek(0)
+                    self._file.truncate()
+                    self._write_header()
+                    self._opened_at = time.time()
+                    return
                 with open(self.log_path, "w", encoding='utf-8') as f:
-                    json.dump([], f)
+                    if self.mode == "json":
+                        json.dump([], f)
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------
+    # APPEND-ONLY — очередь и writer-поток
+    # ------------------------------------------------------------
+    def _enqueue(self, item):
+        if self._writer is None:
+            self._start_writer()
+        if self._loaded:
+            self._cache.append(item)
+        else:
+            # _ensure_loaded подменяет _cache под lock — иначе запись ушла бы в старый deque
+            with self.lock:
+                self._cache.append(item)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_writer(self):
+        with self.lock:
+            if self._writer is not None:
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._writer = threading.Thread(
+                target=self._writer_loop, name=f"DebugLogger[{self.log_path}]", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
+
+    def flush(self, timeout=5.0):
+        """Блокирует до записи на диск всего, что уже стоит в очереди."""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        writer = self._writer
+        if writer is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        writer.join(timeout)
+        self._writer = None
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "rate_limited": self.rate_limited,
+        }
+
+    # ------------------------------------------------------------
+    # DIGEST — компактное представление больших коллекций
+    # ------------------------------------------------------------
+    @staticmethod
+    def digest(collection, max_keys=10):
+        """
+        Вместо полной копии коллекции: количество элементов и
+        идентификатор последнего (для dict — первые max_keys ключей).
+        """
+        if collection is None:
+            return None
+        if isinstance(collection, dict):
+            return {"count": len(collection), "keys": list(islice(collection, max_keys))}
+        count = len(collection)
+        last = collection[-1] if count and isinstance(collection, (list, tuple, deque)) else None
+        if isinstance(last, dict):
+            last = {k: last[k] for k in _DIGEST_ID_KEYS if k in last}
+        return {"count": count, "last": last}
+
+    def _writer_loop(self):
+        q = self._queue
+        while True:
+            try:
+                item = q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self.lock:
+                    self._maybe_rotate()
+                continue
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = []
+            waiters = []
+            stop = False
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    records.append(item)
+
+            if records:
+                self._write_batch(records)
+            for w in waiters:
+                w.set()
+            if stop:
+                with self.lock:
+                    if self._file is not None:
+                        self._file.close()
+                        self._file = None
+                return
+
+    def _write_batch(self, records):
+        with self.lock:
+            try:
+                self._maybe_rotate()
+                if self._file is None:
+                    self._open_file()
+                # кодируем после открытия/ротации: бинарный сегмент начинается с чистой таблицы строк
+                payload = self._encode_batch(records)
+                self._file.write(payload)
+                if self._codec is not None and self._file.tell() - self._segment_at >= self.segment_bytes:
+                    # следующий батч — в новом сегменте: хвост файла читается без начала
+                    self._file.write(self._codec.segment_start())
+                    self._segment_at = self._file.tell()
+                self._file.flush()
+                self.written += len(records)
+            except Exception as e:
+                print(f"[DebugLogger] Write error: {e}")
+
+    def _encode_batch(self, records):
+        if self._codec is not None:
+            chunks = []
+            for ts, message, details in records:
+                try:
+                    chunks.append(self._codec.encode(ts, message, details))
+                except Exception:
+                    # encode атомарен (таблица строк откатывается) — повтор через repr безопасен
+                    try:
+                        chunks.append(self._codec.encode(ts, message, _repr_details(details)))
+                    except Exception as e:
+                        print(f"[DebugLogger] Encode error ({message}): {e}")
+            return b"".join(chunks)
+        lines = []
+        for ts, message, details in records:
+            entry = {
+                "timestamp": datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "message": message,
+                "details": details,
+            }
+            try:
+                line = json.dumps(entry, ensure_ascii=False, default=str)
             except Exception:
-                pass
\ No newline at end of file
+                # одна плохая запись не должна ронять весь батч
+                entry["details"] = _repr_details(details)
+                try:
+                    line = json.dumps(entry, ensure_ascii=False, default=str)
+                except Exception as e:
+                    print(f"[DebugLogger] Encode error ({message}): {e}")
+                    continue
+            lines.append(line)
+        if not lines:
+            return b""
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def _open_file(self):
+        self._file = open(self.log_path, "ab")
+        self._write_header()
+        self._opened_at = time.time()
+
+    def _write_header(self):
+        if self._codec is None:
+            return
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        # новый сегмент: таблица строк кодека начинается заново
+        self._file.write(self._codec.segment_start())
+        self._segment_at = self._file.tell()
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        size = self._file.tell()
+        if size == 0:
+            return
+        too_big = self.rotate_bytes and size >= self.rotate_bytes
+        too_old = self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds
+        if not (too_big or too_old):
+            return
+        self._file.close()
+        self._file = None
+        try:
+            if self.backup_count > 0:
+                for i in range(self.backup_count - 1, 0, -1):
+                    src = f"{self.log_path}.{i}"
+                    if os.path.exists(src):
+                        os.replace(src, f"{self.log_path}.{i + 1}")
+                os.replace(self.log_path, f"{self.log_path}.1")
+            else:
+                os.remove(self.log_path)
+        except Exception as e:
+            print(f"[DebugLogger] Rotate error: {e}")
+        self._open_file()
@@ -1,5 +1,7 @@
 # ============================================================
 # dependency_container.py — v9.5 DI: STRICT portfolio injection
+# v9.6: runtime="async" — AsyncTelegramBot / AsyncWSPriceFeed (async_runtime)
+# v9.7: в async-режиме TradingLoop без heartbeat — его шлёт задача AsyncRuntime
 # ------------------------------------------------------------
 # Портфели и стратегии создаются только внутри AIStrategyManager!
 # Точка входа — только через manager и его parallel_step.
@@ -8,11 +10,16 @@
 from config import Config
 from telegram_bot import TelegramBot
 from enhanced_technical_analyzer import EnhancedTechnicalAnalyzer
+from streaming_indicators import StreamingIndicatorEngine
+from indicator_cache import IndicatorCache
 from engine_utils import EngineUtils
 from validation_service import ValidationService
 from ai_strategy_manager import AIStrategyManager
 from freedom_manager import FreedomManager
 from ws_price_feed import WSPriceFeed
+from kline_store import KlineStore
+from relay_capture import RelayRecorder
+from symbol_registry import SymbolRegistry
 from market_data_manager import MarketDataManager
 from ab_testing_engine import ABTestingEngine
 from trading_engine import TradingEngine
@@ -25,16 +32,23 @@ class DependencyContainer:
     DI-контейнер: создаёт все модули и связывает зависимости строго по контракту.
     """
 
-    def __init__(self):
+    def __init__(self, runtime=None):
         # ------------------------------------------------------------
         # CONFIG
         # ------------------------------------------------------------
         self.config = Config()
+        # "thread" — потоки (по умолчанию), "async" — задачи одного event loop
+        self.runtime = runtime or self.config.trading.runtime
+        if self.runtime == "async":
+            from async_runtime import AsyncTelegramBot, AsyncWSPriceFeed
+            bot_cls, feed_cls = AsyncTelegramBot, AsyncWSPriceFeed
+        else:
+            bot_cls, feed_cls = TelegramBot, WSPriceFeed
 
         # ------------------------------------------------------------
         # TELEGRAM BOT
         # ------------------------------------------------------------
-        self.telegram_bot = TelegramBot(
+        self.telegram_bot = bot_cls(
             token=self.config.api.telegram_token,
             chat_id=self.config.api.telegram_chat_id
         )
@@ -43,6 +57,8 @@ class DependencyContainer:
         # UTILS / ANALYZER / VALIDATOR
         # ------------------------------------------------------------
         self.analyzer = EnhancedTechnicalAnalyzer()
+        self.indicators = StreamingIndicatorEngine()
+        self.indicator_cache = IndicatorCache(self.indicators)  # один расчёт на бар для всех стратегий
         self.utils = EngineUtils()
         self.validator = ValidationService()
 
@@ -53,19 +69,37 @@ class DependencyContainer:
         self.ai_manager = AIStrategyManager(
             self.freedom_manager,
             self.config,
-            self.analyzer
+            self.analyzer,
+            indicators=self.indicator_cache
         )
         self.freedom_manager.set_ai_manager(self.ai_manager)
 
+        # ------------------------------------------------------------
+        # SYMBOLS (config.trading.symbols → единый реестр)
+        # ------------------------------------------------------------
+        self.symbols = SymbolRegistry.from_config(self.config)
+
+        # ------------------------------------------------------------
+        # KLINE STORE (SQLite, 1m свечи)
+        # ------------------------------------------------------------
+        store_path = self.config.market.kline_store_path
+        self.kline_store = KlineStore(store_path) if store_path else None
+
         # ------------------------------------------------------------
         # WS FEED
         # ------------------------------------------------------------
-        self.ws_feed = WSPriceFeed(self.config)
+        self.ws_feed = feed_cls(self.config, kline_store=self.kline_store, registry=self.symbols)
+        capture_path = self.config.market.relay_capture_path
+        self.relay_recorder = (
+            RelayRecorder(capture_path, source=self.ws_feed.ws_url).attach(self.ws_feed) if capture_path else None
+        )
 
         # ------------------------------------------------------------
         # MARKET DATA MANAGER
         # ------------------------------------------------------------
-        self.market_data = MarketDataManager(self.config, self.ws_feed)
+        self.market_data = MarketDataManager(
+            self.config, self.ws_feed, kline_store=self.kline_store, registry=self.symbols
+        )
 
         # ------------------------------------------------------------
         # AB TESTING ENGINE (заводится на тот же портфель если нужно сравнение)
@@ -105,9 +139,11 @@ class DependencyContainer:
             self.config,
             self.ab_engine,
             self.telegram_bot,
-            self.heartbeat,
+            # async: heartbeat — задача AsyncRuntime (build в executor), не блокирующий send() в цикле
+            None if self.runtime == "async" else self.heartbeat,
             self.market_data,
-            self.analyzer  # Передача analyzer
+            self.analyzer,  # Передача analyzer
+            price_feed=self.ws_feed  # тот же фид, что у MarketDataManager
         )
 
         print("[DEBUG] DependencyContainer initialization complete.")
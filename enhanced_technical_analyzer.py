@@ -1,14 +1,19 @@
 # ============================================================
-# ENHANCED TECHNICAL ANALYZER v9.0 — AI PRIME TRADING BOT
+# ENHANCED TECHNICAL ANALYZER v9.1 — AI PRIME TRADING BOT
 # ------------------------------------------------------------
 # Чистый математический анализатор:
 # - EMA
 # - RSI
 # - GAP
 # - Volatility
+# - ADX / ATR
+# - *_series: значения на каждом баре за один проход (бэктесты)
+# v9.1: rsi_series / atr_series — скользящие суммы окна вместо sum() по
+#       срезу на каждом баре: O(n) вместо O(n·period), память O(period)
 # Без состояния. Без побочных эффектов.
 # ============================================================
 
+from array import array
 from typing import List, Optional
 
 
@@ -22,7 +27,10 @@ class EnhancedTechnicalAnalyzer:
     # INTERNAL — SAFE LIST NORMALIZATION
     # ------------------------------------------------------------
     def _safe(self, arr: Optional[List[float]]) -> Optional[List[float]]:
-        if arr is None or not isinstance(arr, list):
+        if isinstance(arr, (memoryview, array)):
+            # колонка OHLCRingBuffer: уже float64 без None
+            return arr.tolist()
+        if arr is None or not isinstance(arr, (list, tuple)):
             return None
         try:
             return [float(x) for x in arr if x is not None]
@@ -152,4 +160,153 @@ class EnhancedTechnicalAnalyzer:
                     abs(lows[i] - closes[i - 1])
                 )
                 trs.append(tr)
-            return sum(trs[-period:]) / period if len(trs) >= period else None
\ No newline at end of file
+            return sum(trs[-period:]) / period if len(trs) >= period else None
+
+    # ============================================================
+    # SERIES — значения индикатора на каждом баре за один линейный проход.
+    # series[i] == scalar(arr[:i + 1]) (None там, где скалярный метод
+    # вернул бы None) — для бэктестов и исследований без O(n²).
+    # ============================================================
+    def ema_series(self, arr: Optional[List[float]], period: int) -> Optional[List[Optional[float]]]:
+        arr = self._safe(arr)
+        if arr is None:
+            return None
+        out: List[Optional[float]] = [None] * len(arr)
+        if period <= 0 or not arr:
+            return out
+
+        multiplier = 2 / (period + 1)
+        value = arr[0]
+        for i, price in enumerate(arr):
+            if i > 0:
+                value = (price - value) * multiplier + value
+            if i + 1 >= period:
+                out[i] = float(value)
+        return out
+
+    def rsi_series(self, arr: Optional[List[float]], period: int) -> Optional[List[Optional[float]]]:
+        arr = self._safe(arr)
+        if arr is None:
+            return None
+        out: List[Optional[float]] = [None] * len(arr)
+        if period <= 0:
+            return out
+
+        # кольца последних period изменений и их суммы: O(1) на бар; пока в
+        # окне нет ненулевых значений, сумма — ровно 0 (как sum() у rsi())
+        gains = [0.0] * period
+        losses = [0.0] * period
+        gain_sum = loss_sum = 0.0
+        gain_n = loss_n = 0
+        for i in range(1, len(arr)):
+            delta = arr[i] - arr[i - 1]
+            gain, loss = (delta, 0.0) if delta > 0 else (0.0, abs(delta))
+            j = (i - 1) % period
+            gain_sum += gain - gains[j]
+            loss_sum += loss - losses[j]
+            gain_n += (gain != 0) - (gains[j] != 0)
+            loss_n += (loss != 0) - (losses[j] != 0)
+            gains[j] = gain
+            losses[j] = loss
+            if j == period - 1:
+                # окно обновилось целиком — суммы заново, без накопленной погрешности
+                gain_sum, loss_sum = sum(gains), sum(losses)
+            if i < period:
+                continue
+            if not loss_n:
+                out[i] = 100.0
+            elif not gain_n:
+                out[i] = 0.0
+            else:
+                if gain_sum <= 0 or loss_sum <= 0:
+                    # погрешность вычитания съела малые значения окна
+                    gain_sum, loss_sum = sum(gains), sum(losses)
+                rs = (gain_sum / period) / (loss_sum / period)
+                out[i] = float(100 - (100 / (1 + rs)))
+        return out
+
+    def gap_series(self, arr: Optional[List[float]]) -> Optional[List[Optional[float]]]:
+        arr = self._safe(arr)
+        if arr is None:
+            return None
+        return [None] + [float(arr[i] - arr[i - 1]) for i in range(1, len(arr))] if arr else []
+
+    def volatility_series(self, arr: Optional[List[float]]) -> Optional[List[Optional[float]]]:
+        arr = self._safe(arr)
+        if arr is None:
+            return None
+        out: List[Optional[float]] = [None] * len(arr)
+        total = 0
+        for i in range(1, len(arr)):
+            total += abs(arr[i] - arr[i - 1])
+            out[i] = float(total / i)
+        return out
+
+    def atr_series(self, highs, lows, closes, period=14) -> Optional[List[Optional[float]]]:
+        if highs is None or lows is None or closes is None:
+            return None
+        out: List[Optional[float]] = [None] * len(closes)
+        if period <= 0:
+            return out
+        # кольцо последних period TR и их сумма — как в rsi_series
+        trs = [0.0] * period
+        tr_sum = 0.0
+        tr_n = 0
+        for i in range(1, len(closes)):
+            tr = max(
+                highs[i] - lows[i],
+                abs(highs[i] - closes[i - 1]),
+                abs(lows[i] - closes[i - 1])
+            )
+            j = (i - 1) % period
+            tr_sum += tr - trs[j]
+            tr_n += (tr != 0) - (trs[j] != 0)
+            trs[j] = tr
+            if j == period - 1:
+                tr_sum = sum(trs)
+            if i >= period:
+                out[i] = tr_sum / period if tr_n else 0.0
+        return out
+
+    def adx_series(self, highs, lows, closes, period=14) -> Optional[List[Optional[float]]]:
+        if (
+                highs is None or lows is None or closes is None or
+                len(highs) != len(lows) or len(lows) != len(closes)
+        ):
+            return None
+        out: List[Optional[float]] = [None] * len(closes)
+        tr_s = plus_s = minus_s = 0.0
+        dx_sum = 0.0
+        adx_val = None
+        for i in range(1, len(closes)):
+            high, low = highs[i], lows[i]
+            prev_high, prev_low, prev_close = highs[i - 1], lows[i - 1], closes[i - 1]
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+            plus_dm = high - prev_high if (high - prev_high) > (prev_low - low) and (high - prev_high) > 0 else 0
+            minus_dm = prev_low - low if (prev_low - low) > (high - prev_high) and (prev_low - low) > 0 else 0
+
+            # i-й TR; сглаживание Уайлдера начинается с суммы первых period
+            if i <= period:
+                tr_s += tr
+                plus_s += plus_dm
+                minus_s += minus_dm
+            else:
+                tr_s = tr_s - (tr_s / period) + tr
+                plus_s = plus_s - (plus_s / period) + plus_dm
+                minus_s = minus_s - (minus_s / period) + minus_dm
+            if i < period:
+                continue
+
+            plus_di = 100 * plus_s / tr_s if tr_s else 0
+            minus_di = 100 * minus_s / tr_s if tr_s else 0
+            dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di) if (plus_di + minus_di) else 0
+            n_dx = i - period + 1
+            if n_dx <= period:
+                dx_sum += dx
+                if n_dx == period:
+                    adx_val = dx_sum / period
+            else:
+                adx_val = (adx_val * (period - 1) + dx) / period
+            if adx_val is not None:
+                out[i] = float(adx_val)
+        return out
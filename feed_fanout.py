@@ -0,0 +1,133 @@
+# ============================================================
+# FEED FANOUT v1.0 — подписчики одного WSPriceFeed
+# ------------------------------------------------------------
+# Одно соединение и один парсинг на relay, сколько угодно потребителей:
+# - UpdateSignal — множество изменившихся символов + Condition
+#   (event-driven цикл: wait() → {symbol, ...}), O(1) на сообщение
+# - QueueSubscriber — ограниченная очередь событий (symbol, bar):
+#   переполнение вытесняет самые старые (счётчик dropped), поэтому
+#   медленный потребитель никогда не блокирует поток сокета;
+#   с callback — собственный поток доставки, исключения изолированы
+# Бар передаётся всем подписчикам одним и тем же dict — без копий,
+# подписчики обязаны его не изменять.
+# ============================================================
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+
+class UpdateSignal:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._dirty: Set[str] = set()
+
+    def notify(self, symbol: str) -> None:
+        # Уже помечен — потребитель ещё не забрал множество и прочитает
+        # бар (он записан до вызова notify) после обмена; лок не нужен.
+        if symbol in self._dirty:
+            return
+        with self._cond:
+            self._dirty.add(symbol)
+            self._cond.notify_all()
+
+    def wait(self, timeout=None, coalesce=0.0) -> Set[str]:
+        """
+        Блокирует до первого обновления (или timeout) и возвращает множество
+        изменившихся символов; пустое — по таймауту. coalesce (сек) — окно,
+        в течение которого после первого обновления собираются следующие.
+        """
+        with self._cond:
+            if not self._dirty:
+                self._cond.wait(timeout)
+            if self._dirty and coalesce > 0:
+                deadline = time.monotonic() + coalesce
+                remaining = coalesce
+                while remaining > 0:
+                    self._cond.wait(remaining)
+                    remaining = deadline - time.monotonic()
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def close(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+
+class QueueSubscriber:
+    def __init__(self, maxsize=1000, callback: Optional[Callable[[str, dict], None]] = None,
+                 symbols: Optional[Iterable[str]] = None, name: str = "subscriber"):
+        self.logger = logging.getLogger(f"QueueSubscriber[{name}]")
+        self.name = name
+        self.symbols = frozenset(symbols) if symbols else None
+        self._queue: deque = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.callback = callback
+        self._thread = None
+        if callback is not None:
+            self._thread = threading.Thread(target=self._dispatch, name=f"feed-{name}", daemon=True)
+            self._thread.start()
+
+    # ------------------------------------------------------------
+    # PRODUCER SIDE (поток сокета)
+    # ------------------------------------------------------------
+    def push(self, symbol: str, bar: dict) -> None:
+        if self.symbols is not None and symbol not in self.symbols:
+            return
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append((symbol, bar))
+            self._cond.notify()
+
+    # ------------------------------------------------------------
+    # CONSUMER SIDE
+    # ------------------------------------------------------------
+    def get(self, timeout=None) -> Optional[Tuple[str, dict]]:
+        with self._cond:
+            if not self._queue and not self._closed:
+                self._cond.wait(timeout)
+            if not self._queue:
+                return None
+            self.delivered += 1
+            return self._queue.popleft()
+
+    def drain(self, limit=None) -> List[Tuple[str, dict]]:
+        with self._cond:
+            n = len(self._queue) if limit is None else min(limit, len(self._queue))
+            events = [self._queue.popleft() for _ in range(n)]
+        self.delivered += len(events)
+        return events
+
+    def _dispatch(self):
+        while not self._closed:
+            event = self.get(timeout=1.0)
+            if event is None:
+                continue
+            try:
+                self.callback(*event)
+            except Exception as e:
+                self.errors += 1
+                # упавший потребитель не должен заливать лог на каждом баре
+                if self.errors <= 10 or self.errors % 1000 == 0:
+                    self.logger.error(f"callback failed for {event[0]} (#{self.errors}): {e}")
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "pending": len(self._queue),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
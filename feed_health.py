@@ -0,0 +1,196 @@
+# ============================================================
+# FEED HEALTH v1.1 — здоровье WS-фида по каждому символу
+# ------------------------------------------------------------
+# На каждое сообщение (поток сокета) — только время последнего сообщения,
+# их число и биржевой timestamp (три присваивания). Раз в fold_seconds
+# по символу, в том же потоке, они сворачиваются в:
+# - темп сообщений: экспоненциально затухающий счётчик (msg/s, tau)
+# - задержка биржа → приём: now - bar["timestamp"] (мс) последнего
+#   сообщения — выборка раз в fold_seconds, гистограмма по фиксированным
+#   корзинам + EWMA для "отстаёт прямо сейчас"
+# Плюс счётчики соединений / реконнектов / разрывов фида целиком.
+# Чтение (stale_symbols, lagging_symbols, report) — из любого потока;
+# возраст точен до сообщения, темп и задержка — до fold_seconds.
+# Молчащий с самого старта символ считается stale только после
+# stale_after секунд от первого подключения (grace period).
+# ============================================================
+
+import math
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class SymbolHealth:
+    __slots__ = ("last_ts", "messages", "exchange_ts_ms", "_rate", "_rate_ts", "_folded",
+                 "latency_ms", "latency_ewma_ms", "latency_max_ms", "histogram")
+
+    def __init__(self):
+        self.last_ts = None
+        self.messages = 0
+        self.exchange_ts_ms = None  # биржевой timestamp последнего сообщения
+        self._rate = 0.0
+        self._rate_ts = None
+        self._folded = 0  # messages на момент последней свёртки
+        self.latency_ms = None
+        self.latency_ewma_ms = None
+        self.latency_max_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # последняя — > 10 с
+
+
+class FeedHealth:
+    def __init__(self, rate_tau=10.0, latency_alpha=0.2, fold_seconds=1.0):
+        self.rate_tau = rate_tau
+        self.latency_alpha = latency_alpha
+        self.fold_seconds = fold_seconds
+        self._symbols: Dict[str, SymbolHealth] = {}
+        self.connects = 0
+        self.reconnects = 0
+        self.disconnects = 0
+        self.connected = False
+        self.first_connect_ts = None
+        self.last_connect_ts = None
+        self.last_disconnect_ts = None
+
+    # ------------------------------------------------------------
+    # WRITE (поток сокета)
+    # ------------------------------------------------------------
+    def record(self, symbol: str, now: float, exchange_ts_ms=None) -> None:
+        h = self._symbols.get(symbol)
+        if h is None:
+            h = self._symbols[symbol] = SymbolHealth()
+        h.last_ts = now
+        h.messages += 1
+        h.exchange_ts_ms = exchange_ts_ms
+        if h._rate_ts is None or now - h._rate_ts >= self.fold_seconds:
+            self._fold(h, now)
+
+    def _fold(self, h: SymbolHealth, now: float) -> None:
+        """Темп — по числу сообщений с прошлой свёртки, задержка — по последнему."""
+        n = h.messages - h._folded
+        h._folded = h.messages
+        if h._rate_ts is None:
+            h._rate = n / self.rate_tau
+        else:
+            h._rate = h._rate * math.exp(-(now - h._rate_ts) / self.rate_tau) + n / self.rate_tau
+        h._rate_ts = now
+        exchange_ts_ms = h.exchange_ts_ms
+        if exchange_ts_ms:
+            latency = now * 1000.0 - float(exchange_ts_ms)
+            if latency < 0:
+                latency = 0.0  # расхождение часов
+            h.latency_ms = latency
+            h.latency_ewma_ms = latency if h.latency_ewma_ms is None else (
+                h.latency_ewma_ms + self.latency_alpha * (latency - h.latency_ewma_ms))
+            if latency > h.latency_max_ms:
+                h.latency_max_ms = latency
+            h.histogram[bisect_left(LATENCY_BUCKETS_MS, latency)] += 1
+
+    def record_connect(self, now: Optional[float] = None) -> None:
+        if self.connects:
+            self.reconnects += 1
+        self.connects += 1
+        self.connected = True
+        self.last_connect_ts = now if now is not None else time.time()
+        if self.first_connect_ts is None:
+            self.first_connect_ts = self.last_connect_ts
+
+    def record_disconnect(self, now: Optional[float] = None) -> None:
+        self.disconnects += 1
+        self.connected = False
+        self.last_disconnect_ts = now if now is not None else time.time()
+
+    def forget(self, symbol: str) -> None:
+        self._symbols.pop(symbol, None)
+
+    # ------------------------------------------------------------
+    # READ
+    # ------------------------------------------------------------
+    def symbol(self, symbol: str) -> Optional[SymbolHealth]:
+        return self._symbols.get(symbol)
+
+    def age(self, symbol: str, now: Optional[float] = None) -> Optional[float]:
+        h = self._symbols.get(symbol)
+        if h is None or h.last_ts is None:
+            return None
+        return (now if now is not None else time.time()) - h.last_ts
+
+    def rate(self, symbol: str, now: Optional[float] = None) -> float:
+        """Сообщений в секунду (затухающее среднее за ~rate_tau)."""
+        h = self._symbols.get(symbol)
+        if h is None or h._rate_ts is None:
+            return 0.0
+        now = now if now is not None else time.time()
+        return h._rate * math.exp(-(now - h._rate_ts) / self.rate_tau)
+
+    def percentile(self, symbol: str, q: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает q-квантиль задержки (мс)."""
+        h = self._symbols.get(symbol)
+        if h is None:
+            return None
+        total = sum(h.histogram)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(h.histogram):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else math.inf
+        return math.inf
+
+    def stale_symbols(self, symbols, stale_after: float, now: Optional[float] = None) -> List[str]:
+        """
+        Символы без сообщений дольше stale_after секунд. Символ без единого
+        сообщения — stale, только если с первого подключения прошло больше
+        stale_after (старт: до подключения и в первые секунды — не алерт).
+        """
+        now = now if now is not None else time.time()
+        first = self.first_connect_ts
+        silent_is_stale = first is not None and now - first > stale_after
+        out = []
+        for sym in symbols:
+            h = self._symbols.get(sym)
+            if h is None or h.last_ts is None:
+                if silent_is_stale:
+                    out.append(sym)
+            elif now - h.last_ts > stale_after:
+                out.append(sym)
+        return out
+
+    def lagging_symbols(self, threshold_ms: float) -> List[str]:
+        return [sym for sym, h in self._symbols.items()
+                if h.latency_ewma_ms is not None and h.latency_ewma_ms > threshold_ms]
+
+    def report(self, symbols=None, now: Optional[float] = None) -> Dict[str, dict]:
+        now = now if now is not None else time.time()
+        symbols = list(self._symbols) if symbols is None else symbols
+        out = {}
+        for sym in symbols:
+            h = self._symbols.get(sym)
+            if h is None:
+                out[sym] = {"messages": 0}
+                continue
+            out[sym] = {
+                "messages": h.messages,
+                "age_s": None if h.last_ts is None else now - h.last_ts,
+                "rate": self.rate(sym, now),
+                "latency_ms": h.latency_ms,
+                "latency_ewma_ms": h.latency_ewma_ms,
+                "latency_max_ms": h.latency_max_ms,
+                "p50_ms": self.percentile(sym, 0.5),
+                "p95_ms": self.percentile(sym, 0.95),
+                "p99_ms": self.percentile(sym, 0.99),
+            }
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "disconnects": self.disconnects,
+            "symbols": len(self._symbols),
+        }
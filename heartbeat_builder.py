@@ -148,6 +148,23 @@ class HeartbeatBuilder:
                 out.append(f"{sym}: insufficient history ({len(hist) if hist else 0})")
             else:
                 out.append(f"{sym}: history ok ({len(hist)})")
+        cache = getattr(self.di, "indicator_cache", None)
+        if cache is not None:
+            st = cache.stats()
+            out.append(f"Indicator cache: hits={st['hits']} misses={st['misses']} hit_rate={st['hit_rate']:.1%}")
+        health = getattr(getattr(self.di, "ws_feed", None), "health", None)
+        if health is not None:
+            st = health.stats()
+            out.append(f"Feed: connected={st['connected']} reconnects={st['reconnects']} "
+                       f"disconnects={st['disconnects']}")
+            report = health.report(list(self.market.symbols))
+            worst = sorted(
+                ((sym, r) for sym, r in report.items() if r.get("p95_ms") is not None),
+                key=lambda item: item[1]["p95_ms"], reverse=True,
+            )[:3]
+            for sym, r in worst:
+                out.append(f"{sym}: {r['rate']:.1f} msg/s, age {r['age_s']:.1f}s, "
+                           f"latency p50≤{r['p50_ms']}ms p95≤{r['p95_ms']}ms max={r['latency_max_ms']:.0f}ms")
         out.append("")
 
         return "\n".join(out)
@@ -3,9 +3,13 @@
 # индивидуальный JSON-логгер (стратегии) + ДЕБАГ-ЛОГГЕР портфельных операций
 # Более осторожная версия (ниже риск, выше фильтры, консервативнее вход)
 # Совместим по логам и механике с VTRStrategy
+# Debug-логи — append-only JSONL: heavy_strategy_debug.jsonl /
+# heavy_portfolio_debug.jsonl. Прежние heavy_*_debug.json (JSON-массив)
+# не читаются и не удаляются — остаются на диске как есть; история в
+# новых логах начинается с пустой.
 # ============================================================
 
-from debug_logger import DebugLogger
+from debug_logger import DebugLogger, INFO
 
 class HeavyStrategy:
     INIT_STACK = 300.0
@@ -20,15 +24,34 @@ class HeavyStrategy:
     MIN_ATR_RATIO = 0.00009  # больше волатильности требуем
     MIN_CONFIDENCE = 0.06    # нужен больший confidence для входа
 
-    def __init__(self, portfolio, analyzer=None, market=None):
-        self.logger = DebugLogger("heavy_strategy_debug.json", max_records=10000)
-        self.logger.enable()
-        self.portfolio_logger = DebugLogger("heavy_portfolio_debug.json", max_records=10000)
-        self.portfolio_logger.enable()
+    # Debug-лог: частые per-tick события сэмплируются (доля) и ограничиваются
+    # по частоте (событий/сек); передаются в DebugLogger(sampling=, rate_limits=)
+    LOG_SAMPLING = {"on_tick_called": 0.05}
+    LOG_RATE_LIMITS = {
+        "generate_signal_called": 50,
+        "generate_signal_skipped": 50,
+        "indicators_calculated": 50,
+        "filter_failed": 50,
+        "confidence_calculated": 50,
+        "signal_hold": 50,
+        "generate_signal_result": 50,
+        "on_tick_long_trade_evaluated": 50,
+        "on_tick_short_trade_evaluated": 50,
+        "on_tick_price_missing": 50,
+    }
+
+    def __init__(self, portfolio, analyzer=None, market=None, indicators=None, debug_log=True):
+        self.logger = DebugLogger("heavy_strategy_debug.jsonl", max_records=10000, mode="jsonl",
+                                  level=INFO, sampling=self.LOG_SAMPLING, rate_limits=self.LOG_RATE_LIMITS)
+        self.portfolio_logger = DebugLogger("heavy_portfolio_debug.jsonl", max_records=10000, mode="jsonl")
+        if debug_log:  # False — бэктест: логгеры этого экземпляра не пишут и файлов не создают
+            self.logger.enable()
+            self.portfolio_logger.enable()
 
         self.portfolio = portfolio
         self.analyzer = analyzer
         self.market = market
+        self.indicators = indicators  # инкрементальные индикаторы по символу (StreamingIndicatorEngine)
         self.active_trades = {}
         self.balance = self.INIT_STACK
         self.in_market = set()
@@ -38,28 +61,33 @@ class HeavyStrategy:
 
     @property
     def positions(self):
-        self.logger.log("positions_requested")
+        self.logger.debug("positions_requested")
         return self.portfolio.positions
 
     @property
     def trades(self):
-        self.logger.log("trades_requested")
+        self.logger.debug("trades_requested")
         return self.portfolio.trades
 
     def update_balance(self):
-        self.logger.log("update_balance_called", current_balance=self.balance, init_stack=self.INIT_STACK)
+        self.logger.debug("update_balance_called", current_balance=self.balance, init_stack=self.INIT_STACK)
         if not hasattr(self.portfolio, "trades"):
             self.logger.log("invalid_portfolio_object", error="No 'trades' attribute in portfolio")
             raise ValueError("Portfolio object does not have 'trades' attribute.")
-        self.logger.log("portfolio_trades_details", trades=self.portfolio.trades)
-        self.balance = self.INIT_STACK + sum([t.get("pnl", 0) for t in self.portfolio.trades])
-        self.logger.log("update_balance_completed", updated_balance=self.balance)
+        self.logger.debug("portfolio_trades_details", trades=lambda: DebugLogger.digest(self.portfolio.trades))
+        trades_pnl = getattr(self.portfolio, "trades_pnl", None)
+        # сумма по всем сделкам — O(новых сделок), а не O(всей истории) на каждую проверку
+        self.balance = self.INIT_STACK + (trades_pnl() if trades_pnl is not None
+                                          else sum([t.get("pnl", 0) for t in self.portfolio.trades]))
+        self.logger.debug("update_balance_completed", updated_balance=self.balance)
 
     def can_trade(self):
-        self.logger.log("can_trade_called", current_balance=self.balance, required_balance=self.INIT_STACK, active_trades=self.active_trades)
+        self.logger.log("can_trade_called", current_balance=self.balance, required_balance=self.INIT_STACK,
+                        active_trades=lambda: DebugLogger.digest(self.active_trades))
         self.update_balance()
         can_trade_result = self.balance >= 0.0
-        self.portfolio_logger.log("can_trade_result", balance=self.balance, can_trade=can_trade_result, active_trades=self.active_trades)
+        self.portfolio_logger.log("can_trade_result", balance=self.balance, can_trade=can_trade_result,
+                                  active_trades=lambda: DebugLogger.digest(self.active_trades))
         return can_trade_result
 
     def get_trade_amount(self, price, confidence):
@@ -73,7 +101,7 @@ class HeavyStrategy:
     def open_position(self, symbol, price, confidence, side):
         self.portfolio_logger.log("open_position_attempt", symbol=symbol, price=price, confidence=confidence, side=side)
         if not self.can_trade():
-            self.portfolio_logger.log("open_position_blocked", symbol=symbol, reason="can_trade_returned_false", balance=self.balance, active_trades=self.active_trades)
+            self.portfolio_logger.log("open_position_blocked", symbol=symbol, reason="can_trade_returned_false", balance=self.balance, active_trades=lambda: DebugLogger.digest(self.active_trades))
             return
         if symbol in self.active_trades:
             self.portfolio_logger.log("open_position_blocked", symbol=symbol, reason="already_active", active_trades=list(self.active_trades.keys()))
@@ -109,7 +137,8 @@ class HeavyStrategy:
     def close_position(self, symbol, price):
         self.portfolio_logger.log("close_position_attempt", symbol=symbol, price=price)
         if symbol not in self.active_trades:
-            self.portfolio_logger.log("close_position_blocked", symbol=symbol, reason="not_active", active_trades=self.active_trades)
+            self.portfolio_logger.log("close_position_blocked", symbol=symbol, reason="not_active",
+                                      active_trades=lambda: DebugLogger.digest(self.active_trades))
             return
         self.portfolio.close_position(symbol, price)
         self.active_trades.pop(symbol, None)
@@ -118,7 +147,8 @@ class HeavyStrategy:
         self.portfolio_logger.log("close_position_success", symbol=symbol, price=price, balance=self.balance)
 
     def on_tick(self, snapshot):
-        self.logger.log("on_tick_called", snapshot=snapshot, active_trades=self.active_trades)
+        self.logger.log("on_tick_called", snapshot=lambda: DebugLogger.digest(snapshot),
+                        active_trades=lambda: DebugLogger.digest(self.active_trades))
         for symbol, trade in list(self.active_trades.items()):
             price = snapshot.get(symbol)
             if not price:
@@ -161,20 +191,31 @@ class HeavyStrategy:
             self.logger.log("generate_signal_skipped", reason="insufficient_history", symbol=symbol,
                             history_length=len(history))
             return None
-        if not self.analyzer:
+        if not self.analyzer and self.indicators is None:
             self.logger.log("generate_signal_skipped", reason="no_analyzer", symbol=symbol)
             return None
 
-        highs = [bar["high"] for bar in history]
-        lows = [bar["low"] for bar in history]
-        closes = [bar["close"] for bar in history]
-        price = closes[-1]
+        if self.indicators is not None:
+            price = history[-1]["close"]
+            ema_fast = self.indicators.ema(symbol, history, 7)
+            ema_slow = self.indicators.ema(symbol, history, 25)
+            adx_val = self.indicators.adx(symbol, history, 14)
+            atr_val = self.indicators.atr(symbol, history, 14)
+            rsi_val = self.indicators.rsi(symbol, history, 14)
+        else:
+            if hasattr(history, "column"):
+                highs, lows, closes = history.column("high"), history.column("low"), history.column("close")
+            else:
+                highs = [bar["high"] for bar in history]
+                lows = [bar["low"] for bar in history]
+                closes = [bar["close"] for bar in history]
+            price = closes[-1]
 
-        ema_fast = self.analyzer.ema(closes, 7)
-        ema_slow = self.analyzer.ema(closes, 25)
-        adx_val = self.analyzer.adx(highs, lows, closes, 14)
-        atr_val = self.analyzer.atr(highs, lows, closes, 14)
-        rsi_val = self.analyzer.rsi(closes, 14)
+            ema_fast = self.analyzer.ema(closes, 7)
+            ema_slow = self.analyzer.ema(closes, 25)
+            adx_val = self.analyzer.adx(highs, lows, closes, 14)
+            atr_val = self.analyzer.atr(highs, lows, closes, 14)
+            rsi_val = self.analyzer.rsi(closes, 14)
 
         self.logger.log("indicators_calculated", symbol=symbol, price=price, ema_fast=ema_fast, ema_slow=ema_slow, adx=adx_val, atr=atr_val, rsi=rsi_val)
 
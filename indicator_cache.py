@@ -0,0 +1,93 @@
+# ============================================================
+# INDICATOR CACHE v1.1 — общий кэш индикаторов на бар
+# ------------------------------------------------------------
+# Ключ: (symbol, timeframe, indicator, params) + отпечаток последнего бара
+# (start, high, low, close). Пока бар не изменился, все стратегии
+# получают одно и то же значение без пересчёта.
+# Интерфейс совпадает с StreamingIndicatorEngine: ema / rsi / atr / adx
+# по (symbol, history, period), поэтому кэш подставляется прозрачно.
+# Замена истории целиком (ремонт пропусков / backfill в MarketDataManager)
+# видна по history.generation (OHLCRingBuffer): значения символа и
+# состояние источника (StreamingIndicatorEngine.reset) сбрасываются, даже
+# если последний бар не изменился. generation отслеживается на пару
+# (symbol, timeframe): у агрегированной истории свой счётчик.
+# ============================================================
+
+import threading
+
+from streaming_indicators import StreamingIndicatorEngine
+
+
+class IndicatorCache:
+    """
+    Кэш поверх источника индикаторов (по умолчанию StreamingIndicatorEngine).
+    Хранит только последнее значение на (symbol, timeframe, indicator, params) —
+    память O(symbols × indicators), а не O(баров).
+    """
+
+    def __init__(self, source=None):
+        self.source = source if source is not None else StreamingIndicatorEngine()
+        self._values = {}
+        self._generations = {}  # (symbol, timeframe) → history.generation, на которой посчитаны значения
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def ema(self, symbol, history, period):
+        return self.get(symbol, history, "ema", period)
+
+    def rsi(self, symbol, history, period):
+        return self.get(symbol, history, "rsi", period)
+
+    def atr(self, symbol, history, period=14):
+        return self.get(symbol, history, "atr", period)
+
+    def adx(self, symbol, history, period=14):
+        return self.get(symbol, history, "adx", period)
+
+    def get(self, symbol, history, indicator, period):
+        if not history:
+            return None
+        last = history[-1]
+        stamp = (last.get("start"), last["high"], last["low"], last["close"])
+        timeframe = getattr(history, "timeframe", None)
+        slot = (symbol, timeframe, indicator, period)
+        generation = getattr(history, "generation", None)
+        with self._lock:
+            if generation is not None and self._generations.get((symbol, timeframe), generation) != generation:
+                self._drop(symbol)
+                reset = getattr(self.source, "reset", None)
+                if reset is not None:
+                    reset(symbol)  # инкрементальное состояние видело старую историю
+            self._generations[(symbol, timeframe)] = generation
+            cached = self._values.get(slot)
+            if cached is not None and cached[0] == stamp and stamp[0] is not None:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            value = getattr(self.source, indicator)(symbol, history, period)
+            self._values[slot] = (stamp, value)
+            return value
+
+    def invalidate(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._values.clear()
+                self._generations.clear()
+            else:
+                self._drop(symbol)
+                for key in [k for k in self._generations if k[0] == symbol]:
+                    del self._generations[key]
+
+    def _drop(self, symbol):
+        for slot in [s for s in self._values if s[0] == symbol]:
+            del self._values[slot]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": len(self._values),
+        }
@@ -0,0 +1,202 @@
+# ============================================================
+# KLINE REST CLIENT v1.0 — backfill OHLC через Bybit REST
+# ------------------------------------------------------------
+# - один requests.Session с пулом keep-alive соединений
+# - retry с экспоненциальным backoff (+ jitter) на сетевые ошибки,
+#   HTTP 429/5xx и retCode != 0
+# - параллельная загрузка по символам с ограничением числа потоков
+# - локальный on-disk кэш свечей (KlineCache или KlineStore): после
+#   рестарта докачиваются только бары с момента последнего запуска
+# Неполная история (REST недоступен / разрыв кэш → хвост) — warning с
+# числом пропущенных баров и run_checked() → {symbol: missing} для докачки.
+# base_url подменяется (config.market.rest_url) — для офлайн-тестов
+# достаточно локального HTTP-стенда с тем же /v5/market/kline.
+# ============================================================
+
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+INTERVAL_MS = {"1": 60_000, "3": 180_000, "5": 300_000, "15": 900_000, "30": 1_800_000, "60": 3_600_000}
+
+
+class KlineFetchError(Exception):
+    pass
+
+
+class BybitKlineClient:
+    def __init__(self, base_url="https://api.bybit.com", timeout=10.0, retries=3,
+                 backoff=0.5, pool_size=8, category="linear"):
+        self.logger = logging.getLogger("BybitKlineClient")
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.category = category
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, symbol, interval="1", limit=300, start=None, end=None) -> List[dict]:
+        """Свечи по возрастанию start; KlineFetchError после исчерпания попыток."""
+        params = dict(category=self.category, symbol=symbol, interval=interval, limit=limit)
+        if start is not None:
+            params["start"] = int(start)
+        if end is not None:
+            params["end"] = int(end)
+        url = f"{self.base_url}/v5/market/kline"
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff * (2 ** (attempt - 1))
+                time.sleep(delay + random.uniform(0, delay / 2))
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout)
+                if resp.status_code == 429 or resp.status_code >= 500:
+                    last_error = f"HTTP {resp.status_code}"
+                    continue
+                result = resp.json()
+                if result.get("retCode", 0) != 0:
+                    last_error = f"retCode={result.get('retCode')} {result.get('retMsg')}"
+                    continue
+                bars = result.get("result", {}).get("list", [])
+                return self.parse(bars)
+            except (requests.RequestException, ValueError) as e:
+                last_error = e
+        raise KlineFetchError(f"{symbol}: {last_error}")
+
+    @staticmethod
+    def parse(bars) -> List[dict]:
+        ohlcs = []
+        for bar in sorted(bars, key=lambda x: int(x[0])):
+            ohlcs.append({
+                "start": int(bar[0]),
+                "open": float(bar[1]),
+                "high": float(bar[2]),
+                "low": float(bar[3]),
+                "close": float(bar[4]),
+                "volume": float(bar[5]),
+                "end": int(bar[8]) if len(bar) > 8 else None,
+            })
+        return ohlcs
+
+    def close(self):
+        self.session.close()
+
+
+class KlineCache:
+    """Свечи по символу в JSON-файле <dir>/<symbol>_<interval>.json (атомарная запись)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, symbol, interval):
+        return os.path.join(self.directory, f"{symbol}_{interval}.json")
+
+    def load(self, symbol, interval="1", limit=None) -> List[dict]:
+        try:
+            with open(self._path(symbol, interval), "r", encoding="utf-8") as f:
+                bars = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if not isinstance(bars, list):
+            return []
+        return bars[-limit:] if limit else bars
+
+    def save(self, symbol, bars, interval="1"):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(symbol, interval)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(bars, f)
+        os.replace(tmp, path)
+
+
+class KlineBackfill:
+    """
+    Параллельный backfill: для каждого символа берёт кэш и докачивает
+    только бары начиная с последнего закэшированного (он мог быть ещё
+    не закрыт). Если кэш устарел глубже limit — загружает окно целиком.
+    """
+
+    def __init__(self, client: BybitKlineClient, cache: Optional[KlineCache] = None, workers=8):
+        self.logger = logging.getLogger("KlineBackfill")
+        self.client = client
+        self.cache = cache
+        self.workers = workers
+
+    def run(self, symbols, interval="1", limit=300) -> Dict[str, List[dict]]:
+        return self.run_checked(symbols, interval, limit)[0]
+
+    def run_checked(self, symbols, interval="1", limit=300):
+        """
+        Как run(), плюс {symbol: пропущено баров} для символов, чья история
+        неполна (REST не ответил — отдан устаревший кэш, или дыра между кэшем
+        и докачанным хвостом / до текущей свечи). Такие символы надо докачать.
+        """
+        if not symbols:
+            return {}, {}
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(symbols))),
+                                thread_name_prefix="backfill") as pool:
+            outcomes = dict(zip(symbols, pool.map(lambda s: self._one(s, interval, limit), symbols)))
+        self.logger.info(f"Backfill {len(symbols)} symbols in {time.time() - started:.2f}s")
+        results = {sym: bars for sym, (bars, _) in outcomes.items()}
+        incomplete = {sym: missing for sym, (_, missing) in outcomes.items() if missing}
+        return results, incomplete
+
+    def _one(self, symbol, interval, limit):
+        step = INTERVAL_MS.get(interval, 60_000)
+        now_ms = int(time.time() * 1000)
+        current_start = now_ms - now_ms % step
+        cached = self.cache.load(symbol, interval, limit) if self.cache else []
+        last_start = cached[-1]["start"] if cached else None
+
+        # кэш покрывает текущую свечу — сеть не нужна
+        if last_start is not None and last_start >= current_start:
+            return cached, 0
+        try:
+            if last_start is not None and (current_start - last_start) // step < limit:
+                fresh = self.client.fetch(symbol, interval=interval, limit=limit, start=last_start)
+                bars = [b for b in cached if b["start"] < last_start] + fresh
+            else:
+                bars = self.client.fetch(symbol, interval=interval, limit=limit)
+        except KlineFetchError as e:
+            missing = (current_start - last_start) // step if last_start is not None else limit
+            self.logger.warning(f"Backfill failed for {e} — using stale cache, {missing} bars missing up to now")
+            return cached, missing
+        bars = bars[-limit:]
+        missing = self._missing(bars, step, current_start)
+        if missing:
+            self.logger.warning(f"Backfill {symbol}: history has {missing} missing bars (cache/REST discontinuity)")
+        if self.cache and bars:
+            try:
+                self.cache.save(symbol, bars, interval)
+            except OSError as e:
+                self.logger.error(f"Kline cache write failed for {symbol}: {e}")
+        return bars, missing
+
+    @staticmethod
+    def _missing(bars, step, current_start) -> int:
+        """Пропущенные бары внутри истории и между её концом и текущей свечой (её может ещё не быть)."""
+        if not bars:
+            return 0
+        missing = 0
+        prev = bars[0]["start"]
+        for bar in bars[1:]:
+            start = bar["start"]
+            if start - prev > step:
+                missing += (start - prev) // step - 1
+            prev = start
+        if current_start - prev > step:
+            missing += (current_start - prev) // step - 1
+        return missing
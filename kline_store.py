@@ -0,0 +1,162 @@
+# ============================================================
+# KLINE STORE v1.0 — персистентное хранилище 1m OHLCV (SQLite)
+# ------------------------------------------------------------
+# - таблица klines, PRIMARY KEY (symbol, start), WITHOUT ROWID:
+#   range-запросы по символу идут по кластерному индексу
+# - upsert: формирующийся бар переписывается, подтверждённый фиксируется
+# - find_gaps: пропущенные минуты (после реконнекта WS / простоя)
+# - load/save — тот же интерфейс, что у KlineCache, поэтому store
+#   подключается к KlineBackfill как кэш
+# Потокобезопасен: одно соединение под локом (WS-поток пишет,
+# торговый поток и поток ремонта читают).
+# ============================================================
+
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+_COLUMNS = ("start", "open", "high", "low", "close", "volume", "end", "confirm")
+
+
+class KlineStore:
+    def __init__(self, path, interval_ms=60_000):
+        self.path = path
+        self.interval_ms = interval_ms
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS klines ("
+            " symbol TEXT NOT NULL, start INTEGER NOT NULL,"
+            " open REAL, high REAL, low REAL, close REAL, volume REAL,"
+            " end INTEGER, confirm INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (symbol, start)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    # ------------------------------------------------------------
+    # WRITE
+    # ------------------------------------------------------------
+    def upsert(self, symbol, bars) -> int:
+        rows = [
+            (symbol, int(b["start"]), float(b["open"]), float(b["high"]), float(b["low"]),
+             float(b["close"]), float(b.get("volume") or 0.0), b.get("end"), 1 if b.get("confirm") else 0)
+            for b in bars if b.get("start") is not None
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO klines (symbol, start, open, high, low, close, volume, end, confirm)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(symbol, start) DO UPDATE SET"
+                " open=excluded.open, high=excluded.high, low=excluded.low, close=excluded.close,"
+                " volume=excluded.volume, end=COALESCE(excluded.end, klines.end),"
+                " confirm=MAX(klines.confirm, excluded.confirm)",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    # ------------------------------------------------------------
+    # READ
+    # ------------------------------------------------------------
+    def range(self, symbol, start=None, end=None, limit=None) -> List[dict]:
+        """Бары [start, end] по возрастанию; limit — последние limit из диапазона."""
+        sql = "SELECT start, open, high, low, close, volume, end, confirm FROM klines WHERE symbol = ?"
+        args = [symbol]
+        if start is not None:
+            sql += " AND start >= ?"
+            args.append(int(start))
+        if end is not None:
+            sql += " AND start <= ?"
+            args.append(int(end))
+        if limit is not None:
+            sql += " ORDER BY start DESC LIMIT ?"
+            args.append(int(limit))
+        else:
+            sql += " ORDER BY start"
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        if limit is not None:
+            rows.reverse()
+        return [self._row(r) for r in rows]
+
+    def tail(self, symbol, n) -> List[dict]:
+        return self.range(symbol, limit=n)
+
+    def last_start(self, symbol) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(start) FROM klines WHERE symbol = ?", (symbol,)).fetchone()
+        return row[0] if row else None
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT symbol FROM klines")]
+
+    def find_gaps(self, symbol, since=None, until=None) -> List[Tuple[int, int]]:
+        """
+        Пропуски внутри [since, until]: список (первый пропущенный start,
+        последний пропущенный start). Хвост после последнего бара до until
+        тоже считается пропуском; пустое окно (since и until заданы) — один
+        пропуск на всё окно.
+        """
+        step = self.interval_ms
+        sql = ("SELECT prev, start FROM ("
+               " SELECT start, LAG(start) OVER (ORDER BY start) AS prev FROM klines"
+               " WHERE symbol = ? AND start >= ? AND start <= ?)"
+               " WHERE prev IS NOT NULL AND start - prev > ?")
+        lo = int(since) if since is not None else 0
+        hi = int(until) if until is not None else 2 ** 62
+        with self._lock:
+            rows = self._conn.execute(sql, (symbol, lo, hi, step)).fetchall()
+            first_last = self._conn.execute(
+                "SELECT MIN(start), MAX(start) FROM klines WHERE symbol = ? AND start >= ? AND start <= ?",
+                (symbol, lo, hi),
+            ).fetchone()
+        gaps = [(prev + step, start - step) for prev, start in rows]
+        first, last = first_last if first_last else (None, None)
+        if first is None:
+            # в окне ни одного бара — простой длиннее окна: пропущено всё окно
+            if since is not None and until is not None and hi >= lo:
+                return [(lo - lo % step, hi - hi % step)]
+            return []
+        if since is not None and first is not None and first - lo >= step:
+            gaps.insert(0, (lo - lo % step, first - step))
+        if until is not None and last is not None and hi - last >= step:
+            gaps.append((last + step, hi - hi % step))
+        return gaps
+
+    # ------------------------------------------------------------
+    # KlineCache-совместимый интерфейс (для KlineBackfill)
+    # ------------------------------------------------------------
+    def load(self, symbol, interval="1", limit=None) -> List[dict]:
+        if interval != "1":
+            return []
+        return self.range(symbol, limit=limit)
+
+    def save(self, symbol, bars, interval="1"):
+        """REST-бары: всё, что закончилось до текущего момента, считается закрытым."""
+        if interval != "1":
+            return
+        now_ms = int(time.time() * 1000)
+        self.upsert(symbol, [
+            dict(b, confirm=True) if b.get("start") is not None and b["start"] + self.interval_ms <= now_ms else b
+            for b in bars
+        ])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row(row) -> dict:
+        bar = dict(zip(_COLUMNS, row))
+        bar["confirm"] = bool(bar["confirm"])
+        return bar
@@ -1,7 +1,10 @@
 # ============================================================
 # MAIN v9.2 — Multi-Symbol
+# v9.3: RUNTIME=async — фид, цикл, heartbeat и Telegram на одном
+# event loop (async_runtime); по умолчанию — потоки, как раньше.
 # ============================================================
 import time
+from config import config
 from dependency_container import DependencyContainer
 from trading_orchestrator import TradingOrchestrator
 
@@ -13,7 +16,7 @@ def wait_for_first_snapshot(di, timeout=10):
     while (time.time() - start < timeout):
         snap = di.ws_feed.get_prices()
         if snap:
-            print(f"✅ First snapshot received: {snap}")
+            print(f"✅ First snapshot received: {dict(snap)}")
             return True
         time.sleep(0.2)
 
@@ -24,6 +27,12 @@ def wait_for_first_snapshot(di, timeout=10):
 def main():
     print("🚀 AI PRIME TRADING BOT v9.2 starting...")
 
+    if config.trading.runtime == "async":
+        import async_runtime
+        print("⚙️ Runtime: asyncio (single event loop)")
+        async_runtime.run()
+        return
+
     di = DependencyContainer()
 
     wait_for_first_snapshot(di)
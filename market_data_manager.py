@@ -1,71 +1,202 @@
 # ============================================================
 # MARKET DATA MANAGER v10.2 — OHLC HISTORY + STABLE WS APPEND
 # ------------------------------------------------------------
-# Поддержка: BTCUSDT, ETHUSDT, SOLUSDT, XRPUSDT, BNBUSDT, DOGEUSDT, AVAXUSDT
+# Символы — из SymbolRegistry (общий с WSPriceFeed); добавленный в рантайме
+# символ догружает историю в фоне, удалённый освобождает буферы.
 # При старте сразу загружает историю через REST Bybit,
 # Live-бары из WebSocket аккуратно ДОПИСЫВАЮТСЯ (не затирают всю историю!)
+# v10.3: слияние по watermark — берутся только бары со start >= последнего
+# слитого, формирующийся бар переписывается на месте.
+# v10.4: backfill параллельно, через пул keep-alive соединений и
+# локальный кэш свечей (kline_rest_client) — рестарт докачивает только хвост.
+# v10.5: KlineStore (SQLite) — кэш backfill и архив подтверждённых WS-баров;
+# после реконнекта WS пропущенные минуты докачиваются в фоне (repair_gaps).
+# v10.6: старшие таймфреймы (5m/15m/1h) агрегируются из 1m инкрементально —
+# get_history(symbol, timeframe="15m"), без дополнительных подписок.
+# v10.7: backfill=False — без REST вообще (replay захвата relay, бэктест).
+# v10.8: неполный backfill (REST упал / разрыв с кэшем) — символы
+# докачиваются в фоне с нарастающей паузой, история заменяется в торговом потоке.
+# v10.9: update() обрабатывает подсказку цикла вместе со всеми символами,
+# изменившимися в снимке с прошлого прохода (_seen_seq — только после
+# полного прохода); свежесть get_snapshot — пока жив фид, для всех
+# символов с ценой, как до слияния по watermark.
 # ============================================================
 
 import time
 import logging
-import requests
+import threading
+
+from ohlc_ring_buffer import OHLCRingBuffer
+from timeframe_aggregator import TimeframeAggregator, parse_timeframe
+from kline_rest_client import BybitKlineClient, KlineCache, KlineBackfill, KlineFetchError
+from symbol_registry import SymbolRegistry
 
 class MarketDataManager:
-    def __init__(self, config, ws_feed):
+    def __init__(self, config, ws_feed, backfill=None, kline_store=None, registry=None):
         self.logger = logging.getLogger("MarketDataManager")
         self.cfg = config
-        self.symbols = [
-            "BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "BNBUSDT", "DOGEUSDT", "AVAXUSDT"
-        ]
+        if registry is None:
+            registry = getattr(ws_feed, "registry", None) or SymbolRegistry.from_config(config)
+        self.symbols = registry
         self.ws = ws_feed
         self.last_snapshot = {}
         self.last_update_ts = {}
-        self.history_ohlc = {s: [] for s in self.symbols}
         self.max_history_size = 300
+        self.history_ohlc = {}
+        self.watermarks = {}  # {symbol: start последнего слитого бара}
+        self._seen_seq = 0  # seq снимка цен WSPriceFeed, уже обработанный update()
+        self._feed_alive_ts = 0.0  # последний update() при живом фиде
+        self.timeframes = {}  # {symbol: {minutes: TimeframeAggregator}}
+        self.default_timeframes = getattr(getattr(config, "market", None), "timeframes", None) or []
+        for sym in self.symbols:
+            self._init_symbol(sym)
+        self.kline_store = kline_store
+        if backfill is False:
+            self.backfill = None  # replay / бэктест: история только из фида, без REST
+        else:
+            self.backfill = backfill if backfill is not None else self._default_backfill(config, kline_store)
         self.stale_seconds = 3
 
+        # --- ремонт пропусков после реконнекта WS ---
+        self._seen_reconnects = getattr(ws_feed, "reconnects", 0)
+        self._repair_thread = None
+        self._repair_lock = threading.Lock()
+        self._pending_history = {}  # {symbol: bars} — применяется в торговом потоке
+        self.backfill_retry_delays = (5, 15, 60, 300)  # сек между попытками докачки
+        self._retry_symbols = set()  # символы в очереди фоновой докачки
+
         # --- BACKFILL OHLC history via Bybit REST API on startup ---
         self.backfill_history_via_rest()
+        if self.kline_store is not None:
+            self.repair_gaps_async()
+        self.symbols.subscribe(self._on_registry_change)
 
         # Для совместимости с legacy heartbeat:
         self.history = self.history_ohlc
 
+    @staticmethod
+    def _default_backfill(config, kline_store=None):
+        market = getattr(config, "market", None)
+        workers = getattr(market, "backfill_workers", 8)
+        client = BybitKlineClient(
+            base_url=getattr(market, "rest_url", "https://api.bybit.com"),
+            timeout=getattr(market, "backfill_timeout", 10.0),
+            retries=getattr(market, "backfill_retries", 3),
+            pool_size=workers,
+        )
+        if kline_store is not None:
+            return KlineBackfill(client, kline_store, workers=workers)
+        cache_dir = getattr(market, "kline_cache_dir", None)
+        return KlineBackfill(client, KlineCache(cache_dir) if cache_dir else None, workers=workers)
+
     def backfill_history_via_rest(self):
         """Загрузка истории OHLC через публичный REST Bybit сразу при инициализации"""
-        def fetch_bybit_history(symbol, interval="1", limit=300):
-            url = f"https://api.bybit.com/v5/market/kline"
-            params = dict(category="linear", symbol=symbol, interval=interval, limit=limit)
-            try:
-                resp = requests.get(url, params=params, timeout=10)
-                result = resp.json()
-                bars = result.get("result", {}).get("list", [])
-                bars_sorted = sorted(bars, key=lambda x: int(x[0]))
-                ohlcs = []
-                for bar in bars_sorted:
-                    ohlcs.append({
-                        "start": int(bar[0]),
-                        "open": float(bar[1]),
-                        "high": float(bar[2]),
-                        "low": float(bar[3]),
-                        "close": float(bar[4]),
-                        "volume": float(bar[5]),
-                        "end": int(bar[8]) if len(bar) > 8 else None,
-                    })
-                return ohlcs
-            except Exception as e:
-                self.logger.error(f"Failed to fetch backfill for {symbol}: {e}")
-                return []
-        for sym in self.symbols:
-            ohlc = fetch_bybit_history(sym, interval="1", limit=self.max_history_size)
-            if ohlc:
-                self.history_ohlc[sym] = ohlc
+        if self.backfill is None:
+            return
+        results, incomplete = self._run_backfill(list(self.symbols))
+        self._schedule_backfill_retry(incomplete)
+        for sym, ohlc in results.items():
+            history = self.history_ohlc.get(sym)
+            if ohlc and history is not None:
+                history.clear()
+                history.extend(ohlc)
+                self._rebuild_timeframes(sym)
+
+    # ------------------------------------------------------------
+    # SYMBOLS (SymbolRegistry)
+    # ------------------------------------------------------------
+    def _init_symbol(self, sym):
+        self.history_ohlc[sym] = OHLCRingBuffer(self.max_history_size)
+        self.timeframes[sym] = {}
+        for minutes in self.default_timeframes:
+            self._aggregator(sym, minutes)
 
-    def update(self):
-        snapshot = self.ws.get_prices()
+    def _on_registry_change(self, event, sym, sid):
+        if event == "add":
+            self._init_symbol(sym)
+            if self.backfill is None:
+                return
+            threading.Thread(target=self._backfill_added, args=(sym,), name=f"backfill-{sym}", daemon=True).start()
+            return
+        for table in (self.history_ohlc, self.timeframes, self.watermarks, self.last_snapshot, self.last_update_ts):
+            table.pop(sym, None)
+        with self._repair_lock:
+            self._pending_history.pop(sym, None)
+
+    def _backfill_added(self, sym):
+        results, incomplete = self._run_backfill([sym])
+        bars = results.get(sym)
+        if bars:
+            with self._repair_lock:
+                self._pending_history[sym] = bars
+        self._schedule_backfill_retry(incomplete)
+
+    def _run_backfill(self, symbols):
+        """(results, {symbol: пропущено баров}); backfill без run_checked — без проверки полноты."""
+        run_checked = getattr(self.backfill, "run_checked", None)
+        if run_checked is None:
+            return self.backfill.run(symbols, interval="1", limit=self.max_history_size), {}
+        return run_checked(symbols, interval="1", limit=self.max_history_size)
+
+    def _schedule_backfill_retry(self, incomplete):
+        """Символы с дырой в истории — повторный backfill в фоне, пока не станет полным."""
+        with self._repair_lock:
+            symbols = [s for s in incomplete if s not in self._retry_symbols]
+            self._retry_symbols.update(symbols)
+        if not symbols:
+            return
+        self.logger.warning(f"Backfill incomplete for {', '.join(f'{s} ({incomplete[s]} bars)' for s in symbols)}"
+                            f" — retrying in background")
+        threading.Thread(target=self._retry_backfill, args=(symbols,), name="backfill-retry", daemon=True).start()
+
+    def _retry_backfill(self, symbols):
+        pending = list(symbols)
+        try:
+            for delay in self.backfill_retry_delays:
+                time.sleep(delay)
+                pending = [s for s in pending if s in self.symbols]
+                if not pending:
+                    return
+                try:
+                    results, incomplete = self._run_backfill(pending)
+                except Exception as e:
+                    self.logger.error(f"Backfill retry failed: {e}")
+                    continue
+                with self._repair_lock:
+                    for sym in pending:
+                        if results.get(sym) and sym not in incomplete:
+                            self._pending_history[sym] = results[sym]
+                pending = [s for s in pending if s in incomplete or not results.get(s)]
+                if not pending:
+                    self.logger.info(f"Backfill repaired for {', '.join(symbols)}")
+                    return
+            self.logger.error(f"Backfill still incomplete for {', '.join(pending)} after "
+                              f"{len(self.backfill_retry_delays)} retries")
+        finally:
+            with self._repair_lock:
+                self._retry_symbols.difference_update(symbols)
+
+    def update(self, symbols=None):
+        """symbols — только изменившиеся (из ws.wait_for_updates); None — все."""
+        if self.kline_store is not None:
+            self._check_reconnect()
+        self._apply_pending_history()
+        snapshot = self.ws.get_snapshot()
         if not snapshot:
             return None
+        now = time.time()
+        if self.ws.is_alive():
+            # котировки без сделок — не устаревшие: свежесть по живому фиду
+            self._feed_alive_ts = now
+        # всё изменившееся в снимке с прошлого прохода плюс подсказка цикла
+        # (символ из подсказки мог обновиться уже после публикации снимка)
+        changed = snapshot.changed_since(self._seen_seq)
+        if symbols is not None:
+            changed = dict.fromkeys(changed)
+            changed.update(dict.fromkeys(symbols))
+        symbols = [s for s in changed if s in self.symbols]
         valid = {}
-        for sym in self.symbols:
+        for sym in symbols:
             price = snapshot.get(sym)
             if price is None:
                 continue
@@ -76,30 +207,165 @@ class MarketDataManager:
                 continue
             valid[sym] = price
             self.last_snapshot[sym] = price
-            self.last_update_ts[sym] = time.time()
-            # --- APPEND ONLY: добавляем live-бары WebSocket (НЕ перезаписываем всю историю!)
-            ws_bars = self.ws.get_ohlc_history(sym, self.max_history_size)
-            if ws_bars:
-                # определяем уже имеющиеся start'ы, чтобы не было дубликатов
-                existing_starts = set(bar['start'] for bar in self.history_ohlc[sym])
-                for bar in ws_bars:
-                    if bar['start'] not in existing_starts:
-                        self.history_ohlc[sym].append(bar)
-                # Ограничиваем длину истории
-                if len(self.history_ohlc[sym]) > self.max_history_size:
-                    self.history_ohlc[sym] = self.history_ohlc[sym][-self.max_history_size:]
+            self.last_update_ts[sym] = now
+            self._merge_ws_bars(sym)
+        # проход полный: обработано всё, что изменилось до snapshot.seq
+        self._seen_seq = snapshot.seq
         return valid if valid else None
 
+    def _merge_ws_bars(self, sym):
+        """
+        Сливает live-бары WebSocket начиная с watermark: бар с тем же start
+        (формирующийся) переписывается на месте, более новые дописываются.
+        Работа пропорциональна числу новых баров, а не глубине истории.
+        """
+        history = self.history_ohlc.get(sym)
+        if history is None:
+            return
+        watermark = self.watermarks.get(sym)
+        if watermark is None:
+            watermark = history.last_start()
+        ws_bars = self.ws.get_ohlc_since(sym, watermark, self.max_history_size)
+        aggregators = self.timeframes.get(sym, {}).values()
+        for bar in ws_bars:
+            if bar.get("start") is None:
+                continue
+            if history.upsert(bar):
+                for agg in aggregators:
+                    agg.update(bar)
+        last = history.last_start()
+        if last is not None:
+            self.watermarks[sym] = last
+
+    # ------------------------------------------------------------
+    # GAP REPAIR (KlineStore)
+    # ------------------------------------------------------------
+    def _check_reconnect(self):
+        reconnects = getattr(self.ws, "reconnects", 0)
+        if reconnects != self._seen_reconnects:
+            self._seen_reconnects = reconnects
+            self.logger.info(f"WS reconnect detected ({reconnects}) — repairing kline gaps")
+            self.repair_gaps_async()
+
+    def repair_gaps_async(self):
+        if self._repair_thread is not None and self._repair_thread.is_alive():
+            return
+        self._repair_thread = threading.Thread(target=self.repair_gaps, name="kline-repair", daemon=True)
+        self._repair_thread.start()
+
+    def repair_gaps(self):
+        """
+        Докачивает через REST пропущенные минуты рабочего окна
+        (до последней закрытой) и помечает символ к перезагрузке истории.
+        """
+        store = self.kline_store
+        client = getattr(self.backfill, "client", None)
+        if store is None or client is None:
+            return
+        step = store.interval_ms
+        now_ms = int(time.time() * 1000)
+        last_closed = now_ms - now_ms % step - step
+        since = last_closed - (self.max_history_size - 1) * step
+        for sym in self.symbols:
+            try:
+                gaps = store.find_gaps(sym, since=since, until=last_closed)
+            except Exception as e:
+                self.logger.error(f"Gap scan failed for {sym}: {e}")
+                continue
+            repaired = 0
+            for lo, hi in gaps:
+                cursor = lo
+                while cursor <= hi:
+                    chunk_end = min(hi, cursor + 999 * step)
+                    try:
+                        bars = client.fetch(sym, interval="1", limit=1000, start=cursor, end=chunk_end)
+                    except KlineFetchError as e:
+                        self.logger.error(f"Gap repair failed for {e}")
+                        break
+                    store.save(sym, bars)
+                    repaired += len(bars)
+                    cursor = chunk_end + step
+            if repaired:
+                self.logger.info(f"Repaired {repaired} bars for {sym} ({len(gaps)} gaps)")
+                bars = store.tail(sym, self.max_history_size)
+                if bars:
+                    with self._repair_lock:
+                        self._pending_history[sym] = bars
+
+    def _apply_pending_history(self):
+        """Замена истории (ремонт / новый символ) в торговом потоке; watermark сбрасывается."""
+        if not self._pending_history:
+            return
+        with self._repair_lock:
+            pending, self._pending_history = self._pending_history, {}
+        for sym, bars in pending.items():
+            history = self.history_ohlc.get(sym)
+            if history is None:
+                continue
+            history.clear()
+            history.extend(bars)
+            self._rebuild_timeframes(sym)
+            self.watermarks.pop(sym, None)
+
+    def get_range(self, symbol: str, start=None, end=None, limit=None):
+        """Бары из KlineStore за [start, end] (ms) — глубже рабочего окна."""
+        if self.kline_store is None:
+            bars = [
+                b for b in self.history_ohlc.get(symbol, [])
+                if (start is None or b["start"] >= start) and (end is None or b["start"] <= end)
+            ]
+            return bars[-limit:] if limit else bars
+        return self.kline_store.range(symbol, start, end, limit)
+
     def get_snapshot(self):
         now = time.time()
+        alive_ts = self._feed_alive_ts
         fresh = {}
         for sym in self.symbols:
             ts = self.last_update_ts.get(sym)
             if not ts:
                 continue
-            if (now - ts) <= self.stale_seconds:
+            if (now - max(ts, alive_ts)) <= self.stale_seconds:
                 fresh[sym] = self.last_snapshot.get(sym)
         return fresh
 
-    def get_history(self, symbol: str) -> list:
-        return self.history_ohlc.get(symbol, [])
\ No newline at end of file
+    # ------------------------------------------------------------
+    # HIGHER TIMEFRAMES
+    # ------------------------------------------------------------
+    # Таблицы символа читаются через .get: SymbolRegistry.remove из другого
+    # потока может убрать символ между проверкой и обращением.
+    def _aggregator(self, symbol, minutes):
+        aggregators = self.timeframes.get(symbol)
+        history = self.history_ohlc.get(symbol)
+        if aggregators is None or history is None:
+            return None
+        agg = aggregators.get(minutes)
+        if agg is None:
+            agg = TimeframeAggregator(minutes, self.max_history_size)
+            agg.rebuild(history)
+            aggregators[minutes] = agg
+        return agg
+
+    def _rebuild_timeframes(self, symbol):
+        history = self.history_ohlc.get(symbol)
+        if history is None:
+            return
+        for agg in self.timeframes.get(symbol, {}).values():
+            agg.rebuild(history)
+
+    def get_history(self, symbol: str, timeframe=None):
+        """
+        OHLCRingBuffer символа: len()/[i] как у списка баров, column() — без копий.
+        timeframe ("5m", "15", "1h", ...) — агрегированные бары; незнакомый
+        таймфрейм заводится по первому запросу из текущей 1m истории.
+        """
+        history = self.history_ohlc.get(symbol)
+        if history is None:
+            return []
+        if timeframe is None:
+            return history
+        minutes = parse_timeframe(timeframe)
+        if minutes == 1:
+            return history
+        agg = self._aggregator(symbol, minutes)
+        return agg.bars if agg is not None else []
\ No newline at end of file
@@ -0,0 +1,231 @@
+# ============================================================
+# OHLC RING BUFFER v1.0 — колоночное хранилище баров по символу
+# ------------------------------------------------------------
+# Фиксированная ёмкость, типизированные колонки (array):
+#   start, end (int64), open, high, low, close, volume (float64), confirm (int8)
+# - append / update_last — O(1), без аллокаций на бар
+# - upsert_values — то же без dict (быстрый путь парсинга WS)
+# - column(name) — zero-copy memoryview на непрерывный участок:
+#   каждая запись дублируется в зеркальную половину массива
+#   (ёмкость × 2), поэтому окно [head, head + len) всегда непрерывно
+# - совместимость со старым list[dict]: len(), [i], [a:b], итерация
+#   отдают бары как dict
+# - generation растёт на clear(): кэши индикаторов по истории сбрасываются
+# - write_seq — счётчик seqlock для читателей из других потоков: писатель
+#   (WSPriceFeed) делает его нечётным на время upsert_values
+# - timeframe — минуты бара (None — базовая 1m история); индикаторы по
+#   символу ведут отдельное состояние на каждый таймфрейм
+# ============================================================
+
+from array import array
+from typing import Iterable, List, Optional
+
+_NONE_TS = -1  # start/end == None
+
+
+class OHLCRingBuffer:
+    FLOAT_COLUMNS = ("open", "high", "low", "close", "volume")
+    INT_COLUMNS = ("start", "end")
+    COLUMNS = INT_COLUMNS + FLOAT_COLUMNS + ("confirm",)
+
+    def __init__(self, capacity: int, bars: Optional[Iterable[dict]] = None, timeframe: Optional[int] = None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.timeframe = timeframe
+        size = 2 * capacity
+        self._cols = {name: array("q", [0]) * size for name in self.INT_COLUMNS}
+        self._cols.update({name: array("d", [0.0]) * size for name in self.FLOAT_COLUMNS})
+        self._cols["confirm"] = array("b", [0]) * size
+        # колонки в порядке аргументов _write_values — без поиска по dict на запись
+        self._write_cols = tuple(self._cols[name] for name in
+                                 ("start", "end", "open", "high", "low", "close", "volume", "confirm"))
+        self._head = 0
+        self._len = 0
+        self.generation = 0  # +1 на clear(): история заменена целиком (ремонт / backfill)
+        self.write_seq = 0  # seqlock: нечётный — идёт запись (ведёт писатель, см. WSPriceFeed)
+        if bars:
+            self.extend(bars)
+
+    # ------------------------------------------------------------
+    # WRITE
+    # ------------------------------------------------------------
+    def append(self, bar: dict) -> None:
+        self._write(self._next_pos(), bar)
+
+    def update_last(self, bar: dict) -> None:
+        """Переписать последний (формирующийся) бар на месте."""
+        if not self._len:
+            self.append(bar)
+            return
+        self._write(self._last_pos(), bar)
+
+    def upsert(self, bar: dict) -> bool:
+        """
+        Бар с тем же start, что и последний, переписывается на месте,
+        более новый — дописывается, более старый — игнорируется.
+        """
+        start = bar.get("start")
+        last = self.last_start()
+        if self._len and start is not None and last is not None:
+            if start == last:
+                self.update_last(bar)
+                return True
+            if start < last:
+                return False
+        self.append(bar)
+        return True
+
+    def upsert_values(self, start, end, open_, high, low, close, volume, confirm) -> bool:
+        """
+        upsert() по готовым значениям полей — без промежуточного dict.
+        Горячий путь WS-парсера, поэтому запись развёрнута на месте.
+        """
+        c_start, c_end, c_open, c_high, c_low, c_close, c_volume, c_confirm = self._write_cols
+        cap = self.capacity
+        n = self._len
+        if start is not None:
+            start = int(start)
+            if n:
+                # зеркальная половина: индекс head + n - 1 валиден без переноса
+                last = c_start[self._head + n - 1]
+                if start == last:
+                    # формирующийся бар — тот же start / end, пишутся только цены
+                    pos = self._head + n - 1
+                    if pos >= cap:
+                        pos -= cap
+                    mirror = pos + cap
+                    c_open[pos] = c_open[mirror] = open_
+                    c_high[pos] = c_high[mirror] = high
+                    c_low[pos] = c_low[mirror] = low
+                    c_close[pos] = c_close[mirror] = close
+                    c_volume[pos] = c_volume[mirror] = volume
+                    c_confirm[pos] = c_confirm[mirror] = 1 if confirm else 0
+                    return True
+                if start < last and last != _NONE_TS:
+                    return False
+        pos = self._next_pos()
+        mirror = pos + cap
+        c_start[pos] = c_start[mirror] = _NONE_TS if start is None else start
+        c_end[pos] = c_end[mirror] = _NONE_TS if end is None else int(end)
+        c_open[pos] = c_open[mirror] = open_
+        c_high[pos] = c_high[mirror] = high
+        c_low[pos] = c_low[mirror] = low
+        c_close[pos] = c_close[mirror] = close
+        c_volume[pos] = c_volume[mirror] = volume
+        c_confirm[pos] = c_confirm[mirror] = 1 if confirm else 0
+        return True
+
+    def extend(self, bars: Iterable[dict]) -> None:
+        for bar in bars:
+            self.append(bar)
+
+    def clear(self) -> None:
+        self._head = 0
+        self._len = 0
+        self.generation += 1
+
+    def _next_pos(self) -> int:
+        cap = self.capacity
+        if self._len < cap:
+            pos = self._head + self._len
+            if pos >= cap:
+                pos -= cap
+            self._len += 1
+        else:
+            # буфер полон — перезаписываем самый старый бар
+            pos = self._head
+            self._head = pos + 1 if pos + 1 < cap else 0
+        return pos
+
+    def _last_pos(self) -> int:
+        pos = self._head + self._len - 1
+        return pos - self.capacity if pos >= self.capacity else pos
+
+    def _write(self, pos: int, bar: dict) -> None:
+        get = bar.get
+        self._write_values(
+            pos, get("start"), get("end"),
+            float(get("open") or 0.0), float(get("high") or 0.0), float(get("low") or 0.0),
+            float(get("close") or 0.0), float(get("volume") or 0.0), get("confirm"),
+        )
+
+    def _write_values(self, pos, start, end, open_, high, low, close, volume, confirm) -> None:
+        c_start, c_end, c_open, c_high, c_low, c_close, c_volume, c_confirm = self._write_cols
+        mirror = pos + self.capacity
+        c_start[pos] = c_start[mirror] = _NONE_TS if start is None else int(start)
+        c_end[pos] = c_end[mirror] = _NONE_TS if end is None else int(end)
+        c_open[pos] = c_open[mirror] = open_
+        c_high[pos] = c_high[mirror] = high
+        c_low[pos] = c_low[mirror] = low
+        c_close[pos] = c_close[mirror] = close
+        c_volume[pos] = c_volume[mirror] = volume
+        c_confirm[pos] = c_confirm[mirror] = 1 if confirm else 0
+
+    # ------------------------------------------------------------
+    # READ
+    # ------------------------------------------------------------
+    def column(self, name: str) -> memoryview:
+        """Zero-copy представление колонки от старого бара к новому."""
+        return memoryview(self._cols[name])[self._head:self._head + self._len]
+
+    def last_start(self) -> Optional[int]:
+        if not self._len:
+            return None
+        value = self._cols["start"][self._head + self._len - 1]
+        return None if value == _NONE_TS else value
+
+    def bar(self, index: int) -> dict:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("OHLCRingBuffer index out of range")
+        pos = self._head + index
+        cols = self._cols
+        start = cols["start"][pos]
+        end = cols["end"][pos]
+        return {
+            "start": None if start == _NONE_TS else start,
+            "open": cols["open"][pos],
+            "high": cols["high"][pos],
+            "low": cols["low"][pos],
+            "close": cols["close"][pos],
+            "volume": cols["volume"][pos],
+            "end": None if end == _NONE_TS else end,
+            "confirm": bool(cols["confirm"][pos]),
+        }
+
+    def bars_since(self, start: Optional[int], depth: Optional[int] = None) -> List[dict]:
+        """
+        Бары со start >= start (не больше depth последних), поиск с конца —
+        O(число новых баров). start=None — просто depth последних.
+        """
+        n = self._len
+        lo = 0 if depth is None else max(0, n - depth)
+        if start is None:
+            return [self.bar(i) for i in range(lo, n)]
+        starts = self._cols["start"]
+        base = self._head
+        i = n
+        while i > lo and starts[base + i - 1] >= start:
+            i -= 1
+        return [self.bar(j) for j in range(i, n)]
+
+    def to_list(self, depth: Optional[int] = None) -> List[dict]:
+        n = self._len if depth is None else min(depth, self._len)
+        return [self.bar(i) for i in range(self._len - n, self._len)]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.bar(i) for i in range(*index.indices(self._len))]
+        return self.bar(index)
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self.bar(i)
+
+    def __repr__(self) -> str:
+        return f"OHLCRingBuffer(len={self._len}, capacity={self.capacity})"
@@ -0,0 +1,285 @@
+# ============================================================
+# PARAM SWEEP v1.0 — перебор констант стратегий на всех ядрах
+# ------------------------------------------------------------
+# Кандидат — набор значений TAKE_PROFIT_PCT / STOP_LOSS_PCT / TRAILING_PCT /
+# MIN_ADX / MIN_ATR_RATIO / MIN_CONFIDENCE / MAX_RISK_PCT для одной стратегии;
+# каждый кандидат — отдельный прогон Backtester(params=...).
+# Выборка: grid (декартово произведение), random, lhs (Latin hypercube —
+# каждый диапазон делится на n полос, в каждую попадает ровно один кандидат).
+# Первым всегда идёт кандидат без перекрытий — константы класса, для сравнения.
+# Данные и серии индикаторов (PrecomputedIndicators.precompute) готовятся
+# один раз в родителе и лежат в глобалах модуля; воркеры ProcessPoolExecutor
+# получают их через fork (copy-on-write), по каналу идут только параметры
+# и итоговые dict'ы. Без fork (Windows / macOS spawn) данные передаются
+# initializer'ом каждому воркеру — работает, но с копией на процесс.
+#
+#   python param_sweep.py --synthetic 7 --mode lhs --samples 200
+#   python param_sweep.py --store data/klines.sqlite --days 30 \
+#       --param TAKE_PROFIT_PCT=0.002,0.004,0.006 --param MIN_ADX=15:30 --steps 4
+# ============================================================
+
+import argparse
+import csv
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from backtester import STRATEGIES, Backtester, add_data_arguments, load_data
+from precomputed_indicators import PrecomputedIndicators
+
+# диапазоны по умолчанию (lo, hi) — покрывают константы обеих стратегий
+DEFAULT_SPACE = {
+    "TAKE_PROFIT_PCT": (0.001, 0.008),
+    "STOP_LOSS_PCT": (0.0005, 0.004),
+    "TRAILING_PCT": (0.0005, 0.004),
+    "MIN_ADX": (10.0, 35.0),
+    "MIN_ATR_RATIO": (0.00002, 0.0003),
+    "MIN_CONFIDENCE": (0.02, 0.10),
+    "MAX_RISK_PCT": (0.01, 0.10),
+}
+RANK_KEYS = ("pnl", "calmar", "drawdown", "win_rate", "trades")
+
+# общие данные воркеров: заполняются в родителе до fork (или initializer'ом)
+_DATA: Optional[Dict[str, List[dict]]] = None
+_INDICATORS: Optional[PrecomputedIndicators] = None
+_TRADE_FROM: Optional[int] = None
+
+
+# ------------------------------------------------------------
+# SPACE
+# ------------------------------------------------------------
+def parse_space(specs: Sequence[str]) -> Dict[str, object]:
+    """
+    "NAME=lo:hi" — диапазон, "NAME=v1,v2,..." — явные значения (для grid
+    берутся как есть, для random / lhs — выбор из списка). Без specs — DEFAULT_SPACE.
+    """
+    if not specs:
+        return dict(DEFAULT_SPACE)
+    space = {}
+    for spec in specs:
+        name, sep, value = spec.partition("=")
+        name = name.strip().upper()
+        if not sep or not value:
+            raise ValueError(f"bad --param {spec!r}: expected NAME=lo:hi or NAME=v1,v2")
+        if ":" in value:
+            lo, hi = (float(v) for v in value.split(":", 1))
+            space[name] = (min(lo, hi), max(lo, hi))
+        else:
+            space[name] = [float(v) for v in value.split(",") if v]
+    return space
+
+
+def _round(value: float) -> float:
+    return float(f"{value:.6g}")
+
+
+def _grid_values(bounds, steps):
+    if isinstance(bounds, list):
+        return bounds
+    lo, hi = bounds
+    if steps <= 1 or lo == hi:
+        return [_round((lo + hi) / 2)]
+    return [_round(lo + (hi - lo) * i / (steps - 1)) for i in range(steps)]
+
+
+def sample_space(space: Dict[str, object], mode="lhs", samples=100, steps=3, seed=1) -> List[dict]:
+    """Кандидаты {NAME: value}; grid игнорирует samples, random / lhs — steps."""
+    names = list(space)
+    if mode == "grid":
+        axes = [_grid_values(space[n], steps) for n in names]
+        return [dict(zip(names, combo)) for combo in itertools.product(*axes)]
+    rnd = random.Random(seed)
+    columns = {}
+    for name in names:
+        bounds = space[name]
+        if mode == "lhs":
+            strata = list(range(samples))
+            rnd.shuffle(strata)
+            if isinstance(bounds, list):
+                columns[name] = [bounds[s * len(bounds) // samples] for s in strata]
+            else:
+                lo, hi = bounds
+                columns[name] = [_round(lo + (hi - lo) * (s + rnd.random()) / samples) for s in strata]
+        elif mode == "random":
+            if isinstance(bounds, list):
+                columns[name] = [rnd.choice(bounds) for _ in range(samples)]
+            else:
+                columns[name] = [_round(rnd.uniform(*bounds)) for _ in range(samples)]
+        else:
+            raise ValueError(f"unknown sampling mode {mode}")
+    return [{name: columns[name][i] for name in names} for i in range(samples)]
+
+
+def make_jobs(candidates: List[dict], names: Sequence[str], include_defaults=True) -> List[tuple]:
+    """(strategy, params) на каждую стратегию; параметр, которого у класса нет, — ValueError."""
+    jobs = []
+    for name in names:
+        cls = STRATEGIES[name]
+        for key in {k for c in candidates for k in c}:
+            if not hasattr(cls, key):
+                raise ValueError(f"{cls.__name__} has no parameter {key}")
+        if include_defaults:
+            jobs.append((name, {}))
+        jobs.extend((name, params) for params in candidates)
+    return jobs
+
+
+# ------------------------------------------------------------
+# WORKER
+# ------------------------------------------------------------
+def _init_worker(data, indicators, trade_from):
+    global _DATA, _INDICATORS, _TRADE_FROM
+    _DATA, _INDICATORS, _TRADE_FROM = data, indicators, trade_from
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def evaluate(job, data=None, indicators=None, trade_from=None, equity_every=15) -> dict:
+    """Один прогон; без data / indicators — общие глобалы воркера."""
+    name, params = job
+    if data is None:
+        data, indicators, trade_from = _DATA, _INDICATORS, _TRADE_FROM
+    result = Backtester(names=[name], params={name: params}, equity_every=equity_every,
+                        indicators=indicators).run(data, trade_from)
+    summary = dict(result.summary[name])
+    dd = summary["max_drawdown"]
+    summary["calmar"] = summary["pnl"] / dd if dd > 0 else (0.0 if summary["pnl"] <= 0 else float("inf"))
+    summary.update(strategy=name, params=params, elapsed=result.elapsed)
+    return summary
+
+
+def _evaluate(job):
+    return evaluate(job)
+
+
+def run_sweep(data, jobs, workers=None, indicators=None, chunksize=None, progress=None,
+              trade_from=None) -> List[dict]:
+    """
+    Все jobs в пуле процессов; результаты в порядке jobs. indicators — готовые
+    серии (иначе PrecomputedIndicators(data).precompute() здесь, до fork).
+    trade_from — см. Backtester.run (прогрев окна walk_forward).
+    """
+    global _DATA, _INDICATORS, _TRADE_FROM
+    indicators = indicators if indicators is not None else PrecomputedIndicators(data).precompute()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        out = []
+        for i, job in enumerate(jobs):
+            out.append(evaluate(job, data, indicators, trade_from))
+            if progress:
+                progress(i + 1, len(jobs))
+        return out
+
+    chunksize = chunksize or max(1, len(jobs) // (workers * 8))
+    if "fork" in multiprocessing.get_all_start_methods():
+        # глобалы до fork — воркеры наследуют их без pickle
+        _DATA, _INDICATORS, _TRADE_FROM = data, indicators, trade_from
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data, indicators, trade_from))
+    out = []
+    try:
+        with pool:
+            for i, summary in enumerate(pool.map(_evaluate, jobs, chunksize=chunksize)):
+                out.append(summary)
+                if progress:
+                    progress(i + 1, len(jobs))
+    finally:
+        _DATA = _INDICATORS = _TRADE_FROM = None
+    return out
+
+
+# ------------------------------------------------------------
+# RANKING
+# ------------------------------------------------------------
+def rank(results: List[dict], key="pnl") -> List[dict]:
+    if key not in RANK_KEYS:
+        raise ValueError(f"unknown rank key {key}")
+    if key == "drawdown":
+        # меньшая просадка лучше; при равной — больший pnl
+        return sorted(results, key=lambda r: (r["max_drawdown"], -r["pnl"]))
+    return sorted(results, key=lambda r: (r[key], -r["max_drawdown"]), reverse=True)
+
+
+def format_table(results: List[dict], top=20) -> str:
+    if not results:
+        return "(no results)"
+    names = sorted({k for r in results for k in r["params"]})
+    header = (f"  {'#':>3} {'strategy':<13}{'pnl':>9}{'max dd':>9}{'calmar':>8}{'trades':>7}{'win%':>7}  "
+              + "  ".join(f"{n:>15}" for n in names))
+    lines = [header]
+    for i, r in enumerate(results[:top], 1):
+        params = r["params"]
+        values = "  ".join(f"{params[n]:>15.6g}" if n in params else f"{'default':>15}" for n in names)
+        lines.append(f"  {i:>3} {r['strategy']:<13}{r['pnl']:>9.2f}{r['max_drawdown']:>9.2f}{r['calmar']:>8.2f}"
+                     f"{r['trades']:>7}{r['win_rate'] * 100:>6.1f}%  {values}")
+    return "\n".join(lines)
+
+
+def write_csv(results: List[dict], path) -> None:
+    names = sorted({k for r in results for k in r["params"]})
+    columns = ["strategy", "pnl", "max_drawdown", "calmar", "trades", "wins", "losses", "win_rate",
+               "final_equity", "open_positions"]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns + names)
+        for r in results:
+            writer.writerow([r[c] for c in columns] + [r["params"].get(n, "") for n in names])
+
+
+def _progress(done, total):
+    if done == total or done % max(1, total // 20) == 0:
+        print(f"  {done}/{total}", flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel parameter sweep over strategy class constants")
+    add_data_arguments(ap)
+    ap.add_argument("--strategies", default=",".join(STRATEGIES))
+    ap.add_argument("--param", action="append", default=[], metavar="NAME=lo:hi|v1,v2",
+                    help="repeatable; default — all 7 risk/exit/filter constants")
+    ap.add_argument("--mode", choices=("grid", "random", "lhs"), default="lhs")
+    ap.add_argument("--samples", type=int, default=100, help="random / lhs: candidates per strategy")
+    ap.add_argument("--steps", type=int, default=3, help="grid: points per range")
+    ap.add_argument("--sample-seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=None, help="default — all cores")
+    ap.add_argument("--rank", choices=RANK_KEYS, default="pnl")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--csv", default=None, help="full ranked table")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    data = load_data(args)
+    started = time.perf_counter()
+    indicators = PrecomputedIndicators(data).precompute()
+    print(f"Precomputed {indicators.computed} indicator series in {time.perf_counter() - started:.2f} s")
+
+    space = parse_space(args.param)
+    candidates = sample_space(space, args.mode, args.samples, args.steps, args.sample_seed)
+    names = [n for n in args.strategies.split(",") if n]
+    jobs = make_jobs(candidates, names)
+    workers = args.workers or os.cpu_count() or 1
+    print(f"{len(jobs)} backtests ({len(candidates)} candidates × {len(names)} strategies + defaults) "
+          f"on {workers} workers")
+
+    started = time.perf_counter()
+    results = run_sweep(data, jobs, workers, indicators, progress=_progress)
+    elapsed = time.perf_counter() - started
+    bars = sum(len(b) for b in data.values())
+    print(f"Done in {elapsed:.1f} s ({len(jobs) / elapsed:.2f} backtests/s, "
+          f"{len(jobs) * bars / elapsed:,.0f} strategy-bars/s)")
+
+    ranked = rank(results, args.rank)
+    for name in names:
+        print(f"\n{name} — by {args.rank}")
+        print(format_table([r for r in ranked if r["strategy"] == name], args.top))
+    if args.csv:
+        write_csv(ranked, args.csv)
+
+
+if __name__ == "__main__":
+    main()
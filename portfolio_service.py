@@ -1,5 +1,6 @@
 # ============================================================
 # portfolio_service.py — v2.5 (TP, SL, trailing_extremum fields in trade history)
+# v2.6: trades_pnl() — инкрементальная сумма pnl сделок (баланс стратегий)
 # ============================================================
 
 from typing import Dict, Any, Optional
@@ -16,6 +17,10 @@ class PortfolioService:
         self.trades = []
         self.path = path
         self.open_extras = {}  # для хранения фич входа по каждой открытой позиции
+        # сумма pnl по self.trades: досчитывается только по новым сделкам
+        self._pnl_trades = None
+        self._pnl_count = 0
+        self._pnl_sum = 0
 
     def save_to_file(self, path: Optional[str] = None):
         if not path:
@@ -35,6 +40,22 @@ class PortfolioService:
             except Exception:
                 pass
 
+    def trades_pnl(self):
+        """
+        sum(t["pnl"] for t in self.trades) без прохода по всей истории на каждый
+        вызов: сделки только дописываются, поэтому суммируется хвост (порядок
+        сложения тот же — результат совпадает побитово). Замена списка
+        (load_from_dict) — пересчёт с нуля.
+        """
+        trades = self.trades
+        if trades is not self._pnl_trades or self._pnl_count > len(trades):
+            self._pnl_trades, self._pnl_count, self._pnl_sum = trades, 0, 0
+        total = self._pnl_sum
+        for i in range(self._pnl_count, len(trades)):
+            total += trades[i].get("pnl", 0)
+        self._pnl_sum, self._pnl_count = total, len(trades)
+        return total
+
     def trades_today_stats(self):
         today = date.today()
         total = win = loss = 0
@@ -0,0 +1,40 @@
+# ============================================================
+# PRICE SNAPSHOT v1.1 — неизменяемый снимок цен WSPriceFeed
+# ------------------------------------------------------------
+# Писатель (поток сокета) меняет рабочие dict и счётчик seq и сам же
+# публикует снимок — но не на каждое сообщение, а на первом обновлении
+# после того, как читатель забрал предыдущий (двойной буфер: копия
+# O(символов) не чаще одного раза на чтение). Читатели берут снимок по
+# ссылке (MappingProxyType, без копий на тик); он может отставать от
+# фида до следующего сообщения после чтения. seq монотонен: "что-то
+# изменилось с N?" — сравнение чисел, "что именно?" — changed_since(N)
+# по seq последнего изменения каждого символа.
+# ============================================================
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import List, Mapping
+
+_EMPTY = MappingProxyType({})
+
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    seq: int = 0
+    ts: float = 0.0
+    prices: Mapping[str, float] = field(default_factory=lambda: _EMPTY)
+    changed_at: Mapping[str, int] = field(default_factory=lambda: _EMPTY)  # symbol → seq последнего изменения
+
+    def changed_since(self, seq: int) -> List[str]:
+        if seq >= self.seq:
+            return []
+        return [sym for sym, at in self.changed_at.items() if at > seq]
+
+    def get(self, symbol, default=None):
+        return self.prices.get(symbol, default)
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self.prices
+
+    def __len__(self) -> int:
+        return len(self.prices)
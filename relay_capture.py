@@ -0,0 +1,308 @@
+# ============================================================
+# RELAY CAPTURE v1.0 — запись и воспроизведение сырого трафика relay
+# ------------------------------------------------------------
+# Запись: RelayRecorder.record — raw tap WSPriceFeed (add_raw_tap), каждое
+# сообщение с временем приёма; поток сокета только дописывает в deque,
+# сжатие и диск — фоновый writer-поток раз в flush_interval.
+# Формат: gzip, append-only; каждая сессия записи — отдельный gzip-member
+# (конкатенация member'ов — валидный gzip). Строки:
+#   "# relay-capture v1 ..."     — заголовок сессии
+#   "<recv_ts>\t<raw message>"   — сообщение (переводы строк → пробел)
+# Воспроизведение: RelayReplayer — те же сообщения через тот же
+# WSPriceFeed.on_message, темп 1x / Nx / max (speed=0), опционально
+# step(changed) после каждого сообщения — MarketDataManager.update и т.д.
+# Однопоточно и без сети: прогон детерминирован (часы фида — реальные).
+#
+#   python relay_capture.py record out.gz [--seconds 600]
+#   python relay_capture.py replay out.gz [--speed max] [--pipeline market]
+#   python relay_capture.py info out.gz
+# ============================================================
+
+import argparse
+import atexit
+import gzip
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Tuple
+
+CAPTURE_HEADER = "# relay-capture v1"
+_TOPIC_RE = re.compile(r'"topic"\s*:\s*"kline\.1\.([A-Z0-9]+)"')
+
+
+class RelayRecorder:
+    def __init__(self, path, buffer_size=100_000, flush_interval=0.5, source=""):
+        self.logger = logging.getLogger("RelayRecorder")
+        self.path = path
+        self.flush_interval = flush_interval
+        self.source = source
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._tap = self.record  # один и тот же объект для add_raw_tap / remove_raw_tap
+        self._stop = threading.Event()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name="relay-capture", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)  # иначе у последнего gzip-member нет трейлера
+
+    def attach(self, feed) -> "RelayRecorder":
+        feed.add_raw_tap(self._tap)
+        return self
+
+    def detach(self, feed) -> None:
+        feed.remove_raw_tap(self._tap)
+
+    # ------------------------------------------------------------
+    # TAP (поток сокета): время + deque.append, без локов и пробуждений
+    # ------------------------------------------------------------
+    def record(self, message) -> None:
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1  # writer не успевает — вытесняется самое старое
+        buffer.append((time.time(), message))
+        self.recorded += 1
+
+    # ------------------------------------------------------------
+    # WRITER: раз в flush_interval забирает всё накопленное
+    # ------------------------------------------------------------
+    def _write_loop(self):
+        with gzip.open(self.path, "at", encoding="utf-8", compresslevel=6) as f:
+            f.write(f"{CAPTURE_HEADER} started={time.time():.6f} source={self.source}\n")
+            while True:
+                stopping = self._stop.wait(self.flush_interval)
+                self._drain(f)
+                f.flush()
+                if stopping:
+                    break
+
+    def _drain(self, f):
+        buffer = self._buffer
+        popleft = buffer.popleft
+        lines = []
+        while buffer:
+            ts, message = popleft()
+            lines.append(f"{ts:.6f}\t{_one_line(message)}\n")
+            if len(lines) >= 10_000:
+                f.write("".join(lines))
+                self.written += len(lines)
+                lines = []
+        if lines:
+            f.write("".join(lines))
+            self.written += len(lines)
+
+    def close(self, timeout=10.0) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._writer.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": len(self._buffer),
+        }
+
+
+def _one_line(message) -> str:
+    if isinstance(message, bytes):
+        message = message.decode("utf-8", "replace")
+    # в JSON перевод строки вне строковых литералов — просто пробел
+    return message.replace("\r", " ").replace("\n", " ") if "\n" in message or "\r" in message else message
+
+
+# ------------------------------------------------------------
+# READ
+# ------------------------------------------------------------
+def iter_capture(path) -> Iterator[Tuple[float, str]]:
+    """
+    (recv_ts, message) по порядку записи; заголовки сессий пропускаются.
+    Оборванный хвост (процесс убит без close) читается до места обрыва.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.startswith("#") or not line.endswith("\n"):
+                    continue
+                ts, sep, message = line[:-1].partition("\t")
+                if not sep:
+                    continue
+                yield float(ts), message
+        except EOFError:
+            logging.getLogger("RelayRecorder").warning(f"{path}: truncated capture, read up to the break")
+
+
+def load_capture(path, limit=None) -> List[Tuple[float, str]]:
+    """Весь захват в память — чтобы замер не включал gzip-распаковку."""
+    out = []
+    for item in iter_capture(path):
+        out.append(item)
+        if limit is not None and len(out) >= limit:
+            break
+    return out
+
+
+def capture_symbols(messages) -> List[str]:
+    seen = {}
+    for _, message in messages:
+        m = _TOPIC_RE.search(message)
+        if m:
+            seen.setdefault(m.group(1), None)
+    return list(seen)
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class RelayReplayer:
+    """
+    Подаёт захват в feed.on_message. speed: 1.0 — реальный темп, N — в N раз
+    быстрее, 0 / None — без пауз. step(changed) вызывается после каждого
+    сообщения с символами из feed.wait_for_updates(0) (только непустыми).
+    """
+
+    def __init__(self, messages, speed: Optional[float] = 1.0):
+        self.messages = messages
+        self.speed = speed or 0.0
+
+    @classmethod
+    def from_file(cls, path, speed: Optional[float] = 1.0, limit=None):
+        return cls(load_capture(path, limit), speed)
+
+    def run(self, feed, step: Optional[Callable[[set], None]] = None) -> dict:
+        messages = self.messages
+        if not messages:
+            return {"messages": 0}
+        on_message = feed.on_message
+        speed = self.speed
+        first_ts = messages[0][0]
+        latencies = []
+        max_behind = 0.0
+        started = time.perf_counter()
+        for ts, message in messages:
+            if speed > 0:
+                due = started + (ts - first_ts) / speed
+                now = time.perf_counter()
+                if due > now:
+                    time.sleep(due - now)
+                elif now - due > max_behind:
+                    max_behind = now - due
+            t0 = time.perf_counter()
+            on_message(None, message)
+            if step is not None:
+                changed = feed.wait_for_updates(timeout=0)
+                if changed:
+                    step(changed)
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "messages": len(messages),
+            "elapsed_s": elapsed,
+            "capture_span_s": messages[-1][0] - first_ts,
+            "msg_per_s": len(messages) / elapsed if elapsed > 0 else float("inf"),
+            "p50_us": _percentile(latencies, 0.5) * 1e6,
+            "p99_us": _percentile(latencies, 0.99) * 1e6,
+            "max_us": latencies[-1] * 1e6,
+            "max_behind_s": max_behind,
+        }
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def _cmd_record(args):
+    from config import Config
+    from ws_price_feed import WSPriceFeed
+
+    config = Config()
+    feed = WSPriceFeed(config, autostart=False)
+    recorder = RelayRecorder(args.path, source=feed.ws_url).attach(feed)
+    feed.start()
+    print(f"Recording {feed.ws_url} → {args.path} ({len(feed.registry)} symbols), Ctrl+C to stop")
+    deadline = time.time() + args.seconds if args.seconds else None
+    try:
+        while deadline is None or time.time() < deadline:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    recorder.close()
+    print(recorder.stats())
+
+
+def _cmd_replay(args):
+    from config import Config
+    from symbol_registry import SymbolRegistry
+    from ws_price_feed import WSPriceFeed
+
+    messages = load_capture(args.path, args.limit)
+    symbols = args.symbols.split(",") if args.symbols else capture_symbols(messages)
+    config = Config()
+    registry = SymbolRegistry(symbols)
+    feed = WSPriceFeed(config, registry=registry, autostart=False)
+    step = None
+    if args.pipeline == "market":
+        from market_data_manager import MarketDataManager
+        market = MarketDataManager(config, feed, backfill=False, registry=registry)
+
+        def step(changed):
+            market.update(changed)
+
+    speed = 0.0 if args.speed == "max" else float(args.speed.rstrip("x"))
+    result = RelayReplayer(messages, speed).run(feed, step)
+    print(f"{args.path}: {len(symbols)} symbols, pipeline={args.pipeline}, speed={args.speed}")
+    for key, value in result.items():
+        print(f"  {key:<15} {value:,.3f}" if isinstance(value, float) else f"  {key:<15} {value}")
+    print(f"  health          {feed.health.stats()}")
+
+
+def _cmd_info(args):
+    count = 0
+    first = last = None
+    symbols = {}
+    for ts, message in iter_capture(args.path):
+        count += 1
+        first = ts if first is None else first
+        last = ts
+        m = _TOPIC_RE.search(message)
+        if m:
+            symbols[m.group(1)] = symbols.get(m.group(1), 0) + 1
+    span = (last - first) if count else 0.0
+    print(f"{args.path}: {count} messages, {span:.1f} s, {count / span if span else 0:.1f} msg/s")
+    for sym, n in sorted(symbols.items(), key=lambda kv: -kv[1]):
+        print(f"  {sym:<14} {n}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Record / replay raw relay traffic")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="write live relay traffic to a capture file")
+    rec.add_argument("path")
+    rec.add_argument("--seconds", type=float, default=0, help="0 — until Ctrl+C")
+    rep = sub.add_parser("replay", help="feed a capture through WSPriceFeed.on_message")
+    rep.add_argument("path")
+    rep.add_argument("--speed", default="1", help="1, 10, 10x ... or max")
+    rep.add_argument("--pipeline", choices=("feed", "market"), default="feed")
+    rep.add_argument("--symbols", default="", help="comma list; default — all kline symbols in capture")
+    rep.add_argument("--limit", type=int, default=None)
+    info = sub.add_parser("info", help="capture summary")
+    info.add_argument("path")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    {"record": _cmd_record, "replay": _cmd_replay, "info": _cmd_info}[args.cmd](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# ============================================================
+# STREAMING INDICATORS v1.1 — инкрементальные EMA / RSI / ATR / ADX
+# ------------------------------------------------------------
+# Состояние индикатора хранится по (symbol, timeframe, indicator, period);
+# timeframe — history.timeframe (OHLCRingBuffer), у list — None: 1m и
+# агрегированная история символа не перетирают состояние друг друга.
+# - новый бар: O(1) обновление
+# - ревизия формирующегося бара (WS переписывает последний бар до
+#   confirm): пересчёт от состояния на предыдущем баре, тоже O(1)
+# Формулы повторяют EnhancedTechnicalAnalyzer один в один: на растущей
+# истории значения совпадают побитово, на окне фиксированной длины —
+# в пределах затухания начального значения (~1e-9).
+# ============================================================
+
+from typing import Optional
+
+
+class StreamingIndicator:
+    """
+    Базовый класс: _state — состояние после всех баров, кроме последнего,
+    _current — с учётом последнего (возможно ещё формирующегося) бара.
+    """
+
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self.value: Optional[float] = None
+        self._state = self._initial()
+        self._current = None
+        self._last_start = None
+        self._last_key = None
+
+    def append(self, bar: dict, start=None) -> Optional[float]:
+        """Новый бар: последний бар становится закрытым."""
+        if self._current is not None:
+            self._state = self._current
+        self._current = self._advance(self._state, bar)
+        self._last_start = start
+        self._last_key = self._key(bar)
+        self.count += 1
+        self.value = self._result(self._current)
+        return self.value
+
+    def revise(self, bar: dict) -> Optional[float]:
+        """Переписанный последний бар: пересчёт от состояния на предыдущем."""
+        if self._current is None:
+            return self.append(bar)
+        key = self._key(bar)
+        if key != self._last_key:
+            self._current = self._advance(self._state, bar)
+            self._last_key = key
+            self.value = self._result(self._current)
+        return self.value
+
+    def reset(self):
+        self.__init__(self.period)
+
+    # --- реализуется в наследниках ---
+    def _initial(self):
+        raise NotImplementedError
+
+    def _advance(self, state, bar):
+        raise NotImplementedError
+
+    def _result(self, state) -> Optional[float]:
+        raise NotImplementedError
+
+    def _key(self, bar):
+        return bar["close"]
+
+
+# ------------------------------------------------------------
+# EMA — старт с первого close, как в EnhancedTechnicalAnalyzer.ema
+# ------------------------------------------------------------
+class StreamingEMA(StreamingIndicator):
+    def _initial(self):
+        return 0, 0.0
+
+    def _advance(self, state, bar):
+        n, value = state
+        price = float(bar["close"])
+        if n == 0:
+            return 1, price
+        return n + 1, (price - value) * (2 / (self.period + 1)) + value
+
+    def _result(self, state):
+        n, value = state
+        if self.period <= 0 or n < self.period:
+            return None
+        return float(value)
+
+
+# ------------------------------------------------------------
+# RSI — простые средние gain/loss за последние period изменений
+# ------------------------------------------------------------
+class StreamingRSI(StreamingIndicator):
+    def _initial(self):
+        return 0, None, ()
+
+    def _advance(self, state, bar):
+        n, prev_close, deltas = state
+        price = float(bar["close"])
+        if n == 0:
+            return 1, price, ()
+        delta = price - prev_close
+        move = (delta, 0.0) if delta > 0 else (0.0, abs(delta))
+        return n + 1, price, (deltas + (move,))[-self.period:]
+
+    def _result(self, state):
+        n, _, deltas = state
+        period = self.period
+        if period <= 0 or n < period + 1:
+            return None
+        avg_gain = sum(g for g, _ in deltas) / period
+        avg_loss = sum(l for _, l in deltas) / period
+        if avg_loss == 0:
+            return 100.0
+        if avg_gain == 0:
+            return 0.0
+        rs = avg_gain / avg_loss
+        return float(100 - (100 / (1 + rs)))
+
+
+# ------------------------------------------------------------
+# ATR — простое среднее True Range за последние period баров
+# ------------------------------------------------------------
+class StreamingATR(StreamingIndicator):
+    def _initial(self):
+        return 0, None, ()
+
+    def _advance(self, state, bar):
+        n, prev_close, trs = state
+        high, low, close = float(bar["high"]), float(bar["low"]), float(bar["close"])
+        if n == 0:
+            return 1, close, ()
+        tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        return n + 1, close, (trs + (tr,))[-self.period:]
+
+    def _result(self, state):
+        n, _, trs = state
+        if n < self.period + 1 or len(trs) < self.period:
+            return None
+        return sum(trs) / self.period
+
+    def _key(self, bar):
+        return bar["high"], bar["low"], bar["close"]
+
+
+# ------------------------------------------------------------
+# ADX — сглаживание Уайлдера TR/+DM/-DM, затем среднее DX
+# ------------------------------------------------------------
+class StreamingADX(StreamingIndicator):
+    def _initial(self):
+        # n, prev_high, prev_low, prev_close, k, s_tr, s_plus, s_minus, n_dx, dx_sum, adx
+        return 0, None, None, None, 0, 0.0, 0.0, 0.0, 0, 0.0, None
+
+    def _advance(self, state, bar):
+        n, prev_high, prev_low, prev_close, k, s_tr, s_plus, s_minus, n_dx, dx_sum, adx = state
+        high, low, close = float(bar["high"]), float(bar["low"]), float(bar["close"])
+        if n == 0:
+            return 1, high, low, close, 0, 0.0, 0.0, 0.0, 0, 0.0, None
+        period = self.period
+
+        tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        up = high - prev_high
+        down = prev_low - low
+        plus_dm = up if up > down and up > 0 else 0
+        minus_dm = down if down > up and down > 0 else 0
+
+        k += 1
+        if k <= period:
+            s_tr += tr
+            s_plus += plus_dm
+            s_minus += minus_dm
+        else:
+            s_tr = s_tr - (s_tr / period) + tr
+            s_plus = s_plus - (s_plus / period) + plus_dm
+            s_minus = s_minus - (s_minus / period) + minus_dm
+
+        if k >= period:
+            plus_di = 100 * s_plus / s_tr if s_tr else 0
+            minus_di = 100 * s_minus / s_tr if s_tr else 0
+            dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di) if (plus_di + minus_di) else 0
+            n_dx += 1
+            if n_dx <= period:
+                dx_sum += dx
+                if n_dx == period:
+                    adx = dx_sum / period
+            else:
+                adx = (adx * (period - 1) + dx) / period
+
+        return n + 1, high, low, close, k, s_tr, s_plus, s_minus, n_dx, dx_sum, adx
+
+    def _result(self, state):
+        n, adx = state[0], state[-1]
+        if n < self.period + 1 or adx is None:
+            return None
+        return float(adx)
+
+    def _key(self, bar):
+        return bar["high"], bar["low"], bar["close"]
+
+
+# ============================================================
+# ENGINE — индикаторы по (symbol, timeframe, indicator, period) поверх истории баров
+# ============================================================
+class StreamingIndicatorEngine:
+    """
+    Тот же интерфейс, что у EnhancedTechnicalAnalyzer, но по символу и
+    истории баров (list[dict] со start/high/low/close). При каждом вызове
+    досинхронизирует индикатор только новыми барами с конца истории.
+    """
+
+    KINDS = {
+        "ema": StreamingEMA,
+        "rsi": StreamingRSI,
+        "atr": StreamingATR,
+        "adx": StreamingADX,
+    }
+
+    def __init__(self):
+        self._streams = {}
+
+    def ema(self, symbol, history, period):
+        return self.value(symbol, history, "ema", period)
+
+    def rsi(self, symbol, history, period):
+        return self.value(symbol, history, "rsi", period)
+
+    def atr(self, symbol, history, period=14):
+        return self.value(symbol, history, "atr", period)
+
+    def adx(self, symbol, history, period=14):
+        return self.value(symbol, history, "adx", period)
+
+    def value(self, symbol, history, kind, period):
+        if not history:
+            return None
+        key = (symbol, getattr(history, "timeframe", None), kind, period)
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = self.KINDS[kind](period)
+        return self._sync(stream, history)
+
+    def reset(self, symbol=None):
+        if symbol is None:
+            self._streams.clear()
+            return
+        for key in [k for k in self._streams if k[0] == symbol]:
+            del self._streams[key]
+
+    @staticmethod
+    def _sync(stream, history):
+        last_start = stream._last_start
+        if stream.count == 0 or last_start is None:
+            return StreamingIndicatorEngine._rebuild(stream, history)
+
+        # идём с конца до бара, который индикатор видел последним
+        i = len(history) - 1
+        while i >= 0:
+            start = history[i].get("start")
+            if start is None:
+                return StreamingIndicatorEngine._rebuild(stream, history)
+            if start <= last_start:
+                break
+            i -= 1
+        if i < 0 or history[i].get("start") != last_start:
+            # разрыв: история не содержит последний учтённый бар
+            return StreamingIndicatorEngine._rebuild(stream, history)
+
+        stream.revise(history[i])
+        for j in range(i + 1, len(history)):
+            bar = history[j]
+            stream.append(bar, bar.get("start"))
+        return stream.value
+
+    @staticmethod
+    def _rebuild(stream, history):
+        stream.reset()
+        for bar in history:
+            stream.append(bar, bar.get("start"))
+        return stream.value
@@ -0,0 +1,116 @@
+# ============================================================
+# SYMBOL REGISTRY v1.0 — единый список торгуемых символов
+# ------------------------------------------------------------
+# - symbol → плотный int id (освобождённые id переиспользуются,
+#   поэтому id можно использовать как индекс в массивах)
+# - `symbol in registry` — O(1) (dict), итерация — по неизменяемому
+#   снимку (tuple), безопасна при add/remove из другого потока
+# - add / remove в рантайме, подписчики получают ("add"|"remove", symbol, id):
+#   на add — ДО публикации снимка (структуры готовы к первой итерации),
+#   на remove — ПОСЛЕ (итерация уже не видит символ)
+# Источник по умолчанию — config.trading.symbols (env SYMBOLS).
+# ============================================================
+
+import logging
+import threading
+from typing import Callable, Iterator, List, Optional, Tuple
+
+
+class SymbolRegistry:
+    def __init__(self, symbols=()):
+        self.logger = logging.getLogger("SymbolRegistry")
+        self._ids = {}
+        self._by_id: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._snapshot: Tuple[str, ...] = ()
+        self._listeners: List[Callable[[str, str, int], None]] = []
+        self._lock = threading.RLock()
+        self.version = 0
+        for symbol in symbols:
+            self.add(symbol)
+
+    @classmethod
+    def from_config(cls, config):
+        trading = getattr(config, "trading", None)
+        return cls(getattr(trading, "symbols", None) or [])
+
+    # ------------------------------------------------------------
+    # MUTATION
+    # ------------------------------------------------------------
+    def add(self, symbol: str) -> int:
+        symbol = symbol.strip().upper()
+        if not symbol:
+            raise ValueError("empty symbol")
+        with self._lock:
+            sid = self._ids.get(symbol)
+            if sid is not None:
+                return sid
+            if self._free:
+                sid = self._free.pop()
+                self._by_id[sid] = symbol
+            else:
+                sid = len(self._by_id)
+                self._by_id.append(symbol)
+            self._ids[symbol] = sid
+            self._notify("add", symbol, sid)
+            self._snapshot = self._snapshot + (symbol,)
+            self.version += 1
+            return sid
+
+    def remove(self, symbol: str) -> bool:
+        symbol = symbol.strip().upper()
+        with self._lock:
+            sid = self._ids.pop(symbol, None)
+            if sid is None:
+                return False
+            self._by_id[sid] = None
+            self._free.append(sid)
+            self._snapshot = tuple(s for s in self._snapshot if s != symbol)
+            self.version += 1
+            self._notify("remove", symbol, sid)
+            return True
+
+    def subscribe(self, callback: Callable[[str, str, int], None]) -> None:
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _notify(self, event, symbol, sid):
+        for callback in self._listeners:
+            try:
+                callback(event, symbol, sid)
+            except Exception as e:
+                self.logger.error(f"Registry listener failed on {event} {symbol}: {e}")
+
+    # ------------------------------------------------------------
+    # LOOKUP
+    # ------------------------------------------------------------
+    def id(self, symbol: str) -> Optional[int]:
+        return self._ids.get(symbol)
+
+    def symbol(self, sid: int) -> Optional[str]:
+        return self._by_id[sid] if 0 <= sid < len(self._by_id) else None
+
+    @property
+    def capacity(self) -> int:
+        """Верхняя граница id + 1 — размер массивов, индексируемых по id."""
+        return len(self._by_id)
+
+    def symbols(self) -> Tuple[str, ...]:
+        return self._snapshot
+
+    def chunks(self, size: int) -> List[List[str]]:
+        snapshot = self._snapshot
+        size = max(1, size)
+        return [list(snapshot[i:i + size]) for i in range(0, len(snapshot), size)]
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._snapshot)
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def __repr__(self) -> str:
+        return f"SymbolRegistry({len(self._snapshot)} symbols)"
@@ -0,0 +1,313 @@
+# ============================================================
+# SYNTHETIC RELAY v1.0 — локальный relay kline.1 для нагрузочных тестов
+# ------------------------------------------------------------
+# Тот же протокол, что у боевого relay (Bybit public WS):
+#   → {"op":"subscribe","args":["kline.1.BTCUSDT",...]}   (и unsubscribe)
+#   ← {"success":true,"ret_msg":"","op":"subscribe","conn_id":...}
+#   ← {"topic":"kline.1.BTCUSDT","type":"snapshot","ts":...,"data":[{bar}]}
+#   → {"op":"ping"}  ← {"success":true,"ret_msg":"pong","op":"ping",...}
+# Свечи — random walk (логнормальный шаг) по любым подписанным символам;
+# на смене минуты уходит закрывающий бар (confirm=true). "timestamp" —
+# реальное время отправки: задержку считает FeedHealth клиента.
+# Нагрузка: --rate сообщений/с на символ (боевой relay ≈ 1), всплески
+# (--burst-every / --burst-seconds / --burst-factor), обрывы соединения
+# (--disconnect-every), сжатое время (--minute-seconds: минута свечи за N с).
+#
+#   python synthetic_relay.py serve --port 8765 --rate 10
+#   WS_URL=ws://127.0.0.1:8765/relay python main.py
+#   python synthetic_relay.py bench --symbols 200 --rate 50 --seconds 10 [--pipeline market]
+# ============================================================
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from aiohttp import WSMsgType, web
+
+KLINE_PREFIX = "kline.1."
+MINUTE_MS = 60_000
+
+
+class _SymbolWalk:
+    __slots__ = ("price", "start", "open", "high", "low", "volume", "turnover")
+
+    def __init__(self, price, start):
+        self.price = price
+        self.start = start
+        self.open = self.high = self.low = price
+        self.volume = 0.0
+        self.turnover = 0.0
+
+
+class SyntheticMarket:
+    """Random walk 1m-свечей; время свечей может идти быстрее реального."""
+
+    def __init__(self, seed=1, volatility=0.0005, minute_seconds=60.0):
+        self.rnd = random.Random(seed)
+        self.volatility = volatility
+        self.time_scale = 60.0 / minute_seconds
+        self._t0 = time.time()
+        self._walks: Dict[str, _SymbolWalk] = {}
+
+    def sim_ms(self, now: float) -> int:
+        return int((self._t0 + (now - self._t0) * self.time_scale) * 1000)
+
+    def _walk(self, symbol, start):
+        walk = self._walks.get(symbol)
+        if walk is None:
+            # стабильная стартовая цена по имени: 1 … ~50k
+            base = math.exp((zlib.crc32(symbol.encode()) % 1000) / 1000 * math.log(50_000))
+            walk = self._walks[symbol] = _SymbolWalk(base, start)
+        return walk
+
+    def messages(self, symbol: str, now: float) -> List[str]:
+        """Одно обновление символа; на смене минуты — сначала закрывающий бар."""
+        sim = self.sim_ms(now)
+        start = sim - sim % MINUTE_MS
+        walk = self._walk(symbol, start)
+        out = []
+        if start != walk.start:
+            out.append(self._message(symbol, walk, now, confirm=True))
+            walk.start = start
+            walk.open = walk.high = walk.low = walk.price
+            walk.volume = walk.turnover = 0.0
+        rnd = self.rnd
+        walk.price *= math.exp(rnd.gauss(0.0, self.volatility))
+        walk.high = max(walk.high, walk.price)
+        walk.low = min(walk.low, walk.price)
+        qty = rnd.expovariate(1.0) * 10
+        walk.volume += qty
+        walk.turnover += qty * walk.price
+        out.append(self._message(symbol, walk, now, confirm=False))
+        return out
+
+    @staticmethod
+    def _message(symbol, walk, now, confirm):
+        ts = int(now * 1000)
+        return (
+            f'{{"topic":"{KLINE_PREFIX}{symbol}","type":"snapshot","ts":{ts},"data":[{{'
+            f'"start":{walk.start},"end":{walk.start + MINUTE_MS - 1},"interval":"1",'
+            f'"open":"{walk.open:.6g}","close":"{walk.price:.6g}","high":"{walk.high:.6g}",'
+            f'"low":"{walk.low:.6g}","volume":"{walk.volume:.4f}","turnover":"{walk.turnover:.4f}",'
+            f'"confirm":{"true" if confirm else "false"},"timestamp":{ts}}}]}}'
+        )
+
+
+class SyntheticRelay:
+    def __init__(self, rate=1.0, tick=0.01, seed=1, volatility=0.0005, minute_seconds=60.0,
+                 burst_every=0.0, burst_seconds=1.0, burst_factor=10.0, disconnect_every=0.0):
+        self.logger = logging.getLogger("SyntheticRelay")
+        self.rate = rate  # сообщений/с на символ
+        self.tick = tick
+        self.market = SyntheticMarket(seed, volatility, minute_seconds)
+        self.rnd = random.Random(seed + 1)
+        self.burst_every = burst_every
+        self.burst_seconds = burst_seconds
+        self.burst_factor = burst_factor
+        self.disconnect_every = disconnect_every
+        self._conn_ids = itertools.count(1)
+        self.connections = 0
+        self.disconnects = 0
+        self.sent = 0
+        self._t0 = time.monotonic()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/relay", self._handle)
+        return app
+
+    def stats(self) -> dict:
+        return {"connections": self.connections, "disconnects": self.disconnects, "sent": self.sent}
+
+    def _rate_factor(self, mono) -> float:
+        if self.burst_every > 0 and (mono - self._t0) % self.burst_every < self.burst_seconds:
+            return self.burst_factor
+        return 1.0
+
+    # ------------------------------------------------------------
+    # CONNECTION
+    # ------------------------------------------------------------
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        conn_id = f"synthetic-{next(self._conn_ids)}"
+        self.connections += 1
+        topics: List[str] = []  # порядок подписки, round-robin по нему
+        streamer = asyncio.create_task(self._stream(ws, topics, conn_id))
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    request_op = json.loads(msg.data)
+                except ValueError:
+                    continue
+                await self._on_op(ws, request_op, topics, conn_id)
+        finally:
+            streamer.cancel()
+        return ws
+
+    async def _on_op(self, ws, request_op, topics, conn_id):
+        op = request_op.get("op")
+        if op == "ping":
+            await ws.send_str(json.dumps({"success": True, "ret_msg": "pong", "op": "ping", "conn_id": conn_id}))
+            return
+        if op not in ("subscribe", "unsubscribe"):
+            await ws.send_str(json.dumps({"success": False, "ret_msg": f"unknown op {op}", "conn_id": conn_id}))
+            return
+        for arg in request_op.get("args") or ():
+            if not arg.startswith(KLINE_PREFIX):
+                continue
+            symbol = arg[len(KLINE_PREFIX):]
+            if op == "subscribe" and symbol not in topics:
+                topics.append(symbol)
+            elif op == "unsubscribe" and symbol in topics:
+                topics.remove(symbol)
+        await ws.send_str(json.dumps({"success": True, "ret_msg": "", "op": op, "conn_id": conn_id,
+                                      "req_id": request_op.get("req_id", "")}))
+
+    async def _stream(self, ws, topics, conn_id):
+        disconnect_at = self._next_disconnect()
+        budget = 0.0
+        position = 0
+        last = time.monotonic()
+        while not ws.closed:
+            await asyncio.sleep(self.tick)
+            mono = time.monotonic()
+            if disconnect_at is not None and mono >= disconnect_at:
+                self.disconnects += 1
+                self.logger.info(f"{conn_id}: scheduled disconnect")
+                await ws.close(code=1001, message=b"synthetic disconnect")
+                return
+            if not topics:
+                last = mono
+                continue
+            budget += (mono - last) * self.rate * len(topics) * self._rate_factor(mono)
+            last = mono
+            count = int(budget)
+            budget -= count
+            now = time.time()
+            for _ in range(count):
+                position = (position + 1) % len(topics)
+                for message in self.market.messages(topics[position], now):
+                    await ws.send_str(message)
+                    self.sent += 1
+
+    def _next_disconnect(self) -> Optional[float]:
+        if self.disconnect_every <= 0:
+            return None
+        return time.monotonic() + self.rnd.expovariate(1.0 / self.disconnect_every)
+
+
+def run_server(relay: SyntheticRelay, host="127.0.0.1", port=8765):
+    web.run_app(relay.app(), host=host, port=port, print=None)
+
+
+def start_in_thread(relay: SyntheticRelay, host="127.0.0.1", port=0):
+    """Сервер в фоновом потоке (bench, тесты реконнекта); возвращает реальный порт."""
+    ready = threading.Event()
+    box = {}
+
+    async def main():
+        runner = web.AppRunner(relay.app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        box["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(main()), name="synthetic-relay", daemon=True).start()
+    if not ready.wait(10):
+        raise RuntimeError("synthetic relay did not start")
+    return box["port"]
+
+
+# ------------------------------------------------------------
+# BENCH: relay + WSPriceFeed (+ MarketDataManager) в одном процессе
+# ------------------------------------------------------------
+def _bench(args, relay):
+    from types import SimpleNamespace
+    from ws_price_feed import WSPriceFeed
+
+    port = start_in_thread(relay)
+    symbols = [f"SYN{i}USDT" for i in range(args.symbols)]
+    market = SimpleNamespace(ws_url=f"ws://127.0.0.1:{port}/relay", ws_subscribe_chunk=10, timeframes=[])
+    config = SimpleNamespace(trading=SimpleNamespace(symbols=symbols), market=market)
+    feed = WSPriceFeed(config)
+
+    cycles = []
+    if args.pipeline == "market":
+        from market_data_manager import MarketDataManager
+        market_data = MarketDataManager(config, feed, backfill=False)
+
+        def consume():
+            while True:
+                changed = feed.wait_for_updates(timeout=1.0, coalesce=0.002)
+                if changed:
+                    t0 = time.perf_counter()
+                    market_data.update(changed)
+                    cycles.append((len(changed), time.perf_counter() - t0))
+
+        threading.Thread(target=consume, name="bench-consumer", daemon=True).start()
+
+    time.sleep(args.seconds)
+    report = feed.health.report(symbols)
+    received = sum(r.get("messages", 0) for r in report.values())
+    p99 = [r["p99_ms"] for r in report.values() if r.get("p99_ms") is not None]
+    ewma = [r["latency_ewma_ms"] for r in report.values() if r.get("latency_ewma_ms") is not None]
+    print(f"{args.symbols} symbols × {args.rate} msg/s, {args.seconds:.0f} s")
+    # relay в том же процессе делит GIL с фидом; потолок relay — отдельный `serve`
+    print(f"  relay    {relay.stats()} ({relay.sent / args.seconds:,.0f} msg/s sent)")
+    print(f"  feed     {feed.health.stats()}")
+    print(f"  received {received} ({received / args.seconds:,.0f} msg/s of "
+          f"{args.symbols * args.rate:,.0f} target)")
+    if ewma:
+        print(f"  latency  ewma avg {sum(ewma) / len(ewma):.1f} ms, worst p99 bucket {max(p99)} ms")
+    if cycles:
+        durations = sorted(d for _, d in cycles)
+        print(f"  market   {len(cycles)} cycles, {sum(n for n, _ in cycles) / len(cycles):.1f} symbols/cycle, "
+              f"p50 {durations[len(durations) // 2] * 1e3:.2f} ms, max {durations[-1] * 1e3:.2f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local synthetic Bybit kline.1 relay")
+    ap.add_argument("cmd", choices=("serve", "bench"))
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--rate", type=float, default=1.0, help="messages/s per subscribed symbol")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--volatility", type=float, default=0.0005)
+    ap.add_argument("--minute-seconds", type=float, default=60.0, help="real seconds per 1m candle")
+    ap.add_argument("--burst-every", type=float, default=0.0, help="seconds between bursts, 0 — off")
+    ap.add_argument("--burst-seconds", type=float, default=1.0)
+    ap.add_argument("--burst-factor", type=float, default=10.0)
+    ap.add_argument("--disconnect-every", type=float, default=0.0, help="mean seconds between drops, 0 — off")
+    ap.add_argument("--symbols", type=int, default=50, help="bench: subscribed symbols")
+    ap.add_argument("--seconds", type=float, default=10.0, help="bench: duration")
+    ap.add_argument("--pipeline", choices=("feed", "market"), default="feed", help="bench: consumer")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO if args.cmd == "serve" else logging.WARNING)
+
+    relay = SyntheticRelay(
+        rate=args.rate, seed=args.seed, volatility=args.volatility, minute_seconds=args.minute_seconds,
+        burst_every=args.burst_every, burst_seconds=args.burst_seconds, burst_factor=args.burst_factor,
+        disconnect_every=args.disconnect_every,
+    )
+    if args.cmd == "serve":
+        print(f"Synthetic relay on ws://{args.host}:{args.port}/relay ({args.rate} msg/s per symbol)")
+        run_server(relay, args.host, args.port)
+    else:
+        _bench(args, relay)
+
+
+if __name__ == "__main__":
+    main()
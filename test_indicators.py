@@ -0,0 +1,171 @@
+# ============================================================
+# TEST INDICATORS — паритет индикаторов с EnhancedTechnicalAnalyzer
+# ------------------------------------------------------------
+# - StreamingIndicatorEngine (растущая история, ревизия последнего бара,
+#   1m и 5m история одного символа) == скалярные ema / rsi / atr / adx
+# - *_series (и BatchTechnicalAnalyzer при наличии NumPy) == скалярные
+#   на каждом баре, включая участок без движения цены
+# - IndicatorCache сбрасывается при смене OHLCRingBuffer.generation
+#
+#   python -m pytest -q test_indicators.py
+# ============================================================
+
+import random
+
+import pytest
+
+from enhanced_technical_analyzer import EnhancedTechnicalAnalyzer
+from indicator_cache import IndicatorCache
+from ohlc_ring_buffer import OHLCRingBuffer
+from streaming_indicators import StreamingIndicatorEngine
+from timeframe_aggregator import TimeframeAggregator
+
+INDICATORS = (("ema", 7), ("ema", 25), ("rsi", 14), ("atr", 14), ("adx", 14), ("rsi", 2), ("atr", 1))
+TOL = 1e-9
+
+
+def make_bars(count=400, seed=5, start=1_699_999_800_000):
+    """1m бары random walk от границы 5m; бары 150..189 — без движения цены (RSI 100, ATR 0)."""
+    rnd = random.Random(seed)
+    price = 100.0
+    bars = []
+    for i in range(count):
+        flat = 150 <= i < 190
+        close = price if flat else price * (1 + rnd.uniform(-0.003, 0.003))
+        high = max(price, close) * (1 if flat else 1 + rnd.uniform(0, 0.001))
+        low = min(price, close) * (1 if flat else 1 - rnd.uniform(0, 0.001))
+        bars.append({"start": start + i * 60_000, "end": start + i * 60_000 + 59_999, "open": price,
+                     "high": high, "low": low, "close": close, "volume": 1.0, "confirm": True})
+        price = close
+    return bars
+
+
+def scalar(analyzer, bars, kind, period):
+    highs = [b["high"] for b in bars]
+    lows = [b["low"] for b in bars]
+    closes = [b["close"] for b in bars]
+    if kind in ("ema", "rsi"):
+        return getattr(analyzer, kind)(closes, period)
+    return getattr(analyzer, kind)(highs, lows, closes, period)
+
+
+def assert_close(actual, expected):
+    if expected is None:
+        assert actual is None
+    else:
+        assert actual is not None and abs(actual - expected) <= TOL * max(1.0, abs(expected))
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return make_bars()
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return EnhancedTechnicalAnalyzer()
+
+
+def test_streaming_matches_scalar_on_growing_history(bars, analyzer):
+    engine = StreamingIndicatorEngine()
+    history = []
+    for bar in bars:
+        history.append(bar)
+        for kind, period in INDICATORS:
+            assert_close(engine.value("S", history, kind, period), scalar(analyzer, history, kind, period))
+
+
+def test_streaming_revision_of_last_bar(bars, analyzer):
+    engine = StreamingIndicatorEngine()
+    history = list(bars[:100])
+    for kind, period in INDICATORS:
+        engine.value("S", history, kind, period)
+    # формирующийся бар переписан (тот же start) — пересчёт от предыдущего состояния
+    history[-1] = dict(history[-1], close=history[-1]["close"] * 1.002, high=history[-1]["high"] * 1.003)
+    for kind, period in INDICATORS:
+        assert_close(engine.value("S", history, kind, period), scalar(analyzer, history, kind, period))
+
+
+@pytest.mark.parametrize("kind,period", INDICATORS)
+def test_series_match_scalar(bars, analyzer, kind, period):
+    highs = [b["high"] for b in bars]
+    lows = [b["low"] for b in bars]
+    closes = [b["close"] for b in bars]
+    if kind in ("ema", "rsi"):
+        series = getattr(analyzer, f"{kind}_series")(closes, period)
+    else:
+        series = getattr(analyzer, f"{kind}_series")(highs, lows, closes, period)
+    assert len(series) == len(bars)
+    for i in range(len(bars)):
+        assert_close(series[i], scalar(analyzer, bars[:i + 1], kind, period))
+
+
+def test_series_flat_stretch_is_exact(bars, analyzer):
+    closes = [b["close"] for b in bars]
+    highs = [b["high"] for b in bars]
+    lows = [b["low"] for b in bars]
+    assert analyzer.rsi_series(closes, 14)[180] == 100.0
+    assert analyzer.atr_series(highs, lows, closes, 14)[180] == 0.0
+
+
+@pytest.mark.parametrize("kind,period", INDICATORS)
+def test_batch_matches_series(bars, analyzer, kind, period):
+    np = pytest.importorskip("numpy")
+    from batch_technical_analyzer import BatchTechnicalAnalyzer
+
+    other = make_bars(seed=11)
+    rows = [bars, other]
+    highs = np.array([[b["high"] for b in row] for row in rows])
+    lows = np.array([[b["low"] for b in row] for row in rows])
+    closes = np.array([[b["close"] for b in row] for row in rows])
+    batch = BatchTechnicalAnalyzer()
+    if kind in ("ema", "rsi"):
+        matrix = getattr(batch, f"{kind}_series")(closes, period)
+    else:
+        matrix = getattr(batch, f"{kind}_series")(highs, lows, closes, period)
+    for row, series in zip(rows, matrix):
+        expected = scalar_series(analyzer, row, kind, period)
+        for value, exp in zip(series.tolist(), expected):
+            assert_close(None if value != value else value, exp)
+
+
+def scalar_series(analyzer, bars, kind, period):
+    closes = [b["close"] for b in bars]
+    if kind in ("ema", "rsi"):
+        return getattr(analyzer, f"{kind}_series")(closes, period)
+    return getattr(analyzer, f"{kind}_series")([b["high"] for b in bars], [b["low"] for b in bars], closes, period)
+
+
+def test_timeframes_keep_separate_state(bars, analyzer):
+    engine = StreamingIndicatorEngine()
+    minute = OHLCRingBuffer(len(bars))
+    agg = TimeframeAggregator(5, len(bars))
+    for bar in bars:
+        minute.append(bar)
+        agg.update(bar)
+        # вызовы по 1m и 5m истории чередуются на одном движке и символе
+        assert_close(engine.ema("S", minute, 7), scalar(analyzer, list(minute), "ema", 7))
+        assert_close(engine.ema("S", agg.bars, 7), scalar(analyzer, list(agg.bars), "ema", 7))
+
+
+def test_cache_hits_while_last_bar_unchanged(bars):
+    cache = IndicatorCache(StreamingIndicatorEngine())
+    history = OHLCRingBuffer(100, bars[:100])
+    first = cache.rsi("S", history, 14)
+    assert cache.rsi("S", history, 14) == first
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_resets_on_generation_change(bars, analyzer):
+    cache = IndicatorCache(StreamingIndicatorEngine())
+    history = OHLCRingBuffer(200, bars[:200])
+    for kind, period in INDICATORS:
+        cache.get("S", history, kind, period)
+
+    # backfill: та же история с тем же последним баром, но другими барами до него
+    replaced = make_bars(count=199, seed=99) + [bars[199]]
+    replaced = [dict(b, start=bars[i]["start"], end=bars[i]["end"]) for i, b in enumerate(replaced)]
+    history.clear()
+    history.extend(replaced)
+    for kind, period in INDICATORS:
+        assert_close(cache.get("S", history, kind, period), scalar(analyzer, replaced, kind, period))
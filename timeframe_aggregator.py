@@ -0,0 +1,95 @@
+# ============================================================
+# TIMEFRAME AGGREGATOR v1.0 — старшие таймфреймы из потока 1m
+# ------------------------------------------------------------
+# Каждый 1m бар обновляет старший бар за O(1):
+# - закрытые минуты текущего старшего бара свёрнуты в base
+#   (open, high, low, volume), формирующаяся минута хранится отдельно
+# - ревизия формирующейся минуты (тот же start) просто заменяет её
+#   вклад — без пересчёта остальных минут корзины
+# - новая минута сворачивает предыдущую в base, новая корзина
+#   начинает старший бар заново
+# Корзины выровнены по epoch, как kline.5 / kline.15 / kline.60 Bybit.
+# Старший бар confirm, когда подтверждена последняя минута корзины.
+# ============================================================
+
+from typing import Iterable, Optional
+
+from ohlc_ring_buffer import OHLCRingBuffer
+
+MINUTE_MS = 60_000
+
+
+def parse_timeframe(timeframe) -> int:
+    """"5" / "5m" / 5 → 5, "1h" → 60, "1d" → 1440 (в минутах)."""
+    if isinstance(timeframe, int):
+        minutes = timeframe
+    else:
+        tf = str(timeframe).strip().lower()
+        units = {"m": 1, "h": 60, "d": 1440}
+        if tf and tf[-1] in units:
+            minutes = int(tf[:-1]) * units[tf[-1]]
+        else:
+            minutes = int(tf)
+    if minutes <= 0:
+        raise ValueError(f"invalid timeframe: {timeframe!r}")
+    return minutes
+
+
+class TimeframeAggregator:
+    def __init__(self, minutes: int, capacity: int):
+        self.minutes = minutes
+        self.step_ms = minutes * MINUTE_MS
+        self.bars = OHLCRingBuffer(capacity, timeframe=minutes)
+        self._bucket = None       # start текущего старшего бара
+        self._base = None         # (open, high, low, volume) закрытых минут корзины
+        self._minute = None       # start последней применённой минуты
+        self._minute_bar = None
+
+    def update(self, bar: dict) -> bool:
+        """Применить 1m бар (новый или ревизию последнего). Старые игнорируются."""
+        start = bar.get("start")
+        if start is None or (self._minute is not None and start < self._minute):
+            return False
+        bucket = start - start % self.step_ms
+        if bucket != self._bucket:
+            self._bucket = bucket
+            self._base = None
+        elif start != self._minute:
+            self._base = self._fold(self._base, self._minute_bar)
+        self._minute = start
+        self._minute_bar = bar
+
+        open_, high, low, volume = self._fold(self._base, bar)
+        self.bars.upsert({
+            "start": bucket,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": bar["close"],
+            "volume": volume,
+            "end": bucket + self.step_ms - 1,
+            "confirm": bool(bar.get("confirm")) and start + MINUTE_MS >= bucket + self.step_ms,
+        })
+        return True
+
+    def rebuild(self, bars: Iterable[dict]) -> None:
+        """Полная пересборка (после backfill / перезагрузки истории)."""
+        self.bars.clear()
+        self._bucket = self._base = self._minute = self._minute_bar = None
+        for bar in bars:
+            self.update(bar)
+
+    def last_start(self) -> Optional[int]:
+        return self._minute
+
+    @staticmethod
+    def _fold(base, bar):
+        volume = float(bar.get("volume") or 0.0)
+        if base is None:
+            return bar["open"], bar["high"], bar["low"], volume
+        return (
+            base[0],
+            bar["high"] if bar["high"] > base[1] else base[1],
+            bar["low"] if bar["low"] < base[2] else base[2],
+            base[3] + volume,
+        )
@@ -4,13 +4,24 @@
 # Для каждого тикера обе стратегии обновляют портфели/статистику.
 # MarketDataManager аккумулирует историю цен (для heartbeat/стратегий).
 # Теперь ГАРАНТИРОВАН вызов обработки для каждой стратегии и каждого тикера.
+# v11.3: event-driven — цикл спит в feed.wait_for_updates() и просыпается
+# на первое обновление (плюс окно склейки), обрабатывая только изменившиеся
+# символы. Таймаут ожидания — проверка мёртвого фида и heartbeat.
+# v11.4: свой WSPriceFeed больше не создаётся — фид общий (DI), liveness
+# проверяется у того же фида, из которого MarketDataManager берёт бары.
+# v11.5: алерты по символам из feed.health — замолчавшие (stale) и
+# отстающие (задержка биржа → приём) рынки, плюс восстановление.
+# v11.6: тело цикла — cycle(changed): run() ждёт фид в потоке, в режиме
+# RUNTIME=async тот же cycle() вызывает задача async_runtime.
+# v11.7: on_tick получает полный свежий снимок (как в опросном цикле) и
+# зовётся не чаще loop_tick_seconds — bars_lifetime не зависит от частоты
+# пробуждений; сигналы на вход — только по изменившимся символам.
 # ============================================================
 
 import time
 import logging
 
 from ab_testing_engine import ABTestingEngine
-from ws_price_feed import WSPriceFeed
 from config import config
 
 logger = logging.getLogger("TradingLoop")
@@ -22,15 +33,32 @@ class TradingLoop:
                  telegram_bot=None,
                  heartbeat=None,
                  market_data=None,
-                 analyzer=None):
+                 analyzer=None,
+                 price_feed=None):
         self.config = config
-        self.price_feed = WSPriceFeed(config)
+        self.price_feed = price_feed if price_feed is not None else getattr(market_data, "ws", None)
+        if self.price_feed is None:
+            raise ValueError("TradingLoop требует общий price_feed (DI) или market_data с фидом")
         if ab_engine is None:
             raise ValueError("TradingLoop должен быть инициализирован с существующим ab_engine! (DI)")
         self.ab_engine = ab_engine  # <-- только через DI!
         self.telegram_bot = telegram_bot
         self.heartbeat = heartbeat
         self.market_data = market_data
+        trading = getattr(config, "trading", None)
+        self.coalesce_seconds = getattr(trading, "loop_coalesce_ms", 2.0) / 1000.0
+        self.wait_timeout = getattr(trading, "loop_wait_timeout", 1.0)
+        self.tick_seconds = getattr(trading, "loop_tick_seconds", 1.0)
+        self._last_tick = 0.0
+        market = getattr(config, "market", None)
+        self.symbol_stale_seconds = getattr(market, "symbol_stale_seconds", 30.0)
+        self.lag_alert_ms = getattr(market, "feed_lag_alert_ms", 2000.0)
+        self.health_check_seconds = getattr(market, "health_check_seconds", 5.0)
+        self._last_health_check = time.time()  # первая проверка — через health_check_seconds
+        self._stale_alerted = set()
+        self._lag_alerted = set()
+        self._dead_feed_alerted = False
+        self._last_heartbeat = 0
 
     def run(self):
         logger.info("== TRADING LOOP v11.2: STARTED — Parallel AB test ==")
@@ -41,64 +69,105 @@ class TradingLoop:
             print("[DEBUG] TradingLoop Portfolio (baseline) id:", id(self.ab_engine.baseline_strategy.portfolio))
         except Exception as e:
             print("[DEBUG] TradingLoop id print error:", e)
-        dead_feed_alerted = False
-        last_heartbeat = 0
-
+        feed = self.price_feed
         while True:
-            feed_alive = self.price_feed.is_alive()
-            now = time.time()
-
-            if not feed_alive:
-                if not dead_feed_alerted:
-                    logger.error("❌ Price Feed DEAD, no updates — check connection!")
-                    if self.telegram_bot:
-                        self.telegram_bot.send_alert("❌ WS Price Feed DEAD, no updates!")
-                    dead_feed_alerted = True
-                time.sleep(5)
-                continue
-            else:
-                if dead_feed_alerted:
-                    logger.info("✅ Price Feed restored.")
-                    if self.telegram_bot:
-                        self.telegram_bot.send_alert("✅ Price Feed restored!")
-                    dead_feed_alerted = False
-
-            # ------------------------
-            # Вот тут вся нежность: обновляем исторический буфер
-            self.market_data.update()
-
-            # ГАРАНТИРОВАННЫЙ вызов обработки для КАЖДОГО тикера и КАЖДОЙ стратегии:
-            market_snapshot = self.market_data.get_snapshot()
-            baseline_strategy = self.ab_engine.baseline_strategy
-            experimental_strategy = self.ab_engine.experimental_strategy
-            strategies = [
-                ("baseline", baseline_strategy),
-                ("experimental", experimental_strategy)
-            ]
+            changed = feed.wait_for_updates(timeout=self.wait_timeout, coalesce=self.coalesce_seconds)
+            self.cycle(changed)
+
+    def cycle(self, changed, now=None):
+        """
+        Один проход цикла по множеству изменившихся символов (пустое — таймаут).
+        Общий для run() (поток) и async_runtime (задача event loop).
+        """
+        feed = self.price_feed
+        now = now if now is not None else time.time()
+
+        if not feed.is_alive():
+            if not self._dead_feed_alerted:
+                logger.error("❌ Price Feed DEAD, no updates — check connection!")
+                if self.telegram_bot:
+                    self.telegram_bot.send_alert("❌ WS Price Feed DEAD, no updates!")
+                self._dead_feed_alerted = True
+            return
+        if self._dead_feed_alerted:
+            logger.info("✅ Price Feed restored.")
+            if self.telegram_bot:
+                self.telegram_bot.send_alert("✅ Price Feed restored!")
+            self._dead_feed_alerted = False
+
+        if now - self._last_health_check >= self.health_check_seconds:
+            self._last_health_check = now
+            self._check_symbol_health(feed, now)
+
+        if changed or now - self._last_tick >= self.tick_seconds:
+            self._process(changed, now)
+
+        # heartbeat раз в 300 сек
+        if self.heartbeat and (now - self._last_heartbeat > 300):
+            self.heartbeat.send()
+            self._last_heartbeat = now
 
+    def _check_symbol_health(self, feed, now):
+        health = getattr(feed, "health", None)
+        if health is None:
+            return
+        symbols = list(getattr(self.market_data, "symbols", None) or [])
+        stale = set(health.stale_symbols(symbols, self.symbol_stale_seconds, now))
+        lagging = set(health.lagging_symbols(self.lag_alert_ms)) - stale
+        self._alert_changes("stale", stale, self._stale_alerted,
+                            f"нет сообщений > {self.symbol_stale_seconds:.0f}s")
+        self._alert_changes("lagging", lagging, self._lag_alerted,
+                            f"задержка > {self.lag_alert_ms:.0f}ms")
+        self._stale_alerted, self._lag_alerted = stale, lagging
+
+    def _alert_changes(self, kind, current, alerted, reason):
+        new = sorted(current - alerted)
+        restored = sorted(alerted - current)
+        if new:
+            logger.warning(f"⚠️ Feed {kind}: {', '.join(new)} ({reason})")
+            if self.telegram_bot:
+                self.telegram_bot.send_alert(f"⚠️ Feed {kind}: {', '.join(new)} ({reason})")
+        if restored:
+            logger.info(f"✅ Feed {kind} restored: {', '.join(restored)}")
+            if self.telegram_bot:
+                self.telegram_bot.send_alert(f"✅ Feed {kind} restored: {', '.join(restored)}")
+
+    def _process(self, changed, now):
+        # ------------------------
+        # Вот тут вся нежность: обновляем исторический буфер (только изменившиеся)
+        if changed:
+            self.market_data.update(changed)
+
+        # ГАРАНТИРОВАННЫЙ вызов обработки для КАЖДОГО тикера и КАЖДОЙ стратегии:
+        market_snapshot = self.market_data.get_snapshot()
+        baseline_strategy = self.ab_engine.baseline_strategy
+        experimental_strategy = self.ab_engine.experimental_strategy
+        strategies = [
+            ("baseline", baseline_strategy),
+            ("experimental", experimental_strategy)
+        ]
+
+        if now - self._last_tick >= self.tick_seconds:
+            self._last_tick = now
             for strat_name, strategy in strategies:
                 strategy.on_tick(market_snapshot)  # стратегия сама обрабатывает TP/SL/trailing/etc
 
-            # --- [ PATCH: автоматическое открытие позиции по сигналу ] ---
-            for symbol, price in market_snapshot.items():
-                history = self.market_data.get_history(symbol)
-                for strat_name, strategy in strategies:
-                    sig = strategy.generate_signal(market_snapshot, symbol, history)
-                    # Считаем, что "signal" должен быть long или short И сигнальный confidence/strength должен присутствовать
-                    if (
-                            sig
-                            and sig.get("signal") in ("long", "short")
-                            and symbol not in strategy.active_trades
-                    ):
-                        confidence = sig.get("confidence", sig.get("strength"))
-                        logger.info(
-                            f"[{strat_name}] Opening position: {symbol} side={sig['signal']} conf={confidence}"
-                        )
-                        strategy.open_position(symbol, price, confidence, sig["signal"])
-
-            # heartbeat раз в 300 сек
-            if self.heartbeat and (now - last_heartbeat > 300):
-                self.heartbeat.send()
-                last_heartbeat = now
-
-            time.sleep(1)
\ No newline at end of file
+        # --- [ PATCH: автоматическое открытие позиции по сигналу ] ---
+        for symbol in changed:
+            price = market_snapshot.get(symbol)
+            if price is None:
+                continue
+            history = self.market_data.get_history(symbol)
+            for strat_name, strategy in strategies:
+                sig = strategy.generate_signal(market_snapshot, symbol, history)
+                # Считаем, что "signal" должен быть long или short И сигнальный confidence/strength должен присутствовать
+                if (
+                        sig
+                        and sig.get("signal") in ("long", "short")
+                        and symbol not in strategy.active_trades
+                ):
+                    confidence = sig.get("confidence", sig.get("strength"))
+                    logger.info(
+                        f"[{strat_name}] Opening position: {symbol} side={sig['signal']} conf={confidence}"
+                    )
+                    strategy.open_position(symbol, price, confidence, sig["signal"])
\ No newline at end of file
@@ -31,7 +31,7 @@ class TradingOrchestrator:
         """
         Запускает торговый цикл для списка символов.
         """
-        symbols = self.cfg.trading.symbols  # <-- список монет
+        symbols = list(getattr(self.di, "symbols", None) or self.cfg.trading.symbols)  # <-- список монет
 
         self.logger.info("🤖 Orchestrator v9.2 initialized")
         self.logger.info(f"▶️ Starting trading loop for symbols: {symbols}")
@@ -0,0 +1,238 @@
+# ============================================================
+# WALK FORWARD v1.0 — подбор параметров in-sample, оценка out-of-sample
+# ------------------------------------------------------------
+# История KlineStore (или захват / синтетика) режется на скользящие окна:
+#   [warmup][ in-sample (IS) ][ out-of-sample (OOS) ]
+# и окно сдвигается на step. В каждом окне:
+# 1) PrecomputedIndicators по всему окну (с прогревом) — серии EMA 7/25,
+#    ADX/ATR/RSI 14 считаются один раз: кандидаты меняют только пороги,
+#    индикаторы у всех одни и те же
+# 2) IS — все кандидаты param_sweep (пул процессов, общие серии через fork),
+#    лучший по --rank для каждой стратегии
+# 3) OOS — лучший кандидат и константы класса на следующем отрезке,
+#    теми же сериями; прогрев — последние warmup минут IS без торговли
+# Кандидаты выбираются один раз и одинаковы во всех окнах.
+# Итог: OOS pnl / просадка по окнам, суммарный OOS pnl и эффективность
+# (OOS pnl в день / IS pnl в день) — насколько подобранное переживает IS.
+#
+#   python walk_forward.py --store data/klines.sqlite --in-sample-days 14 --out-sample-days 7
+#   python walk_forward.py --synthetic 7 --minutes 86400 --mode lhs --samples 100
+# ============================================================
+
+import argparse
+import csv
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional
+
+from backtester import STRATEGIES, add_data_arguments, load_data
+from param_sweep import RANK_KEYS, make_jobs, parse_space, rank, run_sweep, sample_space
+from precomputed_indicators import PrecomputedIndicators
+
+DAY_MS = 86_400_000
+MINUTE_MS = 60_000
+
+
+class Window(NamedTuple):
+    index: int
+    is_start: int  # ms, start первого бара IS
+    is_end: int  # = start OOS
+    oos_end: int
+
+
+def make_windows(first: int, last: int, in_sample_ms: int, out_sample_ms: int,
+                 step_ms: Optional[int] = None) -> List[Window]:
+    """Окна, целиком лежащие в [first, last]; step по умолчанию — длина OOS (без перекрытия OOS)."""
+    step_ms = step_ms or out_sample_ms
+    windows = []
+    start = first
+    while start + in_sample_ms + out_sample_ms <= last + MINUTE_MS:
+        windows.append(Window(len(windows), start, start + in_sample_ms, start + in_sample_ms + out_sample_ms))
+        start += step_ms
+    return windows
+
+
+def data_bounds(data: Dict[str, List[dict]]):
+    starts = [bars[0]["start"] for bars in data.values() if bars]
+    ends = [bars[-1]["start"] for bars in data.values() if bars]
+    return (min(starts), max(ends)) if starts else (None, None)
+
+
+class WindowSlicer:
+    """Срезы [start, end) по start без копирования всего набора: bisect по колонке start."""
+
+    def __init__(self, data: Dict[str, List[dict]]):
+        self.data = data
+        self._starts = {sym: [bar["start"] for bar in bars] for sym, bars in data.items()}
+
+    def slice(self, start: int, end: int) -> Dict[str, List[dict]]:
+        out = {}
+        for sym, bars in self.data.items():
+            starts = self._starts[sym]
+            part = bars[bisect_left(starts, start):bisect_left(starts, end)]
+            if part:
+                out[sym] = part
+        return out
+
+
+def _per_day(pnl, span_ms):
+    return pnl / (span_ms / DAY_MS) if span_ms > 0 else 0.0
+
+
+class WalkForward:
+    def __init__(self, candidates: List[dict], names=None, rank_key="pnl", warmup_minutes=300, workers=None):
+        self.candidates = candidates
+        self.names = list(names or STRATEGIES)
+        self.rank_key = rank_key
+        self.warmup_ms = warmup_minutes * MINUTE_MS
+        self.workers = workers or os.cpu_count() or 1
+        self.jobs = make_jobs(candidates, self.names)
+
+    def run_window(self, slicer: WindowSlicer, window: Window) -> List[dict]:
+        started = time.perf_counter()
+        data = slicer.slice(window.is_start - self.warmup_ms, window.oos_end)
+        # одни серии на все кандидаты и на IS, и на OOS окна
+        indicators = PrecomputedIndicators(data).precompute()
+        precompute_s = time.perf_counter() - started
+
+        is_data = slicer.slice(window.is_start - self.warmup_ms, window.is_end)
+        in_sample = run_sweep(is_data, self.jobs, self.workers, indicators, trade_from=window.is_start)
+        ranked = rank(in_sample, self.rank_key)
+        is_s = time.perf_counter() - started - precompute_s
+
+        oos_data = slicer.slice(window.is_end - self.warmup_ms, window.oos_end)
+        rows = []
+        for name in self.names:
+            best = next(r for r in ranked if r["strategy"] == name)
+            defaults = next(r for r in in_sample if r["strategy"] == name and not r["params"])
+            oos_best, oos_defaults = run_sweep(oos_data, [(name, best["params"]), (name, {})], self.workers,
+                                               indicators, trade_from=window.is_end)
+            rows.append({
+                "window": window.index,
+                "strategy": name,
+                "is_start": window.is_start,
+                "is_end": window.is_end,
+                "oos_end": window.oos_end,
+                "params": best["params"],
+                "is_pnl": best["pnl"],
+                "is_max_drawdown": best["max_drawdown"],
+                "is_trades": best["trades"],
+                "is_defaults_pnl": defaults["pnl"],
+                "oos_pnl": oos_best["pnl"],
+                "oos_max_drawdown": oos_best["max_drawdown"],
+                "oos_trades": oos_best["trades"],
+                "oos_win_rate": oos_best["win_rate"],
+                "oos_defaults_pnl": oos_defaults["pnl"],
+                "precompute_s": precompute_s,
+                "in_sample_s": is_s,
+                "backtests": len(in_sample) // len(self.names),
+            })
+        return rows
+
+    def run(self, data: Dict[str, List[dict]], windows: List[Window], progress=None) -> List[dict]:
+        slicer = WindowSlicer(data)
+        rows = []
+        for window in windows:
+            window_rows = self.run_window(slicer, window)
+            rows.extend(window_rows)
+            if progress:
+                progress(window, window_rows)
+        return rows
+
+
+def summarize(rows: List[dict]) -> Dict[str, dict]:
+    out = {}
+    for name in dict.fromkeys(r["strategy"] for r in rows):
+        mine = [r for r in rows if r["strategy"] == name]
+        is_ms = sum(r["is_end"] - r["is_start"] for r in mine)
+        oos_ms = sum(r["oos_end"] - r["is_end"] for r in mine)
+        is_rate = _per_day(sum(r["is_pnl"] for r in mine), is_ms)
+        oos_rate = _per_day(sum(r["oos_pnl"] for r in mine), oos_ms)
+        out[name] = {
+            "windows": len(mine),
+            "oos_pnl": sum(r["oos_pnl"] for r in mine),
+            "oos_defaults_pnl": sum(r["oos_defaults_pnl"] for r in mine),
+            "oos_worst_drawdown": max(r["oos_max_drawdown"] for r in mine),
+            "oos_trades": sum(r["oos_trades"] for r in mine),
+            "oos_positive_windows": sum(1 for r in mine if r["oos_pnl"] > 0),
+            "efficiency": oos_rate / is_rate if is_rate > 0 else None,
+        }
+    return out
+
+
+def _day(ms):
+    return time.strftime("%Y-%m-%d %H:%M", time.gmtime(ms / 1000))
+
+
+def _print_window(window, rows):
+    first = rows[0]
+    print(f"\nwindow {window.index}: IS {_day(window.is_start)} → {_day(window.is_end)}, "
+          f"OOS → {_day(window.oos_end)} (precompute {first['precompute_s']:.2f} s, "
+          f"{first['backtests']} IS backtests/strategy in {first['in_sample_s']:.1f} s)")
+    for r in rows:
+        params = ", ".join(f"{k}={v:g}" for k, v in r["params"].items()) or "class defaults"
+        print(f"  {r['strategy']:<13} IS {r['is_pnl']:>8.2f} (defaults {r['is_defaults_pnl']:>7.2f})  "
+              f"OOS {r['oos_pnl']:>8.2f} dd {r['oos_max_drawdown']:>6.2f} trades {r['oos_trades']:>5} "
+              f"(defaults {r['oos_defaults_pnl']:>7.2f})  {params}")
+
+
+def write_csv(rows: List[dict], path) -> None:
+    names = sorted({k for r in rows for k in r["params"]})
+    columns = [c for c in rows[0] if c != "params"] if rows else []
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns + names)
+        for r in rows:
+            writer.writerow([r[c] for c in columns] + [r["params"].get(n, "") for n in names])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Walk-forward optimization of strategy class constants")
+    add_data_arguments(ap)
+    ap.add_argument("--strategies", default=",".join(STRATEGIES))
+    ap.add_argument("--in-sample-days", type=float, default=14)
+    ap.add_argument("--out-sample-days", type=float, default=7)
+    ap.add_argument("--step-days", type=float, default=None, help="default — out-sample length")
+    ap.add_argument("--warmup", type=int, default=300, help="minutes of history before each segment")
+    ap.add_argument("--param", action="append", default=[], metavar="NAME=lo:hi|v1,v2")
+    ap.add_argument("--mode", choices=("grid", "random", "lhs"), default="lhs")
+    ap.add_argument("--samples", type=int, default=100)
+    ap.add_argument("--steps", type=int, default=3)
+    ap.add_argument("--sample-seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--rank", choices=RANK_KEYS, default="pnl")
+    ap.add_argument("--csv", default=None, help="per-window results")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    data = load_data(args)
+    first, last = data_bounds(data)
+    if first is None:
+        raise SystemExit("no bars")
+    windows = make_windows(first + args.warmup * MINUTE_MS, last, int(args.in_sample_days * DAY_MS),
+                           int(args.out_sample_days * DAY_MS),
+                           int(args.step_days * DAY_MS) if args.step_days else None)
+    if not windows:
+        raise SystemExit(f"history {_day(first)} → {_day(last)} is shorter than warmup + in-sample + out-sample")
+
+    candidates = sample_space(parse_space(args.param), args.mode, args.samples, args.steps, args.sample_seed)
+    names = [n for n in args.strategies.split(",") if n]
+    wf = WalkForward(candidates, names, args.rank, args.warmup, args.workers)
+    print(f"{len(windows)} windows × {len(wf.jobs)} IS backtests on {wf.workers} workers")
+    started = time.perf_counter()
+    rows = wf.run(data, windows, progress=_print_window)
+    print(f"\nDone in {time.perf_counter() - started:.1f} s")
+
+    for name, s in summarize(rows).items():
+        efficiency = f"{s['efficiency']:.2f}" if s["efficiency"] is not None else "n/a"
+        print(f"  {name:<13} OOS pnl {s['oos_pnl']:>8.2f} (defaults {s['oos_defaults_pnl']:>7.2f})  "
+              f"worst dd {s['oos_worst_drawdown']:>6.2f}  trades {s['oos_trades']:>5}  "
+              f"positive {s['oos_positive_windows']}/{s['windows']}  efficiency {efficiency}")
+    if args.csv:
+        write_csv(rows, args.csv)
+
+
+if __name__ == "__main__":
+    main()
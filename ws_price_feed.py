@@ -1,8 +1,32 @@
 # ============================================================
 # WS PRICE FEED v10.0 — OHLC HISTORY FOR STRATEGY
 # ------------------------------------------------------------
-# Поддержка: BTCUSDT, ETHUSDT, SOLUSDT, XRPUSDT, BNBUSDT, DOGEUSDT, AVAXUSDT
+# Символы — из SymbolRegistry (config.trading.symbols), подписка пачками,
+# add/remove символа в рантайме сразу (от)подписывает топик.
 # Честные свечи (open/high/low/close/volume), auto-subscribe к Bybit relay
+# Каждое сообщение помечает символ изменившимся и будит потребителя:
+# wait_for_updates() возвращает множество символов с обновлениями.
+# Один фид на relay: остальные потребители — подписчики (feed_fanout),
+# а не вторые соединения: subscribe() / subscribe_updates().
+# Быстрый путь on_message: чужие топики и символы отсеиваются по подстроке
+# до декодирования JSON, orjson (если установлен) вместо json; без orjson
+# stdlib декодирует только массив data (тип и топик — по подстроке,
+# нестандартная форма сообщения — полный json.loads). Поля бара пишутся
+# прямо в колонки OHLCRingBuffer; dict бара собирается только для
+# подписчиков / KlineStore. Замер — bench_ws_parse.py: быстрее старого
+# парсера и с orjson, и с stdlib json.
+# Чтение без локов: цены — неизменяемый PriceSnapshot с seq, публикует
+# только писатель (поток сокета) и не чаще одного раза на чтение: новый
+# снимок собирается на первом обновлении цены после того, как читатель
+# забрал предыдущий (двойной буфер, без копий на каждое сообщение); бары —
+# seqlock на символ (нечётный счётчик = запись идёт, читатель повторяет
+# чтение при смене счётчика, без небезопасного fallback).
+# add/remove символа из SymbolRegistry применяются тоже в потоке сокета
+# (очередь _registry_ops) — у prices / seq / снимка один писатель.
+# self.health (FeedHealth): по символу — время последнего сообщения,
+# темп, задержка биржа → приём; счётчики соединений / реконнектов.
+# add_raw_tap(): сырые сообщения до разбора — запись захвата (relay_capture).
+# Адрес relay — config.market.ws_url (env WS_URL).
 # ============================================================
 
 import threading
@@ -11,26 +35,121 @@ import json
 import websocket
 import ssl
 import logging
+from collections import deque
+from types import MappingProxyType
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # stdlib fallback
+    orjson = None
+    _loads = json.loads
+
+from ohlc_ring_buffer import OHLCRingBuffer
+from symbol_registry import SymbolRegistry
+from feed_fanout import QueueSubscriber, UpdateSignal
+from price_snapshot import PriceSnapshot
+from feed_health import FeedHealth
+
+DEFAULT_WS_URL = "ws://146.190.89.166:8765/relay"
+KLINE_PREFIX = "kline.1."
+_KLINE_PREFIX_LEN = len(KLINE_PREFIX)
+_KLINE_TYPES = ("snapshot", "update")
+_scan_json = json.JSONDecoder().scan_once  # C-сканер stdlib: значение с позиции, без проверки хвоста
+
+
+def _decode_full(message, symbol):
+    """Бары kline.1.<symbol> или None, если это не обновление этого топика."""
+    data = _loads(message)
+    if data.get("type") not in _KLINE_TYPES or data.get("topic") != KLINE_PREFIX + symbol:
+        return None
+    return data.get("data") or ()
+
+
+def _decode_data_only(message, symbol):
+    """
+    То же для stdlib json: компактное сообщение Bybit проверяется по
+    подстроке, декодируется только массив data.
+    """
+    pos = message.find('"data":[')
+    if (pos < 0 or ('"type":"update"' not in message and '"type":"snapshot"' not in message)
+            or f'"topic":"{KLINE_PREFIX}{symbol}"' not in message):
+        return _decode_full(message, symbol)
+    return _scan_json(message, pos + 7)[0]
+
+
+_decode_bars = _decode_full if orjson is not None else _decode_data_only
+
 
 class WSPriceFeed:
-    def __init__(self, config):
+    def __init__(self, config, kline_store=None, registry=None, autostart=True):
         self.logger = logging.getLogger("WSPriceFeed")
         self.logger.info("🌐 WSPriceFeed v10.0 initialized")
         self.cfg = config
-        self.monitored_symbols = [
-            "BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "BNBUSDT", "DOGEUSDT", "AVAXUSDT"
-        ]
-        self.prices = {}  # {"BTCUSDT": 12345.0 ...}
-        self._ohlc_history = {sym: [] for sym in self.monitored_symbols}
+        self.registry = registry if registry is not None else SymbolRegistry.from_config(config)
+        self.monitored_symbols = self.registry  # `in` — O(1)
+        market = getattr(config, "market", None)
+        self.subscribe_chunk = getattr(market, "ws_subscribe_chunk", 10)
+        self.prices = {}  # {"BTCUSDT": 12345.0 ...} — рабочий dict писателя
+        self.seq = 0  # растёт на каждое обновление цены
+        self._changed_at = {}  # {symbol: seq последнего изменения}
+        self._snapshot = PriceSnapshot()
+        self._snapshot_read = True  # читатель забрал текущий снимок — писатель публикует следующий
+        self._registry_ops = deque()  # (event, symbol) — применяет поток сокета
         self.max_history = 1000
+        self._ohlc_history = {sym: OHLCRingBuffer(self.max_history) for sym in self.registry}
+        self._ws = None
+        self.updates = UpdateSignal()  # основной потребитель — TradingLoop
+        self._signals = (self.updates,)
+        self._subscribers = ()  # copy-on-write: поток сокета итерирует без лока
+        self._raw_taps = ()  # callback(message) на каждое сырое сообщение (relay_capture)
+        self._sub_lock = threading.Lock()
+        self.registry.subscribe(self._on_registry_change)
         self.last_update = None
         self.dead_interval = 60
-        self.ws_url = "ws://146.190.89.166:8765/relay"
+        self.ws_url = getattr(market, "ws_url", None) or DEFAULT_WS_URL
+        self.kline_store = kline_store  # KlineStore: сюда пишутся подтверждённые бары
+        self.health = FeedHealth()
         self.thread = threading.Thread(target=self._run, daemon=True)
-        self.thread.start()
+        if autostart:
+            self.thread.start()
+
+    def start(self):
+        """Запуск соединения, если фид создан с autostart=False (бенчмарки, replay)."""
+        if not self.thread.is_alive():
+            self.thread.start()
+
+    def get_snapshot(self) -> PriceSnapshot:
+        """
+        Последний опубликованный снимок — по ссылке, без копий. Отметка
+        "прочитан" разрешает писателю опубликовать следующий: снимок может
+        отставать от фида до первого сообщения после чтения.
+        """
+        self._snapshot_read = True
+        return self._snapshot
+
+    def _publish(self, now=None):
+        """
+        Только поток сокета: seq и данные снимка — из одного и того же
+        состояния, читатели только берут ссылку.
+        """
+        self._snapshot = PriceSnapshot(
+            seq=self.seq,
+            ts=now if now is not None else time.time(),
+            prices=MappingProxyType(dict(self.prices)),
+            changed_at=MappingProxyType(dict(self._changed_at)),
+        )
+
+    def changed_since(self, seq) -> bool:
+        return self.seq != seq
 
     def get_prices(self):
-        return dict(self.prices)
+        """Read-only mapping цен из текущего снимка (без копии на вызов)."""
+        return self.get_snapshot().prices
+
+    @property
+    def reconnects(self):
+        return self.health.reconnects
 
     def is_alive(self):
         if self.last_update is None:
@@ -39,8 +158,74 @@ class WSPriceFeed:
         alive = seconds_since < self.dead_interval
         return alive
 
+    def wait_for_updates(self, timeout=None, coalesce=0.0):
+        """Изменившиеся символы основного потребителя (см. UpdateSignal.wait)."""
+        return self.updates.wait(timeout, coalesce)
+
+    # ------------------------------------------------------------
+    # FAN-OUT
+    # ------------------------------------------------------------
+    def subscribe(self, callback=None, maxsize=1000, symbols=None, name="subscriber"):
+        """Очередь событий (symbol, bar); с callback — доставка в своём потоке."""
+        sub = QueueSubscriber(maxsize=maxsize, callback=callback, symbols=symbols, name=name)
+        with self._sub_lock:
+            self._subscribers = self._subscribers + (sub,)
+        return sub
+
+    def subscribe_updates(self, signal=None):
+        """
+        Отдельное множество изменившихся символов для ещё одного event-driven
+        потребителя. signal — любой объект с notify(symbol) (напр. asyncio-вариант).
+        """
+        signal = signal if signal is not None else UpdateSignal()
+        with self._sub_lock:
+            self._signals = self._signals + (signal,)
+        return signal
+
+    def unsubscribe(self, sub):
+        with self._sub_lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not sub)
+            self._signals = tuple(s for s in self._signals if s is not sub)
+        sub.close()
+
+    def add_raw_tap(self, callback):
+        """callback(message) — каждое сырое сообщение до разбора (запись захвата)."""
+        with self._sub_lock:
+            self._raw_taps = self._raw_taps + (callback,)
+
+    def remove_raw_tap(self, callback):
+        with self._sub_lock:
+            # ==, не is: связанный метод (recorder.record) — новый объект на каждое обращение
+            self._raw_taps = tuple(t for t in self._raw_taps if t != callback)
+
+    def subscriber_stats(self):
+        return [sub.stats() for sub in self._subscribers]
+
     def get_ohlc_history(self, symbol, depth=500):
-        return self._ohlc_history.get(symbol, [])[-depth:]
+        buf = self._ohlc_history.get(symbol)
+        return self._read_bars(buf, lambda: buf.to_list(depth)) if buf is not None else []
+
+    def get_ohlc_since(self, symbol, start, depth=500):
+        """Бары со start >= start: последний известный потребителю бар плюс новые."""
+        buf = self._ohlc_history.get(symbol)
+        return self._read_bars(buf, lambda: buf.bars_since(start, depth)) if buf is not None else []
+
+    @staticmethod
+    def _read_bars(buf, read, spin=100):
+        """
+        Seqlock-чтение: результат без полузаписанного бара. Повторяем, пока
+        счётчик не совпадёт (upsert короткий, счётчик чётный и при исключении);
+        после spin попыток — с паузой, чтобы не жечь CPU под нагрузкой писателя.
+        """
+        attempt = 0
+        while True:
+            before = buf.write_seq
+            if not before & 1:
+                bars = read()
+                if buf.write_seq == before:
+                    return bars
+            attempt += 1
+            time.sleep(0 if attempt < spin else 0.0001)  # писатель посреди upsert — уступаем GIL
 
     def _run(self):
         while True:
@@ -71,61 +256,132 @@ class WSPriceFeed:
 
     def _on_open(self, ws):
         self.logger.info("✅ WS connected")
-        subscribe_msg = {
-            "op": "subscribe",
-            "args": [
-                f"kline.1.{sym}" for sym in self.monitored_symbols
-            ]
-        }
-        ws.send(json.dumps(subscribe_msg))
-        self.logger.info(f"[WS] SUBSCRIBE sent: {subscribe_msg}")
+        self.health.record_connect()
+        if self._registry_ops:
+            self._apply_registry_ops()
+        self._ws = ws
+        for chunk in self.registry.chunks(self.subscribe_chunk):
+            self._send_op(ws, "subscribe", chunk)
+        self.logger.info(f"[WS] SUBSCRIBE sent: {len(self.registry)} symbols")
+
+    def _send_op(self, ws, op, symbols):
+        ws.send(json.dumps({"op": op, "args": [f"{KLINE_PREFIX}{sym}" for sym in symbols]}))
+
+    def _on_registry_change(self, event, symbol, sid):
+        # состояние фида меняет только поток сокета — здесь только очередь и (от)подписка
+        self._registry_ops.append((event, symbol))
+        ws = self._ws
+        if ws is None:
+            return  # подписка уйдёт целиком в _on_open
+        try:
+            self._send_op(ws, "subscribe" if event == "add" else "unsubscribe", [symbol])
+        except Exception as e:
+            self.logger.error(f"[WS] {event} {symbol} not sent: {e}")
+
+    def _apply_registry_ops(self):
+        """Поток сокета: add/remove символов, накопленные _on_registry_change."""
+        removed = False
+        ops = self._registry_ops
+        while ops:
+            event, symbol = ops.popleft()
+            if event == "add":
+                self._ohlc_history.setdefault(symbol, OHLCRingBuffer(self.max_history))
+                continue
+            self._ohlc_history.pop(symbol, None)
+            self.prices.pop(symbol, None)
+            self._changed_at.pop(symbol, None)
+            self.health.forget(symbol)
+            removed = True
+        if removed:
+            self.seq += 1
+            self._snapshot_read = False
+            self._publish()
 
     def on_message(self, ws, message):
-        data = json.loads(message)
-        bars = data.get("data", [])
-        topic = data.get("topic", "")
-        if data.get("type") in ["snapshot", "update"] and topic.startswith("kline.1."):
-            symbol = topic.split(".")[-1]
-            # Только для отслеживаемых монет
-            if symbol not in self.monitored_symbols:
-                return
-
-            ohlc = None  # Определяем ohlc заранее, чтобы избежать ошибки
-
-            # Проверяем, есть ли данные в 'bars'
-            if bars:
-                for bar in bars:
-                    ohlc = {
-                        "open": float(bar["open"]),
-                        "high": float(bar["high"]),
-                        "low": float(bar["low"]),
-                        "close": float(bar["close"]),
-                        "volume": float(bar.get("volume", 0.0)),
-                        "start": bar.get("start"),
-                        "end": bar.get("end"),
-                        "confirm": bar.get("confirm", False),
-                        "timestamp": bar.get("timestamp")
-                    }
-                    # Не допускаем дубликатов по start
-                    if self._ohlc_history[symbol] and bar.get("start"):
-                        if self._ohlc_history[symbol][-1].get("start") == bar.get("start"):
-                            self._ohlc_history[symbol][-1] = ohlc
-                        else:
-                            self._ohlc_history[symbol].append(ohlc)
-                    else:
-                        self._ohlc_history[symbol].append(ohlc)
-                    if len(self._ohlc_history[symbol]) > self.max_history:
-                        self._ohlc_history[symbol].pop(0)
-
-            if ohlc:  # Проверяем, что ohlc был установлен в цикле
-                self.prices[symbol] = ohlc["close"]
-                self.last_update = time.time()
-            else:
-                # Лог предупреждения, если bars пуст или нет ohlc
-                self.logger.warning(f"No valid OHLC data for symbol {symbol}. Prices not updated.")
+        if self._registry_ops:
+            self._apply_registry_ops()
+        if isinstance(message, bytes):
+            message = message.decode("utf-8", "replace")
+        if self._raw_taps:
+            self._call_raw_taps(message)
+        # Отсев до декодирования: не kline.1 или не наш символ
+        pos = message.find(KLINE_PREFIX)
+        if pos < 0:
+            return
+        pos += _KLINE_PREFIX_LEN
+        symbol = message[pos:message.find('"', pos)]
+        # Только для отслеживаемых монет (dict lookup вместо скана списка)
+        history = self._ohlc_history.get(symbol)
+        if history is None:
+            return
+
+        bars = _decode_bars(message, symbol)
+        if bars is None:
+            return
+
+        close = None
+        subscribers = self._subscribers
+        store = self.kline_store
+        for bar in bars:
+            open_ = float(bar["open"])
+            high = float(bar["high"])
+            low = float(bar["low"])
+            close = float(bar["close"])
+            volume = float(bar.get("volume", 0.0))
+            start = bar.get("start")
+            end = bar.get("end")
+            confirm = bar.get("confirm", False)
+            timestamp = bar.get("timestamp")
+            # Не допускаем дубликатов по start: тот же start переписывается на месте.
+            # Нечётный seq на время записи — читатели повторят чтение.
+            history.write_seq += 1
+            try:
+                history.upsert_values(start, end, open_, high, low, close, volume, confirm)
+            finally:
+                history.write_seq += 1
+            if subscribers or (confirm and store is not None):
+                ohlc = {
+                    "open": open_, "high": high, "low": low, "close": close, "volume": volume,
+                    "start": start, "end": end, "confirm": confirm, "timestamp": timestamp,
+                }
+                for sub in subscribers:
+                    sub.push(symbol, ohlc)
+                if confirm and store is not None:
+                    try:
+                        store.upsert(symbol, [ohlc])
+                    except Exception as e:
+                        self.logger.error(f"Kline store write failed for {symbol}: {e}")
+
+        if close is not None:
+            self.prices[symbol] = close
+            self.seq += 1
+            self._changed_at[symbol] = self.seq
+            now = time.time()
+            if self._snapshot_read:
+                # не чаще одного снимка на чтение; флаг — до публикации, чтобы
+                # чтение посреди _publish не потерялось
+                self._snapshot_read = False
+                self._publish(now)
+            self.last_update = now
+            self.health.record(symbol, now, timestamp)
+            for signal in self._signals:
+                signal.notify(symbol)
+        else:
+            # Лог предупреждения, если bars пуст
+            self.logger.warning(f"No valid OHLC data for symbol {symbol}. Prices not updated.")
+
+    def _call_raw_taps(self, message):
+        for tap in self._raw_taps:
+            try:
+                tap(message)
+            except Exception as e:
+                # сбой записи захвата не должен останавливать разбор живых данных
+                self.logger.error(f"❌ Raw tap {getattr(tap, '__qualname__', tap)} failed: {e}")
 
     def _on_error(self, ws, error):
         self.logger.error(f"[WS ERROR] {error}")
 
     def _on_close(self, ws, close_status_code, close_msg):
+        self._ws = None
+        self.health.record_disconnect()
         self.logger.info(f"[WS CLOSED] {close_status_code} {close_msg}")